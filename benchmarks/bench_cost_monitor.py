@@ -0,0 +1,52 @@
+"""
+CostMonitor reserve/commit throughput under thread contention.
+Run from the repo root: python -m benchmarks.bench_cost_monitor
+
+Reports operations per second at 32 threads, for all threads hammering
+one project and for threads spread over distinct projects, and checks
+that no project overshoots its budget.
+"""
+import threading
+import time
+
+from fsm_orchestrator.core.cost_monitor import CostMonitor
+
+THREADS = 32
+OPS_PER_THREAD = 20_000
+EST_TOKENS = 10
+
+
+def run(projects):
+    budget = THREADS * OPS_PER_THREAD * EST_TOKENS // (2 * projects)  # half the demand fits
+    cm = CostMonitor(token_budget=budget)
+    barrier = threading.Barrier(THREADS + 1)
+
+    def worker(i):
+        project = f"p{i % projects}"
+        barrier.wait()
+        for _ in range(OPS_PER_THREAD):
+            r = cm.reserve(project, EST_TOKENS)
+            if r is not None:
+                cm.commit(r, "agent", EST_TOKENS, 0.0)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    overshoot = max(cm.report(f"p{i}")["tokens_used"] - budget for i in range(projects))
+    return THREADS * OPS_PER_THREAD / elapsed, overshoot
+
+
+def main():
+    print(f"{THREADS} threads x {OPS_PER_THREAD:,} reserve(+commit) calls")
+    for projects in (1, THREADS):
+        ops, overshoot = run(projects)
+        print(f"  {projects:>3} project(s): {ops:>12,.0f} ops/s, max overshoot {max(0, overshoot)} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Deadlock detection latency as history grows: full-history Counter vs sliding window.
+Run from the repo root: python -m benchmarks.bench_deadlock
+
+Also times observe() on an acyclic walk over 2,000 states (each step jumps
+1-5 states ahead, restarting at S0), where every edge crosses between
+SCCs, with and without loop detection.
+"""
+import random
+import time
+from collections import Counter
+
+from fsm_orchestrator.core.deadlock import DeadlockDetector
+from fsm_orchestrator.core.fsm import Transition
+
+CHECKPOINTS = [10_000, 100_000, 1_000_000, 3_000_000]
+SAMPLE = 1_000
+TRANSITIONS = [Transition(f"S{i}", f"S{(i * 7 + 3) % 101}", 0.9) for i in range(101)]
+
+
+def legacy_detect(history, threshold):
+    """The pre-window implementation: Counter over the entire history."""
+    counter = Counter(history)
+    return any(count >= threshold for count in counter.values())
+
+
+def dag_walk(steps, states=2000, seed=0):
+    rng = random.Random(seed)
+    walk, i = [], 0
+    while len(walk) < steps:
+        j = i + rng.randint(1, 5)
+        if j >= states:
+            i = 0
+            continue
+        walk.append(Transition(f"S{i}", f"S{j}", 0.9))
+        i = j
+    return walk
+
+
+def bench_dag():
+    walk = dag_walk(200_000)
+    for loop_threshold in (None, 3):
+        dd = DeadlockDetector(threshold=50_000, window=5000, loop_threshold=loop_threshold)
+        for t in walk[:50_000]:  # fill the window
+            dd.observe("p1", t)
+        start = time.perf_counter()
+        for t in walk[50_000:]:
+            dd.observe("p1", t)
+        per = (time.perf_counter() - start) / (len(walk) - 50_000)
+        print(f"DAG walk, window 5000, loop_threshold={loop_threshold}: observe {per * 1e6:.2f} us")
+
+
+def main():
+    dd = DeadlockDetector(threshold=50_000, window=1000, loop_threshold=50_000)
+    history = []
+    observed = 0
+    print(f"{'history':>10} {'observe+detect (us)':>20} {'legacy detect (ms)':>20}")
+    for target in CHECKPOINTS:
+        while observed < target - SAMPLE:
+            t = TRANSITIONS[observed % len(TRANSITIONS)]
+            dd.observe("p1", t)
+            history.append((t.from_state, t.to_state))
+            observed += 1
+        start = time.perf_counter()
+        for _ in range(SAMPLE):
+            t = TRANSITIONS[observed % len(TRANSITIONS)]
+            dd.observe("p1", t)
+            dd.detect("p1")
+            history.append((t.from_state, t.to_state))
+            observed += 1
+        windowed = (time.perf_counter() - start) / SAMPLE
+        start = time.perf_counter()
+        legacy_detect(history, dd.threshold)
+        legacy = time.perf_counter() - start
+        print(f"{observed:>10,} {windowed * 1e6:>20.2f} {legacy * 1e3:>20.1f}")
+    bench_dag()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+EmbeddingService micro-batching and caching under concurrent callers.
+Run from the repo root: python -m benchmarks.bench_embedding
+
+The backend simulates a remote embedding API: a fixed 20 ms round trip
+plus 0.2 ms per text, wrapped around the local hashing embedder. 32
+threads each embed 50 texts drawn from a pool where about half repeat
+(summaries and queries recur): unbatched and uncached with 32 and with 4
+concurrent connections, then through the service (4 calls in flight).
+"""
+import threading
+import time
+
+import numpy as np
+
+from fsm_orchestrator.util.embedding import EmbeddingCache, EmbeddingService, HashingEmbedder
+
+THREADS = 32
+PER_THREAD = 50
+ROUND_TRIP = 0.020
+PER_TEXT = 0.0002
+
+
+class SimulatedRemote:
+    name = "simulated"
+
+    def __init__(self):
+        self.inner = HashingEmbedder(dim=768)
+
+    def embed_batch(self, texts):
+        time.sleep(ROUND_TRIP + PER_TEXT * len(texts))
+        return self.inner.embed_batch(texts)
+
+
+def workload(seed):
+    rng = np.random.default_rng(seed)
+    return [f"summary {int(i)}" for i in rng.integers(0, THREADS * PER_THREAD // 2, size=PER_THREAD)]
+
+
+def run(embed_one):
+    barrier = threading.Barrier(THREADS + 1)
+
+    def worker(i):
+        texts = workload(i)
+        barrier.wait()
+        for text in texts:
+            embed_one(text)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def main():
+    backend = SimulatedRemote()
+    total = THREADS * PER_THREAD
+    naive = run(lambda text: backend.embed_batch([text])[0])
+    print(f"unbatched, 32 conns : {total / naive:>8.0f} texts/s ({naive:.2f} s), {total} backend calls")
+    connections = threading.Semaphore(4)
+
+    def limited(text):
+        with connections:
+            return backend.embed_batch([text])[0]
+    naive = run(limited)
+    print(f"unbatched, 4 conns  : {total / naive:>8.0f} texts/s ({naive:.2f} s), {total} backend calls")
+    service = EmbeddingService(backend, batch_size=64, max_wait=0.005, concurrency=4, cache=EmbeddingCache())
+    batched = run(service.embed)
+    stats = service.stats()
+    print(f"EmbeddingService    : {total / batched:>8.0f} texts/s ({batched:.2f} s), "
+          f"hit rate {stats['hit_rate']:.2f}, mean batch {stats['mean_batch']:.1f}, "
+          f"{stats['batches']} backend calls for {stats['requests']} requests")
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
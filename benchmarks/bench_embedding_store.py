@@ -0,0 +1,98 @@
+"""
+Resident memory of warm-layer embeddings: list-of-lists vs EmbeddingStore.
+Run from the repo root: python -m benchmarks.bench_embedding_store [n] [dim]
+
+Defaults to 1M memories x 768 dims. The list-of-lists layout is measured
+at 20k rows and extrapolated (1M rows would need ~25 GB). The store is
+written to a temporary directory, then each measurement runs in a fresh
+forked process that opens the store and runs one search, so every page
+has been touched. RssAnon is private memory; RssFile is the mapped file,
+which lives in the shared page cache and is not duplicated per process.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from fsm_orchestrator.core.embedding_store import EmbeddingStore
+
+LIST_ROWS = 20_000
+CHUNK = 50_000
+
+
+def rss():
+    """Return (RssAnon, RssFile) of this process in MiB."""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields["RssAnon"], fields["RssFile"]
+
+
+def in_child(fn):
+    """Run fn in a forked process and return what it prints as a float tuple."""
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        result = fn()
+        os.write(write, repr(result).encode())
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        out = f.read()
+    os.waitpid(pid, 0)
+    return eval(out)
+
+
+def measure_lists(dim):
+    base, _ = rss()
+    rng = np.random.default_rng(0)
+    memories = [{"summary": str(i), "embedding": row.tolist()} for i, row in enumerate(rng.standard_normal((LIST_ROWS, dim)))]
+    anon, _ = rss()
+    assert memories
+    return (anon - base) / LIST_ROWS
+
+
+def measure_store(root, n, dim):
+    base_anon, base_file = rss()
+    store = EmbeddingStore(root)
+    start = time.perf_counter()
+    store.search("p1", np.ones(dim), k=3)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    store.search("p1", np.ones(dim), k=3)
+    warm = time.perf_counter() - start
+    anon, file = rss()
+    return anon - base_anon, file - base_file, cold, warm
+
+
+def main(n, dim):
+    per_row = in_child(lambda: measure_lists(dim))
+    print(f"list-of-lists : {per_row * 1024:.1f} KiB/row -> ~{per_row * n / 1024:.1f} GiB private at {n:,} rows")
+    root = tempfile.mkdtemp(prefix="embstore-")
+    try:
+        for dtype in ("float32", "float16"):
+            store = EmbeddingStore(os.path.join(root, dtype), dtype=dtype)
+            rng = np.random.default_rng(0)
+            for start in range(0, n, CHUNK):
+                rows = rng.standard_normal((min(CHUNK, n - start), dim), dtype=np.float32)
+                store.append_many("p1", rows, [{"summary": str(start + i)} for i in range(len(rows))])
+            size = os.path.getsize(os.path.join(root, dtype, "p1", "vectors.bin")) / 2**30
+            anon, file, cold, warm = in_child(lambda: measure_store(os.path.join(root, dtype), n, dim))
+            print(f"store {dtype:<8}: {size:.2f} GiB on disk, +{anon / 1024:.2f} GiB private "
+                  f"(records + search scratch), +{file / 1024:.2f} GiB shared page cache, "
+                  f"search {cold * 1e3:.0f} ms on open (parses the sidecar), {warm * 1e3:.0f} ms after")
+            shutil.rmtree(os.path.join(root, dtype))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [1_000_000, 768][len(args):]))
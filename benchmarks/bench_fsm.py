@@ -0,0 +1,62 @@
+"""
+Microbenchmark for HierarchicalFSM.next(): linear scan vs adjacency index.
+Run from the repo root: python -m benchmarks.bench_fsm
+"""
+import time
+
+from fsm_orchestrator.core.fsm import HierarchicalFSM, Transition
+from fsm_orchestrator.core.models import TransitionProposal
+
+SIZES = [10_000, 100_000, 1_000_000]
+FANOUT = 10  # outgoing transitions per state
+CONTEXT = {"urgency": 0.5, "dependency": 0.7, "user_intent": 0.2}
+
+
+def legacy_next(transitions, state_name, context):
+    """The pre-index implementation: full scan plus validated model per match."""
+    proposals = []
+    for t in transitions:
+        if t.from_state == state_name:
+            proposals.append(
+                TransitionProposal(
+                    from_state=t.from_state,
+                    to_state=t.to_state,
+                    confidence=t.confidence,
+                    urgency=context.get('urgency', 0.0),
+                    dependency=context.get('dependency', 0.0),
+                    user_intent=context.get('user_intent', 0.0),
+                    metadata=t.metadata
+                )
+            )
+    return proposals
+
+
+def build(n):
+    fsm = HierarchicalFSM()
+    n_states = max(1, n // FANOUT)
+    for i in range(n):
+        src = i % n_states
+        fsm.add_transition(Transition(f"S{src}", f"S{(src + 1 + i // n_states) % n_states}", 0.9))
+    return fsm, n_states
+
+
+def per_call(fn, reps):
+    start = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - start) / reps
+
+
+def main():
+    print(f"{'transitions':>12} {'legacy (us)':>14} {'indexed (us)':>14} {'speedup':>10}")
+    for n in SIZES:
+        fsm, n_states = build(n)
+        state = f"S{n_states // 2}"
+        assert len(legacy_next(fsm.transitions, state, CONTEXT)) == len(fsm.next(state, CONTEXT))
+        legacy = per_call(lambda: legacy_next(fsm.transitions, state, CONTEXT), max(3, 1_000_000 // n))
+        indexed = per_call(lambda: fsm.next(state, CONTEXT), 10_000)
+        print(f"{n:>12,} {legacy * 1e6:>14.1f} {indexed * 1e6:>14.1f} {legacy / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Warm-memory retrieval: legacy pure-Python cosine + sorted() vs VectorIndex.
+Run from the repo root: python -m benchmarks.bench_memory_index [sizes...]
+
+Defaults to 10k, 100k and 1M memories x 768 dims. The legacy path is only
+timed up to 10k rows (its list-of-lists layout would need several GB at
+100k) and is extrapolated linearly beyond that. 1M x 768 float32 rows need
+~3 GB of RAM. Finally, one memory is appended before each IVF search on a
+trained 100k index (a live project storing and retrieving as it goes).
+"""
+import sys
+import time
+
+import numpy as np
+
+from fsm_orchestrator.core.vector_index import VectorIndex
+
+DIM = 768
+LEGACY_MAX = 10_000
+CHUNK = 50_000
+TOPICS = 256  # real memories cluster by topic; uniform noise would defeat IVF
+
+
+def sample(rng, centers, n):
+    """Embeddings scattered around random topic centers."""
+    picks = rng.integers(len(centers), size=n)
+    return centers[picks] + 0.5 * rng.standard_normal((n, DIM), dtype=np.float32)
+
+
+def legacy_retrieve(compressed, query, top=3):
+    def cosine_sim(a, b):
+        return sum(x*y for x, y in zip(a, b)) / (1 + sum(x*x for x in a)**0.5 * sum(y*y for y in b)**0.5)
+    return sorted(compressed, key=lambda c: cosine_sim(c["embedding"], query), reverse=True)[:top]
+
+
+def best_of(fn, reps):
+    best = float("inf")
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build(n, rng, centers, **kwargs):
+    index = VectorIndex(dim=DIM, capacity=n, **kwargs)
+    for start in range(0, n, CHUNK):
+        rows = sample(rng, centers, min(CHUNK, n - start))
+        index.add_many(rows, range(start, start + len(rows)))
+    return index
+
+
+def main(sizes):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((TOPICS, DIM), dtype=np.float32)
+    legacy_per_row = None
+    print(f"{'memories':>10} {'legacy (ms)':>14} {'exact (ms)':>12} {'ivf (ms)':>10} {'ivf recall@3':>13}")
+    for n in sizes:
+        query = sample(rng, centers, 1)[0]
+        legacy = ""
+        if n <= LEGACY_MAX:
+            compressed = [{"embedding": row.tolist()} for row in sample(rng, centers, n)]
+            q = query.tolist()
+            t = best_of(lambda: legacy_retrieve(compressed, q), 1)
+            legacy_per_row = t / n
+            legacy = f"{t * 1e3:.0f}"
+            del compressed
+        elif legacy_per_row is not None:
+            legacy = f"~{legacy_per_row * n * 1e3:.0f}"
+        index = build(n, rng, centers)
+        exact = best_of(lambda: index.search(query, 3), 5)
+        n_lists = max(16, int(np.sqrt(n)))
+        index.ivf_lists, index.n_probe = n_lists, max(4, n_lists // 16)
+        index.train()
+        queries = sample(rng, centers, 20)
+        hits = sum(
+            len({p for _, p in index.search(q, 3)} & {p for _, p in index.search(q, 3, exact=True)})
+            for q in queries
+        )
+        ivf = best_of(lambda: index.search(query, 3), 5)
+        print(f"{n:>10,} {legacy:>14} {exact * 1e3:>12.2f} {ivf * 1e3:>10.2f} {hits / (3 * len(queries)):>13.2f}")
+        del index
+
+
+def streaming(n=100_000, steps=200):
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((TOPICS, DIM), dtype=np.float32)
+    n_lists = int(np.sqrt(n))
+    index = build(n, rng, centers, ivf_lists=n_lists, n_probe=n_lists // 16, train_size=n)
+    rows = sample(rng, centers, steps)
+    index.search(rows[0], 3)
+    start = time.perf_counter()
+    for i, row in enumerate(rows):
+        index.add(row, n + i)
+        index.search(row, 3)
+    print(f"append + ivf search on {n:,} rows: {(time.perf_counter() - start) / steps * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
+    streaming()
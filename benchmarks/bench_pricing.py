@@ -0,0 +1,41 @@
+"""
+Pricing + ledger throughput: CostMonitor.record_usage at 1M records.
+Run from the repo root: python -m benchmarks.bench_pricing
+
+The target is sustaining 1M records per minute (~16.7k/s) from one process.
+"""
+import random
+import time
+
+from fsm_orchestrator.core.cost_monitor import CostMonitor
+from fsm_orchestrator.util.cost import MODEL_PRICES
+
+RECORDS = 1_000_000
+PROJECTS = 50
+AGENTS = 20
+
+
+def main():
+    rng = random.Random(0)
+    models = list(MODEL_PRICES)
+    calls = [
+        (f"p{rng.randrange(PROJECTS)}", f"a{rng.randrange(AGENTS)}", rng.choice(models),
+         rng.randrange(100, 4000), rng.randrange(50, 2000))
+        for _ in range(RECORDS)
+    ]
+    cm = CostMonitor(token_budget=10**15, dollar_budget=10**9)
+    start = time.perf_counter()
+    for call in calls:
+        cm.record_usage(*call)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    by_model = cm.ledger.totals("model")
+    aggregate = time.perf_counter() - start
+    rate = RECORDS / elapsed
+    print(f"{RECORDS:,} records in {elapsed:.2f} s -> {rate:,.0f}/s ({rate * 60 / 1e6:.1f}M per minute)")
+    print(f"ledger rows: {len(cm.ledger):,}; totals by model in {aggregate * 1e3:.2f} ms")
+    print({model: round(dollars, 2) for model, dollars in by_model.items()})
+
+
+if __name__ == "__main__":
+    main()
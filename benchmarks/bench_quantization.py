@@ -0,0 +1,67 @@
+"""
+Quantized warm-memory search: memory, latency and recall@3.
+Run from the repo root: python -m benchmarks.bench_quantization [n] [dim]
+
+Defaults to 100k synthetic clustered embeddings x 768 dims. Full-precision
+re-ranking reads candidate rows from an in-memory array standing in for
+the EmbeddingStore mapping; "index memory" counts only what the index
+itself keeps resident.
+"""
+import sys
+import time
+
+import numpy as np
+
+from fsm_orchestrator.core.quantization import QuantizedIndex
+from fsm_orchestrator.core.vector_index import VectorIndex
+
+TOPICS = 256
+QUERIES = 50
+CHUNK = 50_000
+
+
+def sample(rng, centers, n):
+    """Embeddings scattered around random topic centers."""
+    picks = rng.integers(len(centers), size=n)
+    return centers[picks] + 0.5 * rng.standard_normal((n, centers.shape[1]), dtype=np.float32)
+
+
+def timed_search(index, queries, **kwargs):
+    start = time.perf_counter()
+    results = [index.search(q, 3, **kwargs) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def recall(results, truth):
+    hits = sum(len({p for _, p in r} & {p for _, p in t}) for r, t in zip(results, truth))
+    return hits / (3 * len(truth))
+
+
+def main(n, dim):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((TOPICS, dim), dtype=np.float32)
+    data = np.concatenate([sample(rng, centers, min(CHUNK, n - s)) for s in range(0, n, CHUNK)])
+    queries = sample(rng, centers, QUERIES)
+    exact = VectorIndex(dim=dim, capacity=n)
+    exact.add_many(data, range(n))
+    latency, truth = timed_search(exact, queries)
+    print(f"{'index':<22} {'index memory':>14} {'smaller':>8} {'ms/query':>9} {'recall@3':>9}")
+    print(f"{'float32 exact':<22} {exact.matrix.nbytes / 2**20:>11.0f} MiB {1:>7.0f}x {latency * 1e3:>9.2f} {1:>9.2f}")
+    for kind in ("int8", "pq"):
+        index = QuantizedIndex(kind, full=lambda rows: data[rows], train_size=min(n, 20_000))
+        start = time.perf_counter()
+        for s in range(0, n, CHUNK):
+            index.add_many(data[s:s + CHUNK], range(s, min(s + CHUNK, n)))
+        build = time.perf_counter() - start
+        ratio = exact.matrix.nbytes / index.nbytes()
+        for rerank in (1, 4, 16, 64):
+            latency, results = timed_search(index, queries, rerank=rerank)
+            label = f"{kind} rerank x{rerank}"
+            print(f"{label:<22} {index.nbytes() / 2**20:>11.0f} MiB {ratio:>7.0f}x "
+                  f"{latency * 1e3:>9.2f} {recall(results, truth):>9.2f}")
+        print(f"{'':<22} (build {build:.1f} s)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [100_000, 768][len(args):]))
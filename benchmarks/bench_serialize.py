@@ -0,0 +1,41 @@
+"""
+Bytes written per transition: full vs delta FSM serialization.
+Run from the repo root: python -m benchmarks.bench_serialize
+
+Simulates a 1,000-step project where every step appends a transcript
+message, revises the plan and advances the FSM.
+"""
+import json
+
+from fsm_orchestrator.core.fsm import HierarchicalFSM, State, Transition
+
+STEPS = 1_000
+MESSAGE = "x" * 400
+
+
+def run(delta):
+    fsm = HierarchicalFSM(compact_every=100)
+    for name in ("Design", "Build"):
+        fsm.add_state(name, State())
+    fsm.add_transition(Transition("Design", "Build", 0.9))
+    fsm.add_transition(Transition("Build", "Design", 0.9))
+    fsm.set_initial_state("Design", {"transcript": [], "plan": "", "step": 0})
+    written = [len(json.dumps(fsm.serialize(delta=delta)))]
+    for step in range(STEPS):
+        fsm.context.append("transcript", f"[agent {step % 5}] {MESSAGE}")
+        fsm.context["plan"] = f"plan revision {step}"
+        fsm.context["step"] = step
+        fsm.advance(fsm.next(fsm.current_state, fsm.context)[0])
+        written.append(len(json.dumps(fsm.serialize(delta=delta))))
+    return written
+
+
+def main():
+    full, delta = run(False), run(True)
+    print(f"{'mode':>6} {'total bytes':>14} {'bytes/transition':>18} {'last write':>12}")
+    for name, written in (("full", full), ("delta", delta)):
+        print(f"{name:>6} {sum(written):>14,} {sum(written) / STEPS:>18,.0f} {written[-1]:>12,}")
+
+
+if __name__ == "__main__":
+    main()
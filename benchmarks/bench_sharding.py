@@ -0,0 +1,100 @@
+"""
+Sharded orchestrator throughput versus one in-process Orchestrator.
+Run from the repo root: python -m benchmarks.bench_sharding [shard counts...]
+
+200 projects each receive 500 "work" events whose handler burns ~50 us of
+pure-Python CPU (standing in for arbitration, memory and cost updates),
+plus an advance every 10 events. Events are routed in batches of 1000
+with submit_many(). Scaling needs as many free cores as shards.
+"""
+import asyncio
+import os
+import sys
+import time
+
+from fsm_orchestrator.core.models import Event
+from fsm_orchestrator.core.orchestrator import Orchestrator
+from fsm_orchestrator.core.sharding import ShardedOrchestrator
+from fsm_orchestrator.core.workflow import compile_workflow
+
+PROJECTS = 200
+EVENTS_PER_PROJECT = 500
+BATCH = 1000
+STATES = ("Concept", "Design", "Code", "Review")
+
+
+def workflow():
+    return compile_workflow({
+        "name": "bench", "version": "1", "initial": STATES[0],
+        "states": [{"name": s} for s in STATES],
+        "transitions": [
+            {"from_state": a, "to_state": b, "confidence": 0.9}
+            for a, b in zip(STATES, STATES[1:] + STATES[:1])
+        ],
+    }, allow_cycles=True)
+
+
+def burn(project_id, event):
+    total = 0
+    for i in range(1200):  # ~50 us
+        total += i * i
+    return total
+
+
+def register(orchestrator):
+    orchestrator.register_handler("work", burn)
+
+
+def events():
+    for i in range(EVENTS_PER_PROJECT):
+        for p in range(PROJECTS):
+            kind = "advance" if i % 10 == 9 else "work"
+            yield Event(type=kind, payload=None, project_id=f"p{p}")
+
+
+def batches():
+    batch = []
+    for event in events():
+        batch.append(event)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def single():
+    orch = Orchestrator(workflow(), queue_size=10_000)
+    register(orch)
+    start = time.perf_counter()
+    for batch in batches():
+        for event in batch:
+            await orch.submit(event)
+    await orch.drain()
+    elapsed = time.perf_counter() - start
+    await orch.shutdown()
+    return elapsed
+
+
+def sharded(n):
+    with ShardedOrchestrator(workflow(), shards=n, setup=register, queue_size=10_000) as orch:
+        orch.drain()  # wait for the processes to start
+        start = time.perf_counter()
+        for batch in batches():
+            orch.submit_many(batch)
+        orch.drain()
+        return time.perf_counter() - start
+
+
+def main(shard_counts):
+    total = PROJECTS * EVENTS_PER_PROJECT
+    print(f"{os.cpu_count()} CPUs, {total:,} events")
+    t = asyncio.run(single())
+    print(f"{'in-process':<12} {total / t:>10,.0f} events/s ({t:.2f} s)")
+    for n in shard_counts:
+        t = sharded(n)
+        print(f"{f'{n} shards':<12} {total / t:>10,.0f} events/s ({t:.2f} s)")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or sorted({1, 2, os.cpu_count() or 1}))
@@ -0,0 +1,99 @@
+"""
+Cold-start benchmark for orchestrator pods and the v7 CLI.
+Run from the repo root: python -m benchmarks.bench_startup
+
+Orchestrator: rebuilding the FSM with add_state/add_transition vs loading
+a compiled artifact. CLI: time to the REPL banner (after) vs banner plus
+compiling all five LangGraph graphs (what the CLI paid before); skipped
+when the v7 dependencies are not installed.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fsm_orchestrator.core.fsm import HierarchicalFSM, State, Transition
+from fsm_orchestrator.core.orchestrator import Orchestrator
+from fsm_orchestrator.core.workflow import compile_workflow, load_artifact, save_artifact
+
+N_STATES = 1_000
+FANOUT = 8
+
+
+def make_definition():
+    # Layered DAG: each state points at states further down the chain,
+    # grouped ten at a time under transition-free parent states.
+    states = [{"name": f"G{g}"} for g in range(N_STATES // 10)]
+    states += [{"name": f"S{i}", "parent": f"G{i // 10}"} for i in range(N_STATES)]
+    transitions = [
+        {"from_state": f"S{i}", "to_state": f"S{j}", "confidence": 0.9}
+        for i in range(N_STATES) for j in range(i + 1, min(N_STATES, i + 1 + FANOUT))
+    ]
+    return {"name": "bench", "version": "1", "initial": "S0", "states": states, "transitions": transitions}
+
+
+def rebuild(definition):
+    fsm = HierarchicalFSM()
+    for spec in definition["states"]:
+        fsm.add_state(spec["name"], State(), parent=spec.get("parent"))
+    for spec in definition["transitions"]:
+        fsm.add_transition(Transition(spec["from_state"], spec["to_state"], spec["confidence"]))
+    for name in fsm.states:  # first tick touches every state's outgoing set
+        fsm.outgoing(name)
+    return fsm
+
+
+def timed(fn, reps=5):
+    best = float("inf")
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_orchestrator():
+    definition = make_definition()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.fsmc")
+        save_artifact(compile_workflow(definition), path)
+        before = timed(lambda: rebuild(definition))
+        load = timed(lambda: load_artifact(path))
+        workflow = load_artifact(path)
+        per_project = timed(lambda: Orchestrator(workflow))
+    n_transitions = len(definition["transitions"])
+    print(f"orchestrator ({N_STATES} states, {n_transitions} transitions)")
+    print(f"  rebuild per Orchestrator (before):      {before * 1e3:8.2f} ms")
+    print(f"  load artifact once per process (after): {load * 1e3:8.2f} ms")
+    print(f"  Orchestrator from loaded artifact:      {per_project * 1e3:8.2f} ms")
+
+
+def bench_cli():
+    cli_dir = os.path.join(os.path.dirname(__file__), "..", "v7_orchestrator")
+    try:
+        import langgraph  # noqa: F401
+        import langchain_google_genai  # noqa: F401
+    except ImportError:
+        print("cli: skipped (v7_orchestrator requirements not installed)")
+        return
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "bench"))
+
+    def banner():
+        subprocess.run([sys.executable, "main.py"], cwd=cli_dir, input=b"", env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+
+    def eager():
+        code = ("import main\n"
+                "for phase in main.GRAPH_FACTORIES: main.get_app(phase)\n")
+        subprocess.run([sys.executable, "-c", code], cwd=cli_dir, input=b"", env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+
+    print("cli")
+    print(f"  banner + compile all graphs (before): {timed(eager, 3) * 1e3:8.1f} ms")
+    print(f"  banner with lazy graphs (after):      {timed(banner, 3) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    bench_orchestrator()
+    bench_cli()
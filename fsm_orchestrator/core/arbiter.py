@@ -1,27 +1,188 @@
 """
 Transition arbitration logic for resolving agent proposals.
-Implements: scoring and selection of transitions.
+Implements: scoring and selection of transitions, single and batched,
+streaming top-k ranking, and named weight profiles.
 """
-from typing import List
+import heapq
+import math
+from itertools import chain
+from operator import attrgetter, itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
 from .models import TransitionProposal
 
+# Order of the feature columns in packed proposal arrays.
+FEATURES = ("urgency", "dependency", "user_intent", "confidence")
+DEFAULT_WEIGHTS = {"urgency": 0.3, "dependency": 0.4, "user_intent": 0.3, "confidence": 0.0}
+# Named weight profiles; missing keys fall back to DEFAULT_WEIGHTS.
+WEIGHT_PROFILES = {
+    "default": DEFAULT_WEIGHTS,
+    "crunch": {"urgency": 0.5, "dependency": 0.4, "user_intent": 0.1},
+    "exploration": {"urgency": 0.1, "dependency": 0.3, "user_intent": 0.6},
+}
+_feature_getter = attrgetter(*FEATURES)
+_by_score = itemgetter(0)
+
+
 class TransitionArbiter:
     """
     Scores and selects among competing transition proposals.
     Implements: urgency/dependency/user_intent weighted scoring.
     """
-    def score(self, proposal: TransitionProposal) -> float:
-        """Score a proposal based on weighted factors (urgency 0.3, dependency 0.4, user_intent 0.3)."""
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 profiles: Optional[Dict[str, Dict[str, float]]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.profiles = {
+            name: dict(DEFAULT_WEIGHTS, **profile)
+            for name, profile in dict(WEIGHT_PROFILES, **(profiles or {})).items()
+        }
+        # project_id or phase -> profile name
+        self.assignments: Dict[str, str] = {}
+
+    def assign_profile(self, key: str, profile: str):
+        """Use a named weight profile for a project id or a phase name."""
+        if profile not in self.profiles:
+            raise KeyError(f"Unknown weight profile: {profile}")
+        self.assignments[key] = profile
+
+    def weights_for(self, project_id=None, phase: Optional[str] = None) -> Dict[str, float]:
+        """Resolve weights: project assignment, then phase assignment, then the arbiter default."""
+        for key in (project_id, phase):
+            if key is not None and key in self.assignments:
+                return self.profiles[self.assignments[key]]
+        return self.weights
+
+    def weight_vector(self, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Return weights as a column vector aligned with FEATURES."""
+        merged = dict(self.weights, **(weights or {}))
+        return np.array([merged[f] for f in FEATURES], dtype=np.float64)
+
+    def score(self, proposal: TransitionProposal, weights: Optional[Dict[str, float]] = None) -> float:
+        """
+        Score a proposal based on weighted factors (urgency 0.3, dependency 0.4,
+        user_intent 0.3 by default); partial `weights` override the arbiter's.
+        """
+        return self._score(proposal, self.weights if weights is None else dict(self.weights, **weights))
+
+    @staticmethod
+    def _score(proposal: TransitionProposal, w: Dict[str, float]) -> float:
+        # w holds every feature (resolved profile or merged weights)
         return (
-            0.3 * proposal.urgency +
-            0.4 * proposal.dependency +
-            0.3 * proposal.user_intent
+            w["urgency"] * proposal.urgency +
+            w["dependency"] * proposal.dependency +
+            w["user_intent"] * proposal.user_intent +
+            w["confidence"] * proposal.confidence
         )
 
-    def select(self, project_id, proposals: List[TransitionProposal]):
-        """Select the winning transition proposal for a project based on highest score."""
-        if not proposals:
-            return None
-        scored = [(self.score(p), p) for p in proposals]
-        scored.sort(reverse=True, key=lambda x: x[0])
-        return scored[0][1]
+    @staticmethod
+    def _best(proposals: Iterable[TransitionProposal], w: Dict[str, float]) -> Optional[TransitionProposal]:
+        # one pass with the weights hoisted; strict > keeps the first of tied proposals
+        wu, wd, wi, wc = w["urgency"], w["dependency"], w["user_intent"], w["confidence"]
+        best, best_score = None, -math.inf
+        for p in proposals:
+            s = wu * p.urgency + wd * p.dependency + wi * p.user_intent + wc * p.confidence
+            if s > best_score or best is None:
+                best, best_score = p, s
+        return best
+
+    def select(self, project_id, proposals: Iterable[TransitionProposal], phase: Optional[str] = None):
+        """Select the winning transition proposal for a project; the first one wins ties."""
+        return self._best(proposals, self.weights_for(project_id, phase))
+
+    def top_k(self, project_id, proposals: Iterable[TransitionProposal], k: int = 3,
+              phase: Optional[str] = None) -> List[Tuple[float, TransitionProposal]]:
+        """
+        Return the k best (score, proposal) pairs, best first, in O(n log k).
+        Proposals may be any iterable, including a generator; ties keep
+        arrival order.
+        """
+        if k <= 0:
+            return []
+        weights = self.weights_for(project_id, phase)
+        score = self._score
+        # nlargest keeps a k-sized heap and is stable, so earlier proposals win ties
+        return heapq.nlargest(k, ((score(p, weights), p) for p in proposals), key=_by_score)
+
+    @staticmethod
+    def pack(proposals_by_project: Dict[str, Iterable[TransitionProposal]]
+             ) -> Tuple[List[str], List[TransitionProposal], np.ndarray, np.ndarray]:
+        """
+        Flatten proposals for many projects into one (n, len(FEATURES)) array.
+        Returns (project_ids, proposals, features, starts) where project i owns
+        rows starts[i]:starts[i+1] (the last segment runs to the end).
+        """
+        project_ids: List[str] = []
+        flat: List[TransitionProposal] = []
+        starts: List[int] = []
+        for project_id, proposals in proposals_by_project.items():
+            project_ids.append(project_id)
+            starts.append(len(flat))
+            flat.extend(proposals)
+        features = np.fromiter(
+            chain.from_iterable(map(_feature_getter, flat)),
+            dtype=np.float64, count=len(flat) * len(FEATURES),
+        ).reshape(len(flat), len(FEATURES))
+        return project_ids, flat, features, np.array(starts, dtype=np.intp)
+
+    @staticmethod
+    def segment_argmax(scores: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Return the row index of the best score in each segment, or -1 for an
+        empty segment. Ties go to the lowest row index.
+        """
+        n = len(scores)
+        ends = np.append(starts[1:], n)
+        winners = np.full(len(starts), -1, dtype=np.intp)
+        nonempty = ends > starts
+        if not nonempty.any():
+            return winners
+        seg_starts = starts[nonempty]
+        seg_max = np.maximum.reduceat(scores, seg_starts)
+        lengths = ends[nonempty] - seg_starts
+        # Segments are contiguous and cover every row once empties are dropped.
+        is_max = scores == np.repeat(seg_max, lengths)
+        rows = np.where(is_max, np.arange(n), n)
+        winners[nonempty] = np.minimum.reduceat(rows, seg_starts)
+        return winners
+
+    def select_packed(self, project_ids: List[str], features: np.ndarray, starts: np.ndarray,
+                      weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Vectorized select_batch over packed features (see pack()): returns the
+        winning row for each project, or -1 if it has no proposals. Each row
+        is scored with its project's weights; `weights` (possibly partial)
+        overrides them for every project in the call.
+        """
+        if weights is not None:
+            return self.segment_argmax(features @ self.weight_vector(weights), starts)
+        # one weight row per distinct profile, gathered per proposal row
+        rows: Dict[int, int] = {}
+        table: List[np.ndarray] = []
+        owner = np.empty(len(project_ids), dtype=np.intp)
+        for i, project_id in enumerate(project_ids):
+            w = self.weights_for(project_id)
+            if id(w) not in rows:
+                rows[id(w)] = len(table)
+                table.append(self.weight_vector(w))
+            owner[i] = rows[id(w)]
+        lengths = np.diff(np.append(starts, len(features)))
+        per_row = np.asarray(table).reshape(-1, len(FEATURES))[np.repeat(owner, lengths)]
+        return self.segment_argmax(np.einsum('ij,ij->i', features, per_row), starts)
+
+    def select_batch(self, proposals_by_project: Dict[str, Iterable[TransitionProposal]],
+                     weights: Optional[Dict[str, float]] = None
+                     ) -> Dict[str, Optional[TransitionProposal]]:
+        """
+        Select the winning proposal for every project.
+        `weights` (possibly partial) overrides the weights for every project
+        in the call; otherwise each project is scored with its assigned
+        profile. Proposal objects are scored in a plain loop: reading their
+        fields into an array costs as much as scoring them, so the
+        vectorized path (select_packed) only pays off for features that are
+        already packed.
+        """
+        merged = None if weights is None else dict(self.weights, **weights)
+        return {
+            project_id: self._best(proposals, merged or self.weights_for(project_id))
+            for project_id, proposals in proposals_by_project.items()
+        }
@@ -0,0 +1,91 @@
+"""
+Token-budgeted context assembly for MRAG.
+Implements: cached per-message token counts, de-duplication across
+decisions / hot window / retrieved summaries, and greedy packing by
+priority into a fixed prompt budget with a per-section accounting.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+# Sections are packed decisions -> hot -> retrieved, but the packed
+# context keeps the conventional hot + tagged + retrieved order.
+_OUTPUT_ORDER = ("hot", "decisions", "retrieved")
+
+
+@lru_cache(maxsize=65_536)
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), cached per distinct text."""
+    return (len(text) + 3) // 4
+
+
+def message_text(message: dict) -> str:
+    """The text a message contributes to the prompt (content, or a warm summary)."""
+    return message.get("content") or message.get("summary") or ""
+
+
+class AssembledContext(NamedTuple):
+    messages: List[dict]
+    tokens: int
+    budget: int
+    breakdown: Dict[str, Dict[str, int]]  # section -> included / dropped / duplicates / tokens
+
+
+class ContextAssembler:
+    """
+    Packs decisions, hot messages and retrieved summaries into a token budget.
+    Decisions are packed first, then the hot window newest-first (stopping at
+    the first message that does not fit, so the window stays contiguous),
+    then retrieved summaries in rank order (skipping any that do not fit).
+    Messages carrying a `token_count` use it; others are counted once per
+    distinct text by `counter`.
+    """
+    def __init__(self, token_budget: int, counter: Callable[[str], int] = estimate_tokens,
+                 overhead: int = 0):
+        if token_budget <= 0:
+            raise ValueError("token_budget must be positive")
+        self.token_budget = token_budget
+        self.counter = counter
+        self.overhead = overhead  # per-message separator / role tokens
+
+    def tokens(self, message: dict) -> int:
+        count = message.get("token_count")
+        if count is None:
+            count = self.counter(message_text(message))
+        return count + self.overhead
+
+    def assemble(self, hot: Sequence[dict] = (), decisions: Sequence[dict] = (),
+                 retrieved: Sequence[dict] = (), token_budget: Optional[int] = None) -> AssembledContext:
+        """Return the packed context and its accounting."""
+        budget = token_budget or self.token_budget
+        remaining = budget
+        seen_ids, seen_texts = set(), set()
+        packed: Dict[str, List[dict]] = {}
+        breakdown = {}
+        for section, items, contiguous in (
+            ("decisions", decisions, False),
+            ("hot", list(reversed(hot)), True),
+            ("retrieved", retrieved, False),
+        ):
+            kept: List[dict] = []
+            stats = {"included": 0, "dropped": 0, "duplicates": 0, "tokens": 0}
+            full = False
+            for message in items:
+                text = message_text(message)
+                if id(message) in seen_ids or text in seen_texts:
+                    stats["duplicates"] += 1
+                    continue
+                cost = self.tokens(message)
+                if full or cost > remaining:
+                    stats["dropped"] += 1
+                    full = full or contiguous
+                    continue
+                seen_ids.add(id(message))
+                seen_texts.add(text)
+                kept.append(message)
+                remaining -= cost
+                stats["included"] += 1
+                stats["tokens"] += cost
+            packed[section] = kept[::-1] if contiguous else kept
+            breakdown[section] = stats
+        messages = [m for section in _OUTPUT_ORDER for m in packed[section]]
+        return AssembledContext(messages, budget - remaining, budget, breakdown)
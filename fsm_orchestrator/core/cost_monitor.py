@@ -1,36 +1,263 @@
 """
 Cost monitoring and enforcement for token and $ budgets.
-Implements: cost tracking and budget checks.
+Implements: cost tracking, budget checks, atomic token reservations, and
+rolling per-minute/hour/week token windows per project and per agent
+(with recovery times for back-pressure), and model-aware dollar pricing.
 """
+import threading
+import time
 from collections import defaultdict
+from itertools import count
+from ..util.cost import PricingEngine, SpendLedger
+
+# window name -> (number of buckets, bucket width in seconds)
+WINDOWS = {
+    "minute": (60, 1.0),
+    "hour": (60, 60.0),
+    "week": (7 * 24, 3600.0),
+}
+
+
+class RollingCounter:
+    """
+    Ring buffer of fixed-width time buckets with a running total.
+    add() and total() are O(1) amortized; memory is fixed at n_buckets.
+    """
+    __slots__ = ("width", "buckets", "head", "sum")
+
+    def __init__(self, n_buckets, width):
+        self.width = width
+        self.buckets = [0] * n_buckets
+        self.head = None  # absolute index of the newest bucket
+        self.sum = 0
+
+    def _advance(self, now):
+        idx = int(now // self.width)
+        if self.head is None:
+            self.head = idx
+        elif idx > self.head:
+            n = len(self.buckets)
+            if idx - self.head >= n:
+                self.buckets = [0] * n
+                self.sum = 0
+            else:
+                for i in range(self.head + 1, idx + 1):
+                    self.sum -= self.buckets[i % n]
+                    self.buckets[i % n] = 0
+            self.head = idx
+        # late samples (idx < head) land in the newest bucket
+
+    def add(self, now, value):
+        self._advance(now)
+        self.buckets[self.head % len(self.buckets)] += value
+        self.sum += value
+
+    def total(self, now):
+        self._advance(now)
+        return self.sum
+
+    def recovers_at(self, now, amount):
+        """Earliest time the total has dropped by `amount` as buckets age out, or None if it never will."""
+        self._advance(now)
+        if amount <= 0:
+            return now
+        if amount > self.sum:
+            return None
+        n = len(self.buckets)
+        freed = 0
+        for idx in range(self.head - n + 1, self.head + 1):  # oldest bucket first
+            freed += self.buckets[idx % n]
+            if freed >= amount:
+                return (idx + n) * self.width
+        return None
+
+
+def _new_windows():
+    return {name: RollingCounter(n, width) for name, (n, width) in WINDOWS.items()}
+
+
+class Reservation:
+    """Tokens held against a project's budget until committed or released."""
+    __slots__ = ("id", "project_id", "tokens", "settled")
+
+    def __init__(self, id, project_id, tokens):
+        self.id = id
+        self.project_id = project_id
+        self.tokens = tokens
+        self.settled = False
+
 
 class CostMonitor:
     """
     Tracks and enforces project cost budgets.
+    Safe to share between worker threads: each project maps to one of
+    `stripes` locks, so unrelated projects rarely contend. Critical sections
+    are O(1) and never block on I/O, so the monitor can also be called from
+    an asyncio event loop directly.
     """
-    def __init__(self, token_budget=100000, dollar_budget=100.0):
+    def __init__(self, token_budget=100000, dollar_budget=100.0, stripes=64, clock=time.time,
+                 pricing: PricingEngine = None):
         # Example budgets; adjust as needed
         self.token_budget = token_budget
         self.dollar_budget = dollar_budget
-        self.usage = defaultdict(lambda: {"tokens": 0, "dollars": 0.0})
+        self.usage = defaultdict(lambda: {"tokens": 0, "dollars": 0.0, "reserved": 0})
+        # rolling token windows: project_id / (project_id, agent_id) -> window name -> counter
+        self.windows = defaultdict(_new_windows)
+        self.clock = clock
+        self.pricing = pricing or PricingEngine()
+        self.ledger = SpendLedger()
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._reservation_ids = count(1)
+
+    def _lock(self, project_id) -> threading.Lock:
+        return self._locks[hash(project_id) % len(self._locks)]
 
     def record(self, project_id, agent_id, tokens, dollars):
         """Record token and $ usage for a project/agent."""
-        self.usage[project_id]["tokens"] += tokens
-        self.usage[project_id]["dollars"] += dollars
+        with self._lock(project_id):
+            usage = self.usage[project_id]
+            usage["tokens"] += tokens
+            usage["dollars"] += dollars
+            self._add_to_windows(project_id, agent_id, tokens)
+
+    def will_exceed(self, project_id, est_tokens, est_dollars=None, model=None) -> bool:
+        """
+        Return True if the estimated tokens would exceed the budget for the project,
+        or if the estimated spend would exceed the dollar budget. Without
+        est_dollars, a model name prices est_tokens at its higher rate.
+        Outstanding reservations count as used.
+        """
+        if est_dollars is None and model is not None:
+            est_dollars = self.pricing.estimate(model, est_tokens)
+        with self._lock(project_id):
+            usage = self.usage[project_id]
+            if (usage["tokens"] + usage["reserved"] + est_tokens) > self.token_budget:
+                return True
+            return est_dollars is not None and usage["dollars"] + est_dollars > self.dollar_budget
+
+    def record_usage(self, project_id, agent_id, model, input_tokens, output_tokens) -> float:
+        """Price a call from its model and token counts, record it, and return the dollars."""
+        dollars = self.pricing.price(model, input_tokens, output_tokens)
+        self.record(project_id, agent_id, input_tokens + output_tokens, dollars)
+        self.ledger.add(project_id, agent_id, model, input_tokens, output_tokens, dollars)
+        return dollars
+
+    def reserve(self, project_id, est_tokens):
+        """
+        Atomically hold est_tokens against the project's budget.
+        Returns a Reservation, or None if the budget cannot cover it.
+        """
+        with self._lock(project_id):
+            usage = self.usage[project_id]
+            if usage["tokens"] + usage["reserved"] + est_tokens > self.token_budget:
+                return None
+            usage["reserved"] += est_tokens
+        return Reservation(next(self._reservation_ids), project_id, est_tokens)
+
+    def commit(self, reservation: Reservation, agent_id, tokens, dollars):
+        """Settle a reservation with the actual usage; any unused part is returned."""
+        with self._lock(reservation.project_id):
+            if reservation.settled:
+                raise ValueError(f"Reservation {reservation.id} already settled")
+            reservation.settled = True
+            usage = self.usage[reservation.project_id]
+            usage["reserved"] -= reservation.tokens
+            usage["tokens"] += tokens
+            usage["dollars"] += dollars
+            self._add_to_windows(reservation.project_id, agent_id, tokens)
+
+    def commit_usage(self, reservation: Reservation, agent_id, model, input_tokens, output_tokens) -> float:
+        """Settle a reservation with priced usage; returns the dollars charged."""
+        dollars = self.pricing.price(model, input_tokens, output_tokens)
+        self.commit(reservation, agent_id, input_tokens + output_tokens, dollars)
+        self.ledger.add(reservation.project_id, agent_id, model, input_tokens, output_tokens, dollars)
+        return dollars
+
+    def release(self, reservation: Reservation):
+        """Cancel a reservation without recording usage (e.g. the task failed before running)."""
+        with self._lock(reservation.project_id):
+            if reservation.settled:
+                return
+            reservation.settled = True
+            self.usage[reservation.project_id]["reserved"] -= reservation.tokens
+
+    def reserved(self, project_id) -> int:
+        """Tokens held by outstanding reservations (work dispatched but not yet settled)."""
+        with self._lock(project_id):
+            return self.usage[project_id]["reserved"] if project_id in self.usage else 0
+
+    def export_project(self, project_id) -> dict:
+        """
+        Detach a project's usage and rolling windows (its own and its
+        agents') for handoff to another process. Ledger rows stay here:
+        they record spend made by this process. Refuses while reservations
+        are outstanding, since they must be settled where they were made.
+        """
+        with self._lock(project_id):
+            usage = self.usage.get(project_id)
+            if usage is not None and usage["reserved"]:
+                raise ValueError(f"Project {project_id} has {usage['reserved']} tokens reserved")
+            self.usage.pop(project_id, None)
+            keys = [key for key in self.windows
+                    if key == project_id or (isinstance(key, tuple) and key[0] == project_id)]
+            windows = [[None if key == project_id else key[1],
+                        {name: [c.head, list(c.buckets)] for name, c in self.windows.pop(key).items()}]
+                       for key in keys]
+        return {"tokens": usage["tokens"] if usage else 0,
+                "dollars": usage["dollars"] if usage else 0.0,
+                "windows": windows}
+
+    def import_project(self, project_id, state: dict):
+        """Adopt usage exported by export_project(); imported windows replace local ones."""
+        with self._lock(project_id):
+            usage = self.usage[project_id]
+            usage["tokens"] += state["tokens"]
+            usage["dollars"] += state["dollars"]
+            for agent_id, counters in state["windows"]:
+                key = project_id if agent_id is None else (project_id, agent_id)
+                for name, (head, buckets) in counters.items():
+                    counter = self.windows[key][name]
+                    counter.head, counter.buckets, counter.sum = head, list(buckets), sum(buckets)
+
+    def _add_to_windows(self, project_id, agent_id, tokens):
+        # caller holds the project's stripe lock
+        now = self.clock()
+        for key in (project_id, (project_id, agent_id)):
+            for counter in self.windows[key].values():
+                counter.add(now, tokens)
+
+    def window_tokens(self, project_id, window="week", agent_id=None) -> int:
+        """Return tokens used in the trailing minute/hour/week for a project or one of its agents."""
+        key = project_id if agent_id is None else (project_id, agent_id)
+        with self._lock(project_id):
+            if key not in self.windows:
+                return 0
+            return self.windows[key][window].total(self.clock())
 
-    def will_exceed(self, project_id, est_tokens) -> bool:
+    def time_to_recover(self, project_id, tokens, window="week", agent_id=None):
         """
-        Return True if the estimated tokens would exceed the budget for the project.
+        Seconds until at least `tokens` of the trailing window's usage has
+        rolled off, or None if the window does not hold that many tokens.
         """
-        used = self.usage[project_id]["tokens"]
-        return (used + est_tokens) > self.token_budget
+        key = project_id if agent_id is None else (project_id, agent_id)
+        with self._lock(project_id):
+            if tokens <= 0:
+                return 0.0
+            if key not in self.windows:
+                return None
+            now = self.clock()
+            at = self.windows[key][window].recovers_at(now, tokens)
+        return None if at is None else max(at - now, 0.0)
 
     def report(self, project_id) -> dict:
         """Return a cost report for the project."""
+        with self._lock(project_id):
+            usage = dict(self.usage[project_id])
         return {
-            "tokens_used": self.usage[project_id]["tokens"],
-            "dollars_used": self.usage[project_id]["dollars"],
+            "tokens_used": usage["tokens"],
+            "tokens_reserved": usage["reserved"],
+            "tokens_this_week": self.window_tokens(project_id, "week"),
+            "dollars_used": usage["dollars"],
             "token_budget": self.token_budget,
             "dollar_budget": self.dollar_budget,
         }
@@ -1,31 +1,406 @@
 """
 Deadlock detection for FSM transitions.
-Implements: loop detection and escalation.
+Implements: loop detection and escalation over a bounded sliding window,
+with an incrementally maintained SCC view of the live transition graph.
 """
-from collections import defaultdict, Counter
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict, deque, Counter
+from itertools import count
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+_component_ids = count()
+
+
+def tarjan_scc(nodes: Iterable[Hashable], succ: Dict[Hashable, Counter]) -> List[Set[Hashable]]:
+    """Iterative Tarjan SCC over the subgraph induced by `nodes`."""
+    nodes = set(nodes)
+    index: Dict[Hashable, int] = {}
+    low: Dict[Hashable, int] = {}
+    on_stack: Set[Hashable] = set()
+    stack: List[Hashable] = []
+    components: List[Set[Hashable]] = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(succ.get(root, ())))]
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in nodes:
+                    continue
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(succ.get(child, ()))))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+class _LiveGraph:
+    """
+    Windowed transition graph for one project with incrementally maintained
+    strongly connected components. Components carry a topological order
+    (Pearce-Kelly): an edge that agrees with the order cannot close a cycle
+    and costs O(1); otherwise only the components ordered between its ends
+    are searched, and they are merged (new cycle) or reordered. Deleting
+    the last copy of an edge re-runs Tarjan on the one component it
+    belonged to.
+    """
+    __slots__ = ("succ", "pred", "comp", "members", "order", "at", "positions", "top", "weight",
+                 "loop_threshold", "hot")
+
+    def __init__(self, loop_threshold: Optional[int] = None):
+        self.succ: Dict[Hashable, Counter] = defaultdict(Counter)
+        self.pred: Dict[Hashable, Counter] = defaultdict(Counter)
+        self.comp: Dict[Hashable, int] = {}
+        self.members: Dict[int, Set[Hashable]] = {}
+        self.order: Dict[int, float] = {}  # component -> unique position; edges always go up
+        self.at: Dict[float, int] = {}  # position -> component
+        self.positions: List[float] = []  # sorted positions in use
+        self.top = 0.0  # highest position handed out
+        self.weight: Counter = Counter()  # component -> traversals of its internal edges
+        self.loop_threshold = loop_threshold
+        self.hot: Set[int] = set()  # components looped through >= loop_threshold times
+
+    def laps(self, cid) -> int:
+        """Approximate number of times the component was looped through."""
+        members = self.members[cid]
+        if len(members) == 1:
+            node = next(iter(members))
+            return self.succ[node].get(node, 0)  # a self-loop is the only way around
+        return self.weight[cid] // len(members)
+
+    def _refresh(self, cid):
+        if self.loop_threshold is not None and cid in self.members \
+                and self.laps(cid) >= self.loop_threshold:
+            self.hot.add(cid)
+        else:
+            self.hot.discard(cid)
+
+    def _node(self, node, near=None, above=True):
+        """Component of node; a new node is positioned right next to `near` so its first edge agrees."""
+        if node not in self.comp:
+            position = None
+            if near is not None and near in self.comp:
+                anchor = self.order[self.comp[near]]
+                i = bisect_left(self.positions, anchor)
+                if above:
+                    bound = self.positions[i + 1] if i + 1 < len(self.positions) else anchor + 2.0
+                else:
+                    bound = self.positions[i - 1] if i > 0 else anchor - 2.0
+                position = (anchor + bound) / 2
+                if position in (anchor, bound):  # no float between them
+                    position = None
+            if position is None:
+                self.top += 1.0
+                position = self.top
+            self.top = max(self.top, position)
+            self._install({node}, position, count_weight=False)
+        return self.comp[node]
+
+    def add(self, u, v):
+        cu = self._node(u, near=v, above=False)
+        cv = self._node(v, near=u)
+        self.succ[u][v] += 1
+        self.pred[v][u] += 1
+        if cu == cv:
+            self.weight[cu] += 1
+            self._refresh(cu)
+            return
+        lb, ub = self.order[cv], self.order[cu]
+        if ub < lb:
+            return  # agrees with the topological order: no new cycle
+        # Only components positioned in [lb, ub] can lie on a v ~> u path.
+        order, comp = self.order, self.comp
+        forward = {comp[n] for n in self._reach(v, self.succ, lambda n: order[comp[n]] <= ub)}
+        backward = {comp[n] for n in self._reach(u, self.pred, lambda n: order[comp[n]] >= lb)}
+        cycle = forward & backward  # non-empty exactly when v already reaches u
+        slots = sorted(order[c] for c in forward | backward)
+        before = sorted(backward - cycle, key=order.__getitem__)
+        after = sorted(forward - cycle, key=order.__getitem__)
+        merged = set()
+        for cid in cycle:
+            merged |= self._retire(cid)
+        moved = before + after
+        for cid in moved:
+            self._unplace(cid)
+        for cid, slot in zip(moved, slots[:len(before)] + slots[len(slots) - len(after):]):
+            self._place(cid, slot)
+        if cycle:
+            self._install(merged, slots[len(before)])
+
+    def remove(self, u, v):
+        cu = self.comp[u]
+        same = cu == self.comp[v]
+        self.succ[u][v] -= 1
+        self.pred[v][u] -= 1
+        if same:
+            self.weight[cu] -= 1
+        if self.succ[u][v] <= 0:
+            del self.succ[u][v]
+            del self.pred[v][u]
+            if same and len(self.members[cu]) > 1:
+                self._split(cu)
+        if cu in self.members:
+            self._refresh(cu)
+        for node in (u, v):
+            self._drop_if_isolated(node)
+
+    def _split(self, cid):
+        position = self.order[cid]
+        nodes = self._retire(cid)
+        pieces = tarjan_scc(nodes, self.succ)[::-1]  # Tarjan emits sinks first
+        if len(pieces) == 1:
+            self._install(pieces[0], position)
+            return
+        lo = max((self.order[self.comp[p]] for n in nodes for p in self.pred[n] if p not in nodes),
+                 default=None)
+        hi = min((self.order[self.comp[s]] for n in nodes for s in self.succ[n] if s not in nodes),
+                 default=None)
+        k = len(pieces)
+        if hi is None:  # nothing downstream: go above everything
+            lo, hi = self.top, self.top + k + 1
+            self.top = hi
+        elif lo is None:
+            lo = hi - (k + 1)
+        step = (hi - lo) / (k + 1)
+        positions = [lo + step * i for i in range(1, k + 1)]
+        clash = not lo < positions[0] or not positions[-1] < hi or len(set(positions)) < k \
+            or any(p in self.at for p in positions)
+        for piece, p in zip(pieces, positions):
+            self._install(piece, p)
+        if clash:  # float gaps exhausted or taken
+            self._renumber()
+
+    def _renumber(self):
+        """Reassign positions 1..n in a fresh topological order of the components."""
+        indegree = Counter()
+        for cid, nodes in self.members.items():
+            for n in nodes:
+                for m in self.succ[n]:
+                    if self.comp[m] != cid:
+                        indegree[self.comp[m]] += 1
+        ready = [cid for cid in self.members if not indegree[cid]]
+        position = 0.0
+        self.at.clear()
+        self.positions = [float(i) for i in range(1, len(self.members) + 1)]
+        while ready:
+            cid = ready.pop()
+            position += 1.0
+            self.order[cid] = position
+            self.at[position] = cid
+            for n in self.members[cid]:
+                for m in self.succ[n]:
+                    target = self.comp[m]
+                    if target != cid:
+                        indegree[target] -= 1
+                        if not indegree[target]:
+                            ready.append(target)
+        self.top = position
+
+    def _place(self, cid, position):
+        self.order[cid] = position
+        if position not in self.at:
+            insort(self.positions, position)
+        self.at[position] = cid
+
+    def _unplace(self, cid):
+        position = self.order.pop(cid)
+        if self.at.get(position) == cid:
+            del self.at[position]
+            del self.positions[bisect_left(self.positions, position)]
+
+    def _retire(self, cid) -> Set[Hashable]:
+        self.weight.pop(cid, None)
+        self.hot.discard(cid)
+        self._unplace(cid)
+        return self.members.pop(cid)
+
+    def _install(self, nodes, position, count_weight=True):
+        cid = next(_component_ids)
+        self.members[cid] = nodes
+        self._place(cid, position)
+        for n in nodes:
+            self.comp[n] = cid
+        if count_weight:
+            self.weight[cid] = sum(
+                c for n in nodes for m, c in self.succ[n].items() if m in nodes
+            )
+            self._refresh(cid)
+
+    def components(self) -> List[Tuple[FrozenSet[Hashable], int]]:
+        """Return (states, laps) for every component at or above the loop threshold."""
+        return [(frozenset(self.members[cid]), self.laps(cid)) for cid in self.hot]
+
+    def _reach(self, start, adjacency, allowed):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for nxt in adjacency.get(stack.pop(), ()):
+                if nxt not in seen and allowed(nxt):
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return seen
+
+    def _drop_if_isolated(self, node):
+        if node in self.comp and not self.succ.get(node) and not self.pred.get(node):
+            cid = self.comp.pop(node)
+            self.succ.pop(node, None)
+            self.pred.pop(node, None)
+            self.members[cid].discard(node)
+            if not self.members[cid]:
+                self._retire(cid)
+
+
+class _ProjectWindow:
+    """Rolling counts of edges and cycles observed for one project."""
+    __slots__ = ("entries", "counts", "hot", "path", "graph")
+
+    def __init__(self, max_cycle_length, loop_threshold):
+        self.entries = deque()  # (timestamp, edge, cycle or None), oldest first
+        self.counts = Counter()  # edge or cycle -> occurrences inside the window
+        self.hot = set()  # patterns at or above the threshold
+        self.path = deque(maxlen=max_cycle_length + 1)  # recent contiguous states
+        # SCC upkeep only pays off when loops are being detected
+        self.graph = _LiveGraph(loop_threshold) if loop_threshold is not None else None
+
 
 class DeadlockDetector:
     """
     Detects repeated transitions and escalates deadlocks.
+    A deadlock is K or more occurrences, inside the window, of the same edge
+    or of the same cycle of states (A -> B -> C -> A, up to max_cycle_length
+    states). Each observe() is O(max_cycle_length), detect() is O(1)
+    amortized, and memory per project is bounded by the window.
+    With loop_threshold set, any strongly connected component of the
+    windowed transition graph looped through that many times (e.g. a
+    designer <-> engineer ping-pong spanning several states) also counts.
     """
-    def __init__(self, threshold=3):
-        # threshold: number of identical transitions to trigger deadlock
+    def __init__(self, threshold=3, window: Optional[int] = 1000,
+                 window_seconds: Optional[float] = None, max_cycle_length: int = 8,
+                 loop_threshold: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        # threshold: number of identical transitions (or cycles) to trigger deadlock
         self.threshold = threshold
-        self.transition_history = defaultdict(list)  # project_id -> list of transitions
+        self.window = window
+        self.window_seconds = window_seconds
+        self.max_cycle_length = max_cycle_length
+        self.loop_threshold = loop_threshold
+        self.clock = clock
+        self.windows = defaultdict(lambda: _ProjectWindow(self.max_cycle_length, self.loop_threshold))
 
     def observe(self, project_id, transition):
         """Observe a transition for deadlock detection."""
-        self.transition_history[project_id].append((transition.from_state, transition.to_state))
+        w = self.windows[project_id]
+        now = self.clock()
+        src, dst = transition.from_state, transition.to_state
+        edge = (src, dst)
+        if not w.path or w.path[-1] != src:
+            w.path.clear()  # discontinuous history cannot close a cycle
+            w.path.append(src)
+        cycle = self._close_cycle(w.path, dst)
+        if cycle is not None:
+            w.path.clear()  # count each full traversal once, not every rotation
+        w.path.append(dst)
+        w.entries.append((now, edge, cycle))
+        self._add(w, edge)
+        if w.graph is not None:
+            w.graph.add(src, dst)
+        if cycle is not None:
+            self._add(w, cycle)
+        if self.window is not None:
+            while len(w.entries) > self.window:
+                self._evict(w)
+        self._expire(w, now)
 
     def detect(self, project_id) -> bool:
         """
-        Return True if a deadlock is detected for the project (K or more identical transitions).
+        Return True if a deadlock is detected for the project (K or more
+        identical transitions or cycles inside the window).
         """
-        history = self.transition_history[project_id]
-        if not history:
+        w = self.windows.get(project_id)
+        if w is None:
             return False
-        counter = Counter(history)
-        for count in counter.values():
-            if count >= self.threshold:
-                return True
-        return False
+        self._expire(w, self.clock())
+        return bool(w.hot or (w.graph is not None and w.graph.hot))
+
+    def hot_patterns(self, project_id) -> List[Tuple[Hashable, int]]:
+        """Return the edges/cycles at or above the threshold with their counts, for escalation."""
+        w = self.windows.get(project_id)
+        if w is None:
+            return []
+        self._expire(w, self.clock())
+        return [(pattern, w.counts[pattern]) for pattern in w.hot]
+
+    def loops(self, project_id) -> List[Tuple[FrozenSet[Hashable], int]]:
+        """Return (states, laps) for each SCC looped through at least loop_threshold times."""
+        w = self.windows.get(project_id)
+        if w is None or w.graph is None:
+            return []
+        self._expire(w, self.clock())
+        return w.graph.components()
+
+    def forget(self, project_id):
+        """Drop all detection state for a finished or archived project."""
+        self.windows.pop(project_id, None)
+
+    def _close_cycle(self, path, dst) -> Optional[Tuple[str, ...]]:
+        """If dst was visited recently, return the cycle it closes in canonical rotation."""
+        states = list(path)
+        for i in range(len(states) - 1, -1, -1):
+            if states[i] == dst:
+                loop = states[i:]
+                if len(loop) < 2:
+                    return None  # self-loops are covered by edge counts
+                pivot = loop.index(min(loop))
+                return ('cycle',) + tuple(loop[pivot:] + loop[:pivot])
+        return None
+
+    def _add(self, w, pattern):
+        w.counts[pattern] += 1
+        if w.counts[pattern] >= self.threshold:
+            w.hot.add(pattern)
+
+    def _remove(self, w, pattern):
+        w.counts[pattern] -= 1
+        if w.counts[pattern] < self.threshold:
+            w.hot.discard(pattern)
+        if w.counts[pattern] <= 0:
+            del w.counts[pattern]
+
+    def _evict(self, w):
+        _, edge, cycle = w.entries.popleft()
+        self._remove(w, edge)
+        if w.graph is not None:
+            w.graph.remove(*edge)
+        if cycle is not None:
+            self._remove(w, cycle)
+
+    def _expire(self, w, now):
+        if self.window_seconds is None:
+            return
+        horizon = now - self.window_seconds
+        while w.entries and w.entries[0][0] < horizon:
+            self._evict(w)
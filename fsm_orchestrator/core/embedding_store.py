@@ -0,0 +1,187 @@
+"""
+On-disk warm-memory embedding store.
+Implements: one append-only, memory-mapped vector file per project
+(float32 or float16, rows pre-normalized) with a JSON-lines sidecar for
+summaries, shared zero-copy reads across processes, and chunked exact
+top-k search straight off the mapping.
+"""
+import fcntl
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+import numpy as np
+from .vector_index import normalize_rows, top_k_indices
+
+STORE_MAGIC = b"EMBS"
+STORE_FORMAT = 1
+# magic, format version, dtype code, dimension
+_HEADER = struct.Struct("<4sHHI")
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+
+class _Project:
+    """Open handles and cached mappings for one project's files."""
+    __slots__ = ("vectors_path", "records_path", "dim", "dtype", "records", "records_offset", "mapping", "lock")
+
+    def __init__(self, directory):
+        self.vectors_path = os.path.join(directory, "vectors.bin")
+        self.records_path = os.path.join(directory, "records.jsonl")
+        self.dim: Optional[int] = None
+        self.dtype: Optional[np.dtype] = None
+        self.records: List[dict] = []
+        self.records_offset = 0  # bytes of the sidecar already parsed
+        self.mapping: Optional[np.memmap] = None
+        self.lock = threading.Lock()  # guards the fields above across threads of this process
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding store rooted at a directory, one subdirectory per
+    project holding `vectors.bin` (header + contiguous rows) and
+    `records.jsonl` (one JSON record per row, in row order).
+    Writers from any process serialize on an flock of the sidecar; readers
+    never flock and only see rows that have both a vector and a record, so a
+    torn append is invisible. Within a process, a per-project lock keeps
+    readers and writers from interleaving their bookkeeping. Rows are normalized on write, so a search is a
+    dot product over the read-only mapping and the pages stay shared in the
+    OS page cache between orchestrator processes.
+    """
+    def __init__(self, root: str, dtype: str = "float32", chunk_rows: int = 65_536):
+        self.root = root
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype not in _DTYPE_CODES:
+            raise ValueError(f"Unsupported embedding dtype {dtype!r} (use float32 or float16)")
+        self.chunk_rows = chunk_rows
+        self._projects: Dict[str, _Project] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _project(self, project_id) -> _Project:
+        project = self._projects.get(project_id)
+        if project is None:
+            with self._lock:
+                project = self._projects.get(project_id)
+                if project is None:
+                    directory = os.path.join(self.root, quote(str(project_id), safe=""))
+                    os.makedirs(directory, exist_ok=True)
+                    project = self._projects[project_id] = _Project(directory)
+        return project
+
+    def _read_header(self, project: _Project) -> bool:
+        if project.dim is not None:
+            return True
+        try:
+            with open(project.vectors_path, "rb") as f:
+                header = f.read(_HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) < _HEADER.size:
+            return False
+        magic, fmt, code, dim = _HEADER.unpack(header)
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{project.vectors_path} is not an embedding store")
+        if fmt != STORE_FORMAT:
+            raise ValueError(f"Unsupported store format {fmt} (expected {STORE_FORMAT})")
+        project.dim, project.dtype = dim, _DTYPES[code]
+        return True
+
+    def append(self, project_id, embedding: Optional[Sequence[float]], record: Optional[dict] = None) -> int:
+        """Append one embedding (None stores a zero row) and its record; returns the row number."""
+        return self.append_many(project_id, [embedding], [record or {}])[0]
+
+    def append_many(self, project_id, embeddings: Sequence[Optional[Sequence[float]]],
+                    records: Sequence[dict]) -> List[int]:
+        """Append a batch of embeddings with their records under one file lock."""
+        if len(embeddings) != len(records):
+            raise ValueError("embeddings and records must have the same length")
+        project = self._project(project_id)
+        with open(project.records_path, "a+b") as sidecar:
+            fcntl.flock(sidecar, fcntl.LOCK_EX)
+            try:
+                with project.lock, open(project.vectors_path, "a+b") as vectors:
+                    if not self._read_header(project):
+                        dim = next((len(e) for e in embeddings if e is not None and len(e)), None)
+                        if dim is None:
+                            raise ValueError("Cannot infer the embedding dimension from an empty batch")
+                        vectors.write(_HEADER.pack(STORE_MAGIC, STORE_FORMAT, _DTYPE_CODES[self.dtype], dim))
+                        project.dim, project.dtype = dim, self.dtype
+                    rows = np.zeros((len(embeddings), project.dim), dtype=np.float32)
+                    for i, e in enumerate(embeddings):
+                        if e is not None and len(e):
+                            if len(e) != project.dim:
+                                raise ValueError(f"Expected dimension {project.dim}, got {len(e)}")
+                            rows[i] = e
+                    # The sidecar is written last, so it is the row count; anything
+                    # past it in either file is a torn append from a crashed writer.
+                    first = len(self._sync(project))
+                    sidecar.truncate(project.records_offset)
+                    vectors.truncate(_HEADER.size + first * project.dim * project.dtype.itemsize)
+                    vectors.seek(0, os.SEEK_END)
+                    vectors.write(normalize_rows(rows).astype(project.dtype).tobytes())
+                    vectors.flush()
+                    sidecar.seek(0, os.SEEK_END)
+                    sidecar.write(b"".join(
+                        json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in records
+                    ))
+            finally:
+                fcntl.flock(sidecar, fcntl.LOCK_UN)
+        return list(range(first, first + len(records)))
+
+    def records(self, project_id) -> List[dict]:
+        """Return the project's records in row order, reading only what was appended since the last call."""
+        project = self._project(project_id)
+        with project.lock:
+            return self._sync(project)
+
+    @staticmethod
+    def _sync(project: _Project) -> List[dict]:
+        # caller holds project.lock
+        try:
+            with open(project.records_path, "rb") as f:
+                f.seek(project.records_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return project.records
+        end = tail.rfind(b"\n") + 1  # ignore a partially written last line
+        if end:
+            project.records.extend(json.loads(line) for line in tail[:end].splitlines())
+            project.records_offset += end
+        return project.records
+
+    def vectors(self, project_id) -> np.ndarray:
+        """Read-only (rows, dim) view of the stored normalized embeddings, mapped without copying."""
+        project = self._project(project_id)
+        with project.lock:
+            count = len(self._sync(project))
+            if not self._read_header(project) or count == 0:
+                return np.zeros((0, project.dim or 0), dtype=self.dtype)
+            row_bytes = project.dim * project.dtype.itemsize
+            count = min(count, (os.path.getsize(project.vectors_path) - _HEADER.size) // row_bytes)
+            if project.mapping is None or len(project.mapping) < count:
+                project.mapping = np.memmap(project.vectors_path, dtype=project.dtype, mode="r",
+                                            offset=_HEADER.size, shape=(count, project.dim))
+            return project.mapping[:count]
+
+    def __contains__(self, project_id) -> bool:
+        return len(self.records(project_id)) > 0
+
+    def count(self, project_id) -> int:
+        """Number of readable rows for the project."""
+        return len(self.vectors(project_id))
+
+    def search(self, project_id, query: Sequence[float], k: int = 3) -> List[Tuple[float, Any]]:
+        """Return up to k (cosine score, record) pairs, best first, scanning the mapping in chunks."""
+        matrix = self.vectors(project_id)
+        if len(matrix) == 0 or k <= 0:
+            return []
+        q = normalize_rows(np.asarray(query, dtype=np.float32))
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), self.chunk_rows):
+            block = matrix[start:start + self.chunk_rows]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ q
+        records = self.records(project_id)
+        return [(float(scores[r]), records[r]) for r in top_k_indices(scores, k)]
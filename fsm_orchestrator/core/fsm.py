@@ -2,7 +2,9 @@
 Hierarchical FSM engine and state/transition definitions.
 Implements: state machine logic and serialization.
 """
-from typing import Any, Dict, Optional, List
+import copy
+from collections import defaultdict
+from typing import Any, Dict, Optional, List, Tuple
 from .models import TransitionProposal
 
 class State:
@@ -24,63 +26,344 @@ class Transition:
         self.confidence = confidence
         self.metadata = metadata or {}
 
+    def template(self) -> Dict[str, Any]:
+        """Return the context-independent fields of a proposal for this transition."""
+        return {
+            'from_state': self.from_state,
+            'to_state': self.to_state,
+            'confidence': self.confidence,
+            'metadata': self.metadata,
+        }
+
+class TrackedContext(dict):
+    """
+    FSM context dict that records which top-level keys changed since the
+    last checkpoint. In-place mutation of a nested value is invisible to it:
+    use append() for list growth (recorded as an O(item) delta) or
+    mark_dirty() after mutating a value in place.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = set()
+        self.deleted = set()
+        self.appended: Dict[str, List[Any]] = {}
+
+    def __reduce__(self):
+        # pickle/deepcopy rebuild through __init__; tracking state is not carried over
+        return (TrackedContext, (dict(self),))
+
+    def mark_dirty(self, key):
+        self.dirty.add(key)
+        self.deleted.discard(key)
+        self.appended.pop(key, None)
+
+    def append(self, key, item):
+        """Append to the list stored at key, creating it if missing."""
+        if key not in self:
+            self[key] = [item]
+            return
+        self[key].append(item)
+        if key not in self.dirty:
+            self.appended.setdefault(key, []).append(item)
+
+    def reset_tracking(self):
+        self.dirty.clear()
+        self.deleted.clear()
+        self.appended.clear()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.mark_dirty(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._forget(key)
+
+    _missing = object()
+
+    def pop(self, key, default=_missing):
+        if key in self:
+            value = super().pop(key)
+            self._forget(key)
+            return value
+        if default is TrackedContext._missing:
+            raise KeyError(key)
+        return default
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._forget(key)
+        return key, value
+
+    def _forget(self, key):
+        self.dirty.discard(key)
+        self.appended.pop(key, None)
+        self.deleted.add(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+
 class HierarchicalFSM:
-    """Hierarchical FSM engine for managing nested states."""
-    def __init__(self):
+    """
+    Hierarchical FSM engine for managing nested states.
+    States may be registered under a parent; transitions declared on an
+    ancestor apply to all of its descendants unless a closer state declares
+    a transition to the same target.
+    """
+    def __init__(self, compact_every: int = 100):
         self.states: Dict[str, State] = {}
-        self.transitions: List[Transition] = []
+        self._transitions: Optional[List[Transition]] = []  # None: derive from _index on first use
         self.current_state: Optional[str] = None
         self.context: Dict[str, Any] = {}
+        # delta serialization: a full snapshot every `compact_every` checkpoints
+        self.compact_every = compact_every
+        self._checkpoint_seq = 0
+        self._deltas_since_snapshot = 0
+        self.parents: Dict[str, Optional[str]] = {}
+        self.children: Dict[str, List[str]] = defaultdict(list)
+        # from_state -> precompiled proposal templates, kept current by add_transition
+        self._index: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # memoized per-state lookups, cleared whenever the graph changes
+        self._ancestors: Dict[str, Tuple[str, ...]] = {}
+        self._effective: Dict[str, List[Dict[str, Any]]] = {}
+
+    @property
+    def transitions(self) -> List[Transition]:
+        """Declared transitions; FSMs built from a compiled workflow create them on first access."""
+        if self._transitions is None:
+            self._transitions = [Transition(**tpl) for tpls in self._index.values() for tpl in tpls]
+        return self._transitions
+
+    @property
+    def context(self) -> TrackedContext:
+        return self._context
 
-    def add_state(self, name: str, state: State):
+    @context.setter
+    def context(self, value: Dict[str, Any]):
+        # Replacing the whole context can't be expressed as a delta.
+        self._context = value if isinstance(value, TrackedContext) else TrackedContext(value)
+        self._needs_snapshot = True
+
+    @classmethod
+    def from_compiled(cls, workflow, states: Optional[Dict[str, State]] = None):
+        """
+        Build an FSM from a CompiledWorkflow without re-running validation.
+        The workflow's frozen index seeds the adjacency and memo tables
+        (templates are shared, lists are copied so the FSM can still grow);
+        states missing from `states` get a plain State.
+        """
+        fsm = cls()
+        states = states or {}
+        for name, parent in workflow.parents.items():
+            fsm.states[name] = states.get(name) or State()
+            fsm.parents[name] = parent
+            if parent is not None:
+                fsm.children[parent].append(name)
+        fsm._transitions = None
+        fsm._index.update((name, list(tpls)) for name, tpls in workflow.index.items())
+        fsm._ancestors.update(workflow.ancestors)
+        fsm._effective.update((name, list(tpls)) for name, tpls in workflow.effective.items())
+        return fsm
+
+    def clone(self) -> "HierarchicalFSM":
+        """
+        Return an FSM with the same states and transitions but its own
+        position and context. State objects and proposal templates are
+        shared; adjacency lists are copied so either FSM can still grow.
+        A started template starts the clone in the same state with a
+        shallow copy of its context.
+        """
+        fsm = type(self)(compact_every=self.compact_every)
+        fsm.states.update(self.states)
+        fsm.parents.update(self.parents)
+        fsm.children.update((name, list(kids)) for name, kids in self.children.items())
+        fsm._transitions = None if self._transitions is None else list(self._transitions)
+        fsm._index.update((name, list(tpls)) for name, tpls in self._index.items())
+        fsm._ancestors.update(self._ancestors)
+        fsm._effective.update((name, list(tpls)) for name, tpls in self._effective.items())
+        if self.current_state is not None:
+            fsm.set_initial_state(self.current_state, dict(self.context))
+        return fsm
+
+    def add_state(self, name: str, state: State, parent: Optional[str] = None):
+        """Register a state, optionally nested under an already registered parent."""
+        if parent is not None:
+            if parent not in self.states:
+                raise ValueError(f"Unknown parent state: {parent}")
+            if name in self.ancestors(parent):
+                raise ValueError(f"Nesting {name} under {parent} would create a cycle")
+        previous = self.parents.get(name)
+        if previous is not None and name in self.children[previous]:
+            self.children[previous].remove(name)
         self.states[name] = state
+        self.parents[name] = parent
+        if parent is not None:
+            self.children[parent].append(name)
+        self._invalidate()
 
     def add_transition(self, transition: Transition):
         self.transitions.append(transition)
+        self._index[transition.from_state].append(transition.template())
+        self._invalidate()
+
+    def declared(self, state_name: str) -> List[Dict[str, Any]]:
+        """Return the proposal templates declared on the state itself (inherited ones excluded)."""
+        return list(self._index.get(state_name, ()))
+
+    def _invalidate(self):
+        self._ancestors.clear()
+        self._effective.clear()
+
+    def ancestors(self, state_name: str) -> Tuple[str, ...]:
+        """Return the chain (state, parent, ..., root) for a state, memoized."""
+        chain = self._ancestors.get(state_name)
+        if chain is None:
+            parent = self.parents.get(state_name)
+            chain = (state_name,) + (self.ancestors(parent) if parent is not None else ())
+            self._ancestors[state_name] = chain
+        return chain
+
+    def outgoing(self, state_name: str) -> List[Dict[str, Any]]:
+        """Return the effective proposal templates for a state, including inherited ones."""
+        templates = self._effective.get(state_name)
+        if templates is None:
+            templates = []
+            seen = set()
+            for name in self.ancestors(state_name):
+                declared = self._index.get(name, ())
+                templates.extend(tpl for tpl in declared if tpl['to_state'] not in seen)
+                seen.update(tpl['to_state'] for tpl in declared)
+            self._effective[state_name] = templates
+        return templates
 
     def set_initial_state(self, state_name: str, context: Dict[str, Any] = None):
         self.current_state = state_name
         self.context = context or {}
-        if state_name in self.states:
-            self.states[state_name].enter(self.context)
+        self._enter_chain(self.ancestors(state_name))
 
     def next(self, state_name: str, context: Dict[str, Any]):
-        """Return next TransitionProposal(s) for a given state and context."""
+        """
+        Return next TransitionProposal(s) for a given state and context.
+        Looks up the memoized effective outgoing set and stamps the
+        context-derived scores into precompiled templates (no re-validation).
+        """
+        templates = self.outgoing(state_name)
+        if not templates:
+            return []
+        urgency = float(context.get('urgency', 0.0))
+        dependency = float(context.get('dependency', 0.0))
+        user_intent = float(context.get('user_intent', 0.0))
         proposals = []
-        for t in self.transitions:
-            if t.from_state == state_name:
-                # Example: confidence could be computed or static
-                proposals.append(
-                    TransitionProposal(
-                        from_state=t.from_state,
-                        to_state=t.to_state,
-                        confidence=t.confidence,
-                        urgency=context.get('urgency', 0.0),
-                        dependency=context.get('dependency', 0.0),
-                        user_intent=context.get('user_intent', 0.0),
-                        metadata=t.metadata
-                    )
-                )
+        for tpl in templates:
+            fields = dict(tpl, metadata=dict(tpl['metadata']))
+            fields['urgency'] = urgency
+            fields['dependency'] = dependency
+            fields['user_intent'] = user_intent
+            proposals.append(TransitionProposal.model_construct(**fields))
         return proposals
 
+    def _exit_chain(self, chain):
+        """Exit states innermost first."""
+        for name in chain:
+            if name in self.states:
+                self.states[name].exit(self.context)
+
+    def _enter_chain(self, chain):
+        """Enter states outermost first."""
+        for name in reversed(chain):
+            if name in self.states:
+                self.states[name].enter(self.context)
+
     def advance(self, proposal: TransitionProposal):
-        """Advance FSM to the next state based on a TransitionProposal."""
-        if self.current_state:
-            self.states[self.current_state].exit(self.context)
-        self.current_state = proposal.to_state
-        if self.current_state in self.states:
-            self.states[self.current_state].enter(self.context)
-
-    def serialize(self):
-        """Serialize FSM state for DB storage."""
-        return {
-            'current_state': self.current_state,
-            'context': self.context,
-        }
+        """
+        Advance FSM to the next state based on a TransitionProposal.
+        Only states below the least common ancestor of source and target are
+        exited and entered; a self-transition exits and re-enters the state.
+        """
+        target = proposal.to_state
+        if self.current_state == target:
+            self._exit_chain((target,))
+            self._enter_chain((target,))
+            return
+        source_chain = self.ancestors(self.current_state) if self.current_state else ()
+        target_chain = self.ancestors(target)
+        shared = set(source_chain) & set(target_chain)
+        self._exit_chain([s for s in source_chain if s not in shared])
+        self.current_state = target
+        self._enter_chain([s for s in target_chain if s not in shared])
+
+    def serialize(self, delta: bool = False):
+        """
+        Serialize FSM state for DB storage.
+        By default returns a full snapshot. With delta=True returns only the
+        context keys changed since the last checkpoint (O(change) bytes),
+        falling back to a snapshot every `compact_every` deltas or when the
+        context was replaced wholesale. Recorded values are deep copies, so
+        later mutation of the context never changes a returned record.
+        """
+        self._checkpoint_seq += 1
+        ctx = self._context
+        if (not delta or self._needs_snapshot
+                or self._deltas_since_snapshot >= self.compact_every):
+            record = {
+                'type': 'snapshot',
+                'seq': self._checkpoint_seq,
+                'current_state': self.current_state,
+                'context': copy.deepcopy(dict(ctx)),
+            }
+            self._deltas_since_snapshot = 0
+            self._needs_snapshot = False
+        else:
+            record = {
+                'type': 'delta',
+                'seq': self._checkpoint_seq,
+                'current_state': self.current_state,
+                'set': copy.deepcopy({key: ctx[key] for key in ctx.dirty}),
+                'append': copy.deepcopy(ctx.appended),
+                'deleted': sorted(ctx.deleted),
+            }
+            self._deltas_since_snapshot += 1
+        ctx.reset_tracking()
+        return record
 
     def deserialize(self, data):
-        """Restore FSM state from DB."""
-        self.current_state = data.get('current_state')
-        self.context = data.get('context', {})
-        if self.current_state in self.states:
-            self.states[self.current_state].enter(self.context)
+        """
+        Restore FSM state from DB.
+        Accepts a single snapshot or a list of records; the list is replayed
+        from its last snapshot onward.
+        """
+        records = data if isinstance(data, list) else [data]
+        start = 0
+        for i, record in enumerate(records):
+            if record.get('type', 'snapshot') == 'snapshot':
+                start = i
+        if not records or records[start].get('type', 'snapshot') != 'snapshot':
+            raise ValueError("Delta records must be replayed on top of a snapshot")
+        context = TrackedContext(copy.deepcopy(records[start].get('context', {})))
+        self.current_state = records[start].get('current_state')
+        for record in records[start + 1:]:
+            for key, value in record['set'].items():
+                dict.__setitem__(context, key, copy.deepcopy(value))
+            for key, items in record['append'].items():
+                context[key].extend(copy.deepcopy(items))
+            for key in record['deleted']:
+                dict.pop(context, key, None)
+            self.current_state = record['current_state']
+        context.reset_tracking()
+        self._context = context
+        self._needs_snapshot = False
+        self._deltas_since_snapshot = len(records) - start - 1
+        self._checkpoint_seq = records[-1].get('seq', self._checkpoint_seq)
+        if self.current_state is not None:
+            self._enter_chain(self.ancestors(self.current_state))
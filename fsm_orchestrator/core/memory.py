@@ -1,24 +1,171 @@
 """
 Memory manager for compression, retrieval, and MRAG.
-Implements: dual-layer store, tagging, and embedding retrieval.
+Implements: dual-layer store, tagging, and embedding retrieval, with an
+optional memory-mapped on-disk warm layer, quantized warm indexes,
+background hot -> warm -> cold tiering, an ingest-time @DECISION index,
+and token-budgeted context assembly.
 """
-from typing import List, Any, Dict
+import json
+import os
+import queue
+import re
+import threading
+import time
+from itertools import count
+from typing import List, Any, Dict, Optional, Union
+from urllib.parse import quote
+import numpy as np
 from ..util.embedding import embed
+from .context import AssembledContext, ContextAssembler
+from .telemetry import record_log
+from .embedding_store import EmbeddingStore
+from .quantization import QuantizedIndex
+from .vector_index import VectorIndex
 
 # Simulated in-memory stores for demonstration
 HOT_MEMORY: Dict[str, List[dict]] = {}
 COMPRESSED_MEMORY: Dict[str, List[dict]] = {}
 COLD_MEMORY: Dict[str, List[dict]] = {}
+# project_id -> decision key -> decision record, in first-tagged order
+DECISIONS: Dict[str, Dict[str, dict]] = {}
+
+_DECISION_RE = re.compile(r"@DECISION(?:\((?P<args>[^)]*)\))?")
+_DECISION_ARG_RE = re.compile(r"""(\w+)\s*=\s*("[^"]*"|'[^']*'|[^,]*)""")
+
+def parse_decision(content: str) -> Optional[dict]:
+    """
+    Parse an `@DECISION(reason=..., impact=...)` marker.
+    Returns {"key", "reason", "impact", "text", ...} or None. The key is an
+    explicit `id=` argument, else the message text with the marker removed.
+    """
+    match = _DECISION_RE.search(content)
+    if match is None:
+        return None
+    fields = {
+        name: value.strip().strip("\"'")
+        for name, value in _DECISION_ARG_RE.findall(match.group("args") or "")
+    }
+    text = (content[:match.start()] + content[match.end():]).strip()
+    fields.setdefault("reason", None)
+    fields.setdefault("impact", None)
+    fields["text"] = text
+    fields["key"] = fields.get("id") or text or content
+    return fields
+
+def _has_embedding(memory: dict) -> bool:
+    embedding = memory.get("embedding")
+    return embedding is not None and len(embedding) > 0
 
 class MemoryManager:
     """
     Handles memory compression, retrieval, and storage for agent context.
     Implements: hot/warm/cold layers, MRAG, and tagging.
+    Warm-memory similarity search goes through a per-project VectorIndex
+    that tracks COMPRESSED_MEMORY incrementally (appends are indexed as
+    they appear; a replaced or shrunk list is re-indexed).
+    With an EmbeddingStore, the warm layer lives on disk instead: embeddings
+    are appended to the project's mapped vector file and searched in place.
+    With `quantization` ('int8' or 'pq'), the index holds only compressed
+    codes and re-ranks the best `rerank * top` candidates at full precision;
+    indexed memories keep their embedding as a float32 row of a shared
+    array rather than a list of Python floats.
+    With `hot_capacity` set, append_hot keeps each hot window bounded: on
+    overflow the oldest `compress_batch` messages are handed to a background
+    thread that archives them raw to cold storage (`cold_dir`, a local
+    stand-in for the object store) and compresses them into warm memory.
+    Decision markers are parsed once at ingest into DECISIONS, which no
+    tier evicts, so retrieve() surfaces every decision in O(#decisions).
     """
+    def __init__(self, ivf_lists: Optional[int] = None, n_probe: int = 8,
+                 store: Optional[EmbeddingStore] = None,
+                 quantization: Optional[str] = None, rerank: int = 4,
+                 hot_capacity: Optional[int] = None, compress_batch: int = 50,
+                 cold_dir: Optional[str] = None):
+        self.store = store
+        self.hot_capacity = hot_capacity
+        self.compress_batch = compress_batch
+        self.cold_dir = cold_dir
+        self._hot_lock = threading.Lock()
+        self._tier_queue: "queue.Queue" = queue.Queue()
+        self._tier_thread: Optional[threading.Thread] = None
+        self._cold_seq = count()
+        self.quantization = quantization
+        self.rerank = rerank
+        self.ivf_lists = ivf_lists
+        self.n_probe = n_probe
+        # project_id -> (indexed list object or store, VectorIndex or QuantizedIndex)
+        self.indexes: Dict[str, tuple] = {}
+
     def fetch_hot(self, project_id, k=20) -> List[Any]:
         """Fetch hot window messages for a project (most recent k)."""
         return HOT_MEMORY.get(project_id, [])[-k:]
 
+    def append_hot(self, project_id, message: dict):
+        """Add a message to the hot window; overflow goes to the background tiering stage."""
+        with self._hot_lock:
+            hot = HOT_MEMORY.setdefault(project_id, [])
+            hot.append(message)
+            self.index_decisions(project_id, [message])
+            if self.hot_capacity is None or len(hot) <= self.hot_capacity:
+                return
+            # evict a whole batch so compression runs on full batches, not per message
+            n = max(len(hot) - self.hot_capacity, min(self.compress_batch, len(hot)))
+            evicted = hot[:n]
+            del hot[:n]
+        self._tier_queue.put((project_id, evicted))
+        if self._tier_thread is None:
+            self._start_tiering()
+
+    def index_decisions(self, project_id, messages: List[dict]):
+        """Record @DECISION markers from messages; re-tagging a key updates it in place."""
+        index = DECISIONS.setdefault(project_id, {})
+        for message in messages:
+            content = message.get("content", "")
+            if "@DECISION" not in content:
+                continue
+            decision = parse_decision(content)
+            if decision is not None:
+                decision["message"] = message
+                index[decision["key"]] = decision
+
+    def decisions(self, project_id) -> List[dict]:
+        """Return the project's decision records (key, reason, impact, text, message)."""
+        return list(DECISIONS.get(project_id, {}).values())
+
+    def _start_tiering(self):
+        with self._hot_lock:
+            if self._tier_thread is None:
+                self._tier_thread = threading.Thread(target=self._tier_loop, name="memory-tiering", daemon=True)
+                self._tier_thread.start()
+
+    def _tier_loop(self):
+        while True:
+            item = self._tier_queue.get()
+            try:
+                if item is None:
+                    return
+                self.tier(*item)
+            except Exception as exc:  # keep tiering other projects
+                record_log(f"Memory tiering failed for project {item[0]}: {exc}", level="error")
+            finally:
+                self._tier_queue.task_done()
+
+    def tier(self, project_id, messages: List[dict]):
+        """Archive raw messages to cold storage, then compress them into warm memory."""
+        self.store_cold(project_id, messages)
+        self.store_warm(project_id, self.compress(messages))
+
+    def flush(self):
+        """Block until every evicted batch has been tiered."""
+        self._tier_queue.join()
+
+    def close(self):
+        """Finish pending tiering work and stop the background thread."""
+        if self._tier_thread is not None:
+            self._tier_queue.put(None)
+            self._tier_thread.join()
+            self._tier_thread = None
+
     def compress(self, messages: List[Any]) -> dict:
         """Compress messages into summary and embedding (simple join + embed)."""
         # In production, use a real summarizer and embedding model
@@ -27,8 +174,70 @@ class MemoryManager:
         compressed = {"summary": summary, "embedding": embedding}
         return compressed
 
+    def store_warm(self, project_id, compressed: dict):
+        """Append a compressed memory to the warm layer."""
+        if self.store is not None:
+            record = {key: value for key, value in compressed.items() if key != "embedding"}
+            self.store.append(project_id, compressed.get("embedding"), record)
+            return
+        COMPRESSED_MEMORY.setdefault(project_id, []).append(compressed)
+
+    def warm_index(self, project_id):
+        """Return the project's vector index, indexing any warm memories added since the last call."""
+        if self.store is not None:
+            return self._store_index(project_id)
+        memories = COMPRESSED_MEMORY.get(project_id, [])
+        source, index = self.indexes.get(project_id, (None, None))
+        if source is not memories or len(index) > len(memories):
+            if self.quantization:
+                index = QuantizedIndex(self.quantization, rerank=self.rerank)
+                index.full = lambda rows, index=index: np.array(
+                    [index.payloads[r]["embedding"] if _has_embedding(index.payloads[r]) else np.zeros(index.dim)
+                     for r in rows], dtype=np.float32)
+            else:
+                index = VectorIndex(ivf_lists=self.ivf_lists, n_probe=self.n_probe)
+            self.indexes[project_id] = (memories, index)
+        pending = memories[len(index):]
+        if pending:
+            dim = index.dim or next((len(m["embedding"]) for m in pending if _has_embedding(m)), None)
+            if dim is not None:
+                rows = np.array([m["embedding"] if _has_embedding(m) else np.zeros(dim) for m in pending],
+                                dtype=np.float32)
+                index.add_many(rows, pending)
+                if self.quantization:  # ~8x smaller than the lists; re-ranking reads these rows
+                    for memory, row in zip(pending, rows):
+                        if _has_embedding(memory):
+                            memory["embedding"] = row
+        return index
+
+    def _store_index(self, project_id) -> Union[QuantizedIndex, VectorIndex]:
+        # quantized: codes stay in memory; re-ranking reads candidate rows from the mapping
+        _, index = self.indexes.get(project_id, (None, None))
+        if index is None:
+            if self.quantization:
+                index = QuantizedIndex(self.quantization, rerank=self.rerank,
+                                       full=lambda rows: self.store.vectors(project_id)[rows])
+            else:
+                index = VectorIndex(ivf_lists=self.ivf_lists, n_probe=self.n_probe)
+            self.indexes[project_id] = (self.store, index)
+        vectors = self.store.vectors(project_id)
+        records = self.store.records(project_id)
+        for start in range(len(index), len(vectors), 65_536):
+            end = min(start + 65_536, len(vectors))
+            index.add_many(vectors[start:end], records[start:end])
+        return index
+
     def store_cold(self, project_id, blob):
-        """Archive cold memory to object store (simulated)."""
+        """Archive cold memory to object store (simulated, or files under cold_dir)."""
+        if self.cold_dir is not None:
+            directory = os.path.join(self.cold_dir, quote(str(project_id), safe=""))
+            os.makedirs(directory, exist_ok=True)
+            name = f"{time.time_ns():020d}-{next(self._cold_seq):06d}.json"
+            tmp = os.path.join(directory, "." + name)
+            with open(tmp, "w") as f:
+                json.dump(blob, f)
+            os.replace(tmp, os.path.join(directory, name))  # objects appear whole, like an S3 PUT
+            return
         if project_id not in COLD_MEMORY:
             COLD_MEMORY[project_id] = []
         COLD_MEMORY[project_id].append(blob)
@@ -41,20 +250,29 @@ class MemoryManager:
         - top-N embedding matches from compressed memory
         """
         hot = self.fetch_hot(project_id)
-        # Find tagged decisions in hot memory
-        tagged = [m for m in hot if "@DECISION" in m.get("content", "")]
-        # Find top-N similar compressed memories (simulated cosine similarity)
-        compressed = COMPRESSED_MEMORY.get(project_id, [])
-        def cosine_sim(a, b):
-            # Dummy similarity for demonstration
-            return sum(x*y for x, y in zip(a, b)) / (1 + sum(x*x for x in a)**0.5 * sum(y*y for y in b)**0.5)
-        if compressed and query_embedding:
-            scored = sorted(
-                compressed,
-                key=lambda c: cosine_sim(c["embedding"], query_embedding),
-                reverse=True
-            )
-            retrieved = scored[:top]
-        else:
-            retrieved = []
+        # Tagged decisions come from the ingest-time index, however old they are
+        tagged = [d["message"] for d in DECISIONS.get(project_id, {}).values()]
+        # Top-N most similar compressed memories from the vector index
+        retrieved = self._search_warm(project_id, query_embedding, top)
         return hot + tagged + retrieved
+
+    def _search_warm(self, project_id, query_embedding, top) -> List[dict]:
+        if query_embedding is None or not len(query_embedding):
+            return []
+        if self.store is not None and not self.quantization:
+            return [m for _, m in self.store.search(project_id, query_embedding, top)]
+        if self.store is not None or COMPRESSED_MEMORY.get(project_id):
+            return [m for _, m in self.warm_index(project_id).search(query_embedding, top)]
+        return []
+
+    def assemble_context(self, project_id, query_embedding, token_budget: int, top=3,
+                         assembler: Optional[ContextAssembler] = None) -> AssembledContext:
+        """
+        Retrieve like retrieve(), then de-duplicate and pack decisions, hot
+        messages and retrieved summaries into token_budget, in that priority.
+        """
+        hot = self.fetch_hot(project_id)
+        tagged = [d["message"] for d in DECISIONS.get(project_id, {}).values()]
+        retrieved = self._search_warm(project_id, query_embedding, top)
+        assembler = assembler or ContextAssembler(token_budget)
+        return assembler.assemble(hot=hot, decisions=tagged, retrieved=retrieved, token_budget=token_budget)
@@ -7,6 +7,7 @@ from typing import Optional, Any
 class Event(BaseModel):
     type: str
     payload: Any
+    project_id: Optional[str] = None
 
 class Project(BaseModel):
     id: str
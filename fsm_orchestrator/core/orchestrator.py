@@ -1,40 +1,261 @@
 """
 Orchestrator core event loop and state handoff logic.
-Implements main FSM driver and event queue.
+Implements main FSM driver and event queue: one bounded asyncio.Queue and
+one cooperative task per project, batch-drained ticks that coalesce
+redundant events, and producer back-pressure.
 """
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 
 from .fsm import HierarchicalFSM
 from .arbiter import TransitionArbiter
 from .memory import MemoryManager
 from .cost_monitor import CostMonitor
 from .deadlock import DeadlockDetector
-from .models import Event
+from .models import Event, TransitionProposal
+from .telemetry import record_log
+from .workflow import CompiledWorkflow
+
+# Event types where only the newest event in a tick matters.
+COALESCE_LATEST = {"user_intent"}
+# Event types whose dict payloads are merged in arrival order within a tick.
+COALESCE_MERGE = {"context"}
+
+Handler = Callable[[str, Event], Union[None, Awaitable[None]]]
+
+
+def coalesce(events: List[Event]) -> List[Event]:
+    """
+    Collapse a drained batch: within each run of coalescable events, keep
+    the last COALESCE_LATEST event of each type and fold COALESCE_MERGE
+    payloads into one event, each at the position of its first occurrence.
+    Every other event (advance, proposals, ...) is kept in order and acts
+    as a barrier: its handler sees exactly the state set before it, so
+    nothing is coalesced across it. A COALESCE_MERGE event without a dict
+    payload is passed through as a barrier, so its handler reports it.
+    """
+    out: List[Event] = []
+    slot: Dict[str, int] = {}
+    for event in events:
+        kind = event.type
+        if (kind not in COALESCE_LATEST and kind not in COALESCE_MERGE
+                or kind in COALESCE_MERGE and not isinstance(event.payload, dict)):
+            out.append(event)
+            slot.clear()
+            continue
+        if kind not in slot:
+            slot[kind] = len(out)
+            out.append(event if kind in COALESCE_LATEST else
+                       Event(type=kind, payload=dict(event.payload), project_id=event.project_id))
+        elif kind in COALESCE_LATEST:
+            out[slot[kind]] = event
+        else:
+            out[slot[kind]].payload.update(event.payload)
+    return out
+
 
 class Orchestrator:
     """
     Main orchestrator for managing agent workflows and state transitions.
     Implements: Hier-FSM, event loop, state handoff, and integration with core algorithms.
+    Each project gets its own FSM (built from the compiled workflow, or
+    cloned from self.fsm without one), a bounded event queue and one
+    worker task; producers awaiting submit() are slowed down once a
+    project's queue is full.
     """
-    def __init__(self):
-        self.fsm = HierarchicalFSM()
+    def __init__(self, workflow: CompiledWorkflow = None, queue_size: int = 1000, max_batch: int = 64,
+                 latency_samples: int = 10_000):
+        # A compiled workflow (see core.workflow.load_artifact) skips per-pod graph rebuilds
+        self.workflow = workflow
+        self.fsm = workflow.build_fsm() if workflow is not None else HierarchicalFSM()
         self.arbiter = TransitionArbiter()
         self.memory = MemoryManager()
         self.cost_monitor = CostMonitor()
         self.deadlock = DeadlockDetector()
-        self.event_queue = []
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.fsms: Dict[str, HierarchicalFSM] = {}
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        self.handlers: Dict[str, Handler] = {
+            "user_intent": self._on_user_intent,
+            "context": self._on_context,
+            "proposals": self._on_proposals,
+            "advance": self._on_advance,
+        }
+        self.tick_latencies = deque(maxlen=latency_samples)  # seconds per tick
+        self.stats = {"events": 0, "coalesced": 0, "ticks": 0, "errors": 0}
+        self._stopped: Optional[asyncio.Event] = None
 
-    async def run(self):
-        """Main async loop. Pulls tasks, drives FSM, persists results."""
-        pass
+    def fsm_for(self, project_id) -> HierarchicalFSM:
+        """The project's FSM; without a compiled workflow each project gets a clone of self.fsm."""
+        fsm = self.fsms.get(project_id)
+        if fsm is None:
+            if self.workflow is None:
+                fsm = self.fsms[project_id] = self.fsm.clone()
+            else:
+                fsm = self.fsms[project_id] = self.workflow.build_fsm()
+                if self.workflow.initial:
+                    fsm.set_initial_state(self.workflow.initial)
+        return fsm
+
+    def export_project(self, project_id) -> dict:
+        """
+        Detach a project for handoff to another process: returns its FSM
+        snapshot, token/dollar usage and rolling token windows, and drops
+        its local state. The project's queue must already be drained and
+        its reservations settled. Not carried over: spend ledger rows (kept
+        by the process that recorded them) and the deadlock detector's
+        window, which the new owner starts afresh.
+        """
+        if self.workflow is None:
+            raise ValueError("Project handoff needs per-project FSMs (construct with a compiled workflow)")
+        queue = self.queues.get(project_id)
+        if queue is not None and not queue.empty():
+            raise ValueError(f"Project {project_id} still has queued events")
+        cost = self.cost_monitor.export_project(project_id)
+        self.queues.pop(project_id, None)
+        worker = self.workers.pop(project_id, None)
+        if worker is not None:
+            worker.cancel()
+        snapshot = self.fsm_for(project_id).serialize()
+        snapshot['context'] = dict(snapshot['context'])
+        del self.fsms[project_id]
+        self.deadlock.forget(project_id)
+        return {"fsm": snapshot, "cost": cost}
+
+    def import_project(self, project_id, state: dict):
+        """Adopt a project exported by export_project()."""
+        if self.workflow is None:
+            raise ValueError("Project handoff needs per-project FSMs (construct with a compiled workflow)")
+        self.fsm_for(project_id).deserialize(state["fsm"])
+        self.cost_monitor.import_project(project_id, state["cost"])
+
+    def register_handler(self, event_type: str, handler: Handler):
+        """Handle events of a type with handler(project_id, event); coroutines are awaited."""
+        self.handlers[event_type] = handler
+
+    def _queue(self, project_id) -> asyncio.Queue:
+        queue = self.queues.get(project_id)
+        if queue is None:
+            queue = self.queues[project_id] = asyncio.Queue(maxsize=self.queue_size)
+            self.workers[project_id] = asyncio.get_running_loop().create_task(
+                self._project_loop(project_id, queue), name=f"orchestrator-{project_id}")
+        return queue
+
+    async def submit(self, event: Event):
+        """Queue an event for its project, waiting while that project's queue is full."""
+        await self._queue(self._project_of(event)).put(event)
 
     def enqueue_event(self, event: Event):
-        """Push external event to the orchestrator's event queue."""
-        self.event_queue.append(event)
+        """Push external event to the orchestrator's event queue (raises asyncio.QueueFull when full)."""
+        self._queue(self._project_of(event)).put_nowait(event)
 
-    async def _tick(self):
+    @staticmethod
+    def _project_of(event: Event):
+        if event.project_id is None:
+            raise ValueError(f"Event {event.type!r} has no project_id")
+        return event.project_id
+
+    async def run(self):
+        """Main async loop. Drives per-project workers until stop() is called."""
+        self._stopped = asyncio.Event()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.shutdown()
+
+    def stop(self):
+        """Ask run() to return."""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def drain(self):
+        """Wait until every queued event has been processed."""
+        await asyncio.gather(*(q.join() for q in list(self.queues.values())))
+
+    async def shutdown(self):
+        """Cancel the per-project workers."""
+        workers = list(self.workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
+
+    async def _project_loop(self, project_id, queue: asyncio.Queue):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._tick(project_id, batch)
+            except Exception as exc:  # the worker must outlive any bad batch
+                self.stats["errors"] += 1
+                record_log(f"Tick failed for project {project_id}: {exc}", level="error")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+            await asyncio.sleep(0)  # let other projects run between ticks
+
+    async def _tick(self, project_id, events: List[Event]):
         """Single orchestrator tick: process events, advance FSM, handle transitions."""
-        pass
+        start = time.perf_counter()
+        merged = coalesce(events)
+        self.stats["events"] += len(events)
+        self.stats["coalesced"] += len(events) - len(merged)
+        for event in merged:
+            handler = self.handlers.get(event.type)
+            if handler is None:
+                continue
+            try:
+                result = handler(project_id, event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as exc:  # one bad event must not stall the project
+                self.stats["errors"] += 1
+                record_log(f"Event {event.type!r} failed for project {project_id}: {exc}", level="error")
+        self.stats["ticks"] += 1
+        self.tick_latencies.append(time.perf_counter() - start)
+
+    def latency_percentile(self, q: float) -> float:
+        """Tick latency (seconds) at percentile q in [0, 100] over recent ticks."""
+        if not self.tick_latencies:
+            return 0.0
+        ordered = sorted(self.tick_latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def _on_user_intent(self, project_id, event: Event):
+        self.fsm_for(project_id).context["user_intent"] = event.payload
+
+    def _on_context(self, project_id, event: Event):
+        self.fsm_for(project_id).context.update(event.payload)
+
+    def _on_proposals(self, project_id, event: Event):
+        fsm = self.fsm_for(project_id)
+        winner = self.arbiter.select(project_id, event.payload, phase=fsm.current_state)
+        if winner is not None:
+            self.handoff(project_id, winner)
+
+    def _on_advance(self, project_id, event: Event):
+        fsm = self.fsm_for(project_id)
+        if fsm.current_state is None:
+            return
+        proposals = fsm.next(fsm.current_state, fsm.context)
+        winner = self.arbiter.select(project_id, proposals, phase=fsm.current_state)
+        if winner is not None:
+            self.handoff(project_id, winner)
 
-    def handoff(self, project_id, next_state):
+    def handoff(self, project_id, next_state: Union[str, TransitionProposal]):
         """Commit state transition and notify scheduler."""
-        pass
+        fsm = self.fsm_for(project_id)
+        proposal = next_state
+        if isinstance(next_state, str):
+            proposal = TransitionProposal.model_construct(
+                from_state=fsm.current_state, to_state=next_state, confidence=1.0,
+                urgency=0.0, dependency=0.0, user_intent=0.0, metadata=None)
+        fsm.advance(proposal)
+        self.deadlock.observe(project_id, proposal)
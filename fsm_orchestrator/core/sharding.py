@@ -0,0 +1,252 @@
+"""
+Sharded multi-process orchestrator.
+Implements: consistent hashing of projects onto N worker processes, each
+running its own asyncio Orchestrator; event routing over multiprocessing
+queues; and rebalancing that hands a project's serialized FSM state to
+its new owner.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import queue
+import time
+from bisect import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import Event
+from .orchestrator import Orchestrator
+from .workflow import CompiledWorkflow
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with `replicas` virtual nodes per shard, so adding
+    or removing a shard moves only ~1/N of the projects.
+    """
+    def __init__(self, shards: Iterable[int] = (), replicas: int = 64):
+        self.replicas = replicas
+        self._points: List[Tuple[int, int]] = []
+        for shard in shards:
+            self.add(shard)
+
+    @property
+    def shards(self) -> Set[int]:
+        return {shard for _, shard in self._points}
+
+    def add(self, shard: int):
+        self._points.extend((_point(f"{shard}#{i}"), shard) for i in range(self.replicas))
+        self._points.sort()
+
+    def remove(self, shard: int):
+        self._points = [p for p in self._points if p[1] != shard]
+
+    def owner(self, project_id) -> int:
+        if not self._points:
+            raise ValueError("Hash ring has no shards")
+        i = bisect(self._points, (_point(str(project_id)), -1))
+        return self._points[i % len(self._points)][1]
+
+
+def _shard_main(shard_id, inbox, outbox, workflow_payload, queue_size, max_batch, setup):
+    asyncio.run(_shard_loop(shard_id, inbox, outbox, workflow_payload, queue_size, max_batch, setup))
+
+
+async def _shard_loop(shard_id, inbox, outbox, workflow_payload, queue_size, max_batch, setup):
+    orch = Orchestrator(CompiledWorkflow.from_payload(workflow_payload),
+                        queue_size=queue_size, max_batch=max_batch)
+    if setup is not None:
+        setup(orch)
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await loop.run_in_executor(None, inbox.get)
+        kind = message[0]
+        if kind == "events":
+            for event_type, payload, project_id in message[1]:
+                await orch.submit(Event(type=event_type, payload=payload, project_id=project_id))
+        elif kind == "export":
+            project_id = message[1]
+            queue = orch.queues.get(project_id)
+            if queue is not None:
+                await queue.join()
+            outbox.put(("exported", project_id, orch.export_project(project_id)))
+        elif kind == "import":
+            orch.import_project(message[1], message[2])
+        elif kind == "inspect":
+            project_id = message[1]
+            queue = orch.queues.get(project_id)
+            if queue is not None:
+                await queue.join()
+            fsm = orch.fsms.get(project_id)
+            view = None if fsm is None else {"current_state": fsm.current_state, "context": dict(fsm.context)}
+            outbox.put(("inspected", project_id, view))
+        elif kind == "sync":
+            await orch.drain()
+            outbox.put(("synced", shard_id, dict(orch.stats), sorted(orch.fsms)))
+        elif kind == "stop":
+            await orch.drain()
+            await orch.shutdown()
+            outbox.put(("stopped", shard_id))
+            return
+
+
+class _Shard:
+    __slots__ = ("id", "process", "inbox", "outbox")
+
+    def __init__(self, id, process, inbox, outbox):
+        self.id = id
+        self.process = process
+        self.inbox = inbox
+        self.outbox = outbox
+
+
+class ShardedOrchestrator:
+    """
+    Partitions projects across worker processes by consistent hashing on
+    project_id. Each shard owns its projects' FSM, deadlock and cost state
+    and runs the asyncio Orchestrator loop; the parent only routes events.
+    Inboxes are bounded, so submit() blocks when a shard falls behind.
+    `setup(orchestrator)` runs in every shard (e.g. to register handlers)
+    and must be picklable (a module-level function). A shard that dies or
+    does not answer a request within `reply_timeout` seconds raises
+    RuntimeError naming it.
+    """
+    def __init__(self, workflow: CompiledWorkflow, shards: Optional[int] = None, queue_size: int = 1000,
+                 max_batch: int = 64, inbox_size: int = 1000, replicas: int = 64,
+                 setup: Optional[Callable[[Orchestrator], None]] = None, start_method: str = "spawn",
+                 reply_timeout: float = 60.0, poll_interval: float = 0.5):
+        self.workflow_payload = workflow.to_payload()
+        self.reply_timeout = reply_timeout
+        self.poll_interval = poll_interval  # how often a silent shard's process is checked
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.inbox_size = inbox_size
+        self.setup = setup
+        self.ring = HashRing(replicas=replicas)
+        self.shards: Dict[int, _Shard] = {}
+        self.projects: Set[str] = set()  # every project routed so far
+        self._ctx = multiprocessing.get_context(start_method)
+        self._next_id = 0
+        for _ in range(shards or os.cpu_count() or 1):
+            self._spawn()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _spawn(self) -> int:
+        shard_id = self._next_id
+        self._next_id += 1
+        inbox, outbox = self._ctx.Queue(self.inbox_size), self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_shard_main, name=f"orchestrator-shard-{shard_id}", daemon=True,
+            args=(shard_id, inbox, outbox, self.workflow_payload, self.queue_size, self.max_batch, self.setup))
+        process.start()
+        self.shards[shard_id] = _Shard(shard_id, process, inbox, outbox)
+        self.ring.add(shard_id)
+        return shard_id
+
+    def owner(self, project_id) -> int:
+        """Shard id that owns project_id."""
+        return self.ring.owner(project_id)
+
+    def submit(self, event: Event):
+        """Route one event to its project's shard."""
+        self.submit_many([event])
+
+    def submit_many(self, events: Iterable[Event]):
+        """Route events, sending one message per shard."""
+        by_shard: Dict[int, list] = {}
+        for event in events:
+            if event.project_id is None:
+                raise ValueError(f"Event {event.type!r} has no project_id")
+            self.projects.add(event.project_id)
+            by_shard.setdefault(self.owner(event.project_id), []).append(
+                (event.type, event.payload, event.project_id))
+        for shard_id, batch in by_shard.items():
+            self.shards[shard_id].inbox.put(("events", batch))
+
+    def _request(self, shard_id, message, reply):
+        shard = self.shards[shard_id]
+        shard.inbox.put(message)
+        response = self._reply(shard)
+        if response[0] != reply:
+            raise RuntimeError(f"Shard {shard_id} replied {response[0]!r}, expected {reply!r}")
+        return response
+
+    def _reply(self, shard: _Shard):
+        """Next message from a shard, checking between polls that its process is still alive."""
+        deadline = time.monotonic() + self.reply_timeout
+        while True:
+            try:
+                return shard.outbox.get(timeout=max(0.0, min(self.poll_interval, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if not shard.process.is_alive():
+                raise RuntimeError(f"Shard {shard.id} exited (code {shard.process.exitcode}) before replying")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Shard {shard.id} did not reply within {self.reply_timeout}s")
+
+    def drain(self) -> Dict[int, dict]:
+        """Wait for every shard to process its queued events; returns per-shard stats and projects."""
+        for shard in self.shards.values():
+            shard.inbox.put(("sync",))
+        out = {}
+        for shard_id, shard in self.shards.items():
+            _, _, stats, projects = self._reply(shard)
+            out[shard_id] = dict(stats, projects=projects)
+        return out
+
+    def inspect(self, project_id) -> Optional[dict]:
+        """Current state and context of a project, read from its owning shard."""
+        return self._request(self.owner(project_id), ("inspect", project_id), "inspected")[2]
+
+    def resize(self, shards: int) -> List[str]:
+        """
+        Grow or shrink to `shards` processes. Projects whose owner changes
+        are drained on the old shard and handed to the new one as a
+        serialized FSM snapshot plus cost usage and token windows (see
+        Orchestrator.export_project). Returns the moved projects.
+        """
+        if shards < 1:
+            raise ValueError("Need at least one shard")
+        before = {p: self.owner(p) for p in self.projects}
+        retiring = sorted(self.shards)[shards:]
+        for _ in range(shards - len(self.shards)):
+            self._spawn()
+        for shard_id in retiring:
+            self.ring.remove(shard_id)
+        moved = []
+        for project_id, old in before.items():
+            new = self.owner(project_id)
+            if new == old:
+                continue
+            _, _, state = self._request(old, ("export", project_id), "exported")
+            # the new shard reads the import before any later event for the project
+            self.shards[new].inbox.put(("import", project_id, state))
+            moved.append(project_id)
+        for shard_id in retiring:
+            self._stop(shard_id)
+        return moved
+
+    def _stop(self, shard_id):
+        shard = self.shards.pop(shard_id)
+        try:
+            if shard.process.is_alive():  # a dead shard has nothing left to drain
+                shard.inbox.put(("stop",))
+                self._reply(shard)
+        finally:
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.process.join()
+
+    def close(self):
+        """Drain and stop every shard."""
+        for shard_id in list(self.shards):
+            self._stop(shard_id)
@@ -0,0 +1,171 @@
+"""
+Per-project vector index for warm-memory retrieval.
+Implements: contiguous float32 storage with pre-normalized rows, exact
+top-k by matrix-vector product + argpartition, and an optional IVF
+(inverted file) approximate mode for large projects.
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return L2-normalized float32 rows; all-zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, then sort only k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        kth = scores[np.argpartition(scores, -k)[-k]]
+        # rows tied with the k-th score are admitted lowest index first
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(scores))
+    # stable on ties: lower row index first
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+class VectorIndex:
+    """
+    Append-only cosine-similarity index.
+    Rows are normalized once on insert, so a query is one mat-vec product.
+    With `ivf_lists` set, rows are also bucketed by nearest k-means centroid
+    (trained once `train_size` rows exist) and search only scans the
+    `n_probe` closest buckets. Later rows join their nearest existing
+    bucket; centroids are retrained only once the largest bucket's share
+    has grown `rebalance` times past what it was right after training.
+    """
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024,
+                 ivf_lists: Optional[int] = None, n_probe: int = 8, train_size: int = 10_000,
+                 rebalance: float = 2.0):
+        self.dim = dim
+        self.size = 0
+        self.payloads: List[Any] = []
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32) if dim else None
+        self.ivf_lists = ivf_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(capacity, dtype=np.int32)  # row -> IVF list
+        self._lists: Optional[List[np.ndarray]] = None  # cached per-list row ids
+        self.rebalance = rebalance
+        self._counts: Optional[np.ndarray] = None  # rows per IVF list
+        self._max_skew = 0.0  # largest list / mean list size that triggers retraining
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The normalized rows (a view, no copy)."""
+        if self._matrix is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:self.size]
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self._matrix)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self.size] = self._matrix[:self.size]
+        self._matrix = grown
+        self._assign = np.resize(self._assign, capacity)
+
+    def add(self, embedding: Sequence[float], payload: Any = None):
+        """Append one embedding."""
+        self.add_many(np.asarray(embedding, dtype=np.float32)[None, :], [payload])
+
+    def add_many(self, embeddings, payloads: Optional[Sequence[Any]] = None):
+        """Append a batch of embeddings (rows of a 2-D array)."""
+        rows = np.asarray(embeddings, dtype=np.float32)
+        if rows.ndim != 2:
+            raise ValueError("embeddings must be a 2-D array")
+        if self.dim is None:
+            self.dim = rows.shape[1]
+        if rows.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {rows.shape[1]}")
+        if self._matrix is None:
+            self._matrix = np.zeros((max(1024, len(rows)), self.dim), dtype=np.float32)
+        self._reserve(len(rows))
+        start, end = self.size, self.size + len(rows)
+        self._matrix[start:end] = normalize_rows(rows)
+        self.payloads.extend(payloads if payloads is not None else [None] * len(rows))
+        self.size = end
+        if self.centroids is not None:
+            assign = self._assign[start:end] = self._nearest_centroid(self._matrix[start:end])
+            self._counts += np.bincount(assign, minlength=len(self.centroids))
+            if self._counts.max() * len(self.centroids) > self._max_skew * self.size:
+                self.train()
+            elif self._lists is not None:
+                self._extend_lists(assign, start)
+        elif self.ivf_lists and self.size >= self.train_size:
+            self.train()
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """Fit IVF centroids with spherical k-means on a sample of the rows."""
+        rng = np.random.default_rng(seed)
+        data = self.matrix
+        sample = data[rng.choice(self.size, size=min(self.size, 50 * self.ivf_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(self.ivf_lists, len(sample)), replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        self.centroids = centroids
+        self._assign[:self.size] = self._nearest_centroid(data)
+        self._counts = np.bincount(self._assign[:self.size], minlength=len(centroids))
+        self._max_skew = self.rebalance * self._counts.max() * len(centroids) / self.size
+        self._lists = None
+
+    def _nearest_centroid(self, rows, chunk=65_536):
+        out = np.empty(len(rows), dtype=np.int32)
+        for i in range(0, len(rows), chunk):
+            out[i:i + chunk] = np.argmax(rows[i:i + chunk] @ self.centroids.T, axis=1)
+        return out
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            assign = self._assign[:self.size]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+        return self._lists
+
+    def _extend_lists(self, assign, start):
+        # new row ids are larger than any listed, so each list stays sorted
+        order = np.argsort(assign, kind="stable")
+        touched, first = np.unique(assign[order], return_index=True)
+        for c, ids in zip(touched, np.split(order + start, first[1:])):
+            self._lists[c] = np.concatenate([self._lists[c], ids])
+
+    def search(self, query: Sequence[float], k: int = 3, exact: bool = False) -> List[Tuple[float, Any]]:
+        """Return up to k (cosine score, payload) pairs, best first."""
+        if self.size == 0 or k <= 0:
+            return []
+        q = normalize_rows(np.asarray(query, dtype=np.float32))
+        if self.centroids is None or exact:
+            scores = self.matrix @ q
+            rows = top_k_indices(scores, k)
+            return [(float(scores[r]), self.payloads[r]) for r in rows]
+        probes = top_k_indices(self.centroids @ q, self.n_probe)
+        lists = self._inverted_lists()
+        candidates = np.concatenate([lists[c] for c in probes])
+        if len(candidates) == 0:
+            return []
+        scores = self._matrix[candidates] @ q
+        best = top_k_indices(scores, k)
+        return [(float(scores[i]), self.payloads[candidates[i]]) for i in best]
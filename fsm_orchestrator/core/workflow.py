@@ -0,0 +1,214 @@
+"""
+Workflow compilation into versioned FSM graph artifacts.
+Implements: validation (reachability, acyclicity), frozen transition index,
+and memory-mapped artifact load for fast orchestrator cold start.
+"""
+import hashlib
+import json
+import mmap
+import struct
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+from .fsm import HierarchicalFSM, State, Transition
+
+ARTIFACT_MAGIC = b"FSMC"
+ARTIFACT_FORMAT = 2
+# magic, format version, sha256 of the JSON payload
+_HEADER = struct.Struct("<4sH32s")
+
+
+class WorkflowValidationError(ValueError):
+    """Raised when a workflow definition violates the Hier-FSM guarantees."""
+
+
+class CompiledWorkflow:
+    """
+    Validated, immutable workflow graph.
+    Transitions are stored once as proposal templates, grouped by source
+    state; the declared index holds each state's [start, end) range and the
+    effective (inherited) index holds positions into that list. Both are
+    resolved once at load, so every FSM built from the workflow shares them.
+    """
+    def __init__(self, name: str, version: str, initial: str,
+                 parents: Dict[str, Optional[str]],
+                 templates: List[Dict[str, Any]],
+                 ancestors: Dict[str, Tuple[str, ...]],
+                 outgoing: Dict[str, List[int]],
+                 declared: Dict[str, List[int]]):
+        self.name = name
+        self.version = version
+        self.initial = initial
+        self.parents = parents
+        self.templates = templates
+        self.ancestors = ancestors
+        self.outgoing = outgoing
+        self.declared = declared
+        self.index = {name: tuple(templates[start:end]) for name, (start, end) in declared.items()}
+        self.effective = {
+            name: tuple([templates[i] for i in positions]) for name, positions in outgoing.items()
+        }
+
+    @cached_property
+    def transitions(self) -> Tuple[Transition, ...]:
+        """Transition objects, built on first use; loading and running an FSM never needs them."""
+        return tuple(Transition(**tpl) for tpl in self.templates)
+
+    def build_fsm(self, states: Optional[Dict[str, State]] = None) -> HierarchicalFSM:
+        """Return a fresh FSM seeded from the frozen index."""
+        return HierarchicalFSM.from_compiled(self, states)
+
+    def to_payload(self) -> dict:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'initial': self.initial,
+            'states': self.parents,
+            'transitions': [
+                [t['from_state'], t['to_state'], t['confidence'], t['metadata']]
+                for t in self.templates
+            ],
+            'ancestors': self.ancestors,
+            'outgoing': self.outgoing,
+            'declared': self.declared,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "CompiledWorkflow":
+        return cls(
+            name=payload['name'],
+            version=payload['version'],
+            initial=payload['initial'],
+            parents=payload['states'],
+            templates=[
+                {'from_state': f, 'to_state': t, 'confidence': c, 'metadata': m}
+                for f, t, c, m in payload['transitions']
+            ],
+            ancestors={k: tuple(v) for k, v in payload['ancestors'].items()},
+            outgoing=payload['outgoing'],
+            declared=payload['declared'],
+        )
+
+
+def compile_workflow(definition: dict, allow_cycles: bool = False) -> CompiledWorkflow:
+    """
+    Validate a workflow definition and compile it into a CompiledWorkflow.
+
+    The definition is a plain dict:
+        {"name": ..., "version": ..., "initial": ...,
+         "states": [{"name": ..., "parent": ...}, ...],
+         "transitions": [{"from_state": ..., "to_state": ..., "confidence": ...,
+                          "metadata": {...}}, ...]}
+
+    Every state must be reachable from `initial`, and unless `allow_cycles`
+    is set the effective transition graph must be a DAG.
+    """
+    fsm = HierarchicalFSM()
+    for spec in definition.get('states', []):
+        if spec['name'] in fsm.states:
+            raise WorkflowValidationError(f"Duplicate state: {spec['name']}")
+        try:
+            fsm.add_state(spec['name'], State(), parent=spec.get('parent'))
+        except ValueError as exc:
+            raise WorkflowValidationError(str(exc)) from exc
+    for spec in definition.get('transitions', []):
+        for end in (spec['from_state'], spec['to_state']):
+            if end not in fsm.states:
+                raise WorkflowValidationError(f"Transition references unknown state: {end}")
+        fsm.add_transition(Transition(
+            spec['from_state'], spec['to_state'],
+            spec.get('confidence', 1.0), spec.get('metadata'),
+        ))
+    initial = definition.get('initial')
+    if initial not in fsm.states:
+        raise WorkflowValidationError(f"Unknown initial state: {initial}")
+
+    targets = {name: [t['to_state'] for t in fsm.outgoing(name)] for name in fsm.states}
+    _check_reachable(fsm, initial, targets)
+    if not allow_cycles:
+        _check_acyclic(targets)
+
+    templates: List[Dict[str, Any]] = []
+    position: Dict[int, int] = {}
+    declared: Dict[str, List[int]] = {}
+    for name in fsm.states:
+        start = len(templates)
+        for tpl in fsm.declared(name):
+            position[id(tpl)] = len(templates)
+            templates.append(tpl)
+        if len(templates) > start:
+            declared[name] = [start, len(templates)]
+    return CompiledWorkflow.from_payload({
+        'name': definition.get('name', 'workflow'),
+        'version': str(definition.get('version', '1')),
+        'initial': initial,
+        'states': dict(fsm.parents),
+        'transitions': [
+            [t['from_state'], t['to_state'], t['confidence'], t['metadata']] for t in templates
+        ],
+        'ancestors': {name: list(fsm.ancestors(name)) for name in fsm.states},
+        'outgoing': {
+            name: [position[id(t)] for t in fsm.outgoing(name)] for name in fsm.states
+        },
+        'declared': declared,
+    })
+
+
+def _check_reachable(fsm: HierarchicalFSM, initial: str, targets: Dict[str, List[str]]):
+    """Every state must be reachable from the initial state; entering a state enters its ancestors."""
+    reached = set()
+    stack = [initial]
+    while stack:
+        name = stack.pop()
+        if name in reached:
+            continue
+        reached.update(fsm.ancestors(name))
+        stack.extend(targets[name])
+    unreachable = [name for name in fsm.states if name not in reached]
+    if unreachable:
+        raise WorkflowValidationError(f"Unreachable states from {initial}: {unreachable}")
+
+
+def _check_acyclic(targets: Dict[str, List[str]]):
+    """Iterative DFS; reports the first cycle found."""
+    WHITE, GREY, BLACK = 0, 1, 2
+    color = dict.fromkeys(targets, WHITE)
+    for root in targets:
+        if color[root] != WHITE:
+            continue
+        path = [root]
+        stack = [iter(targets[root])]
+        color[root] = GREY
+        while stack:
+            nxt = next(stack[-1], None)
+            if nxt is None:
+                color[path.pop()] = BLACK
+                stack.pop()
+            elif color[nxt] == GREY:
+                cycle = path[path.index(nxt):] + [nxt]
+                raise WorkflowValidationError(f"Cycle in workflow: {' -> '.join(cycle)}")
+            elif color[nxt] == WHITE:
+                color[nxt] = GREY
+                path.append(nxt)
+                stack.append(iter(targets[nxt]))
+
+
+def save_artifact(workflow: CompiledWorkflow, path: str):
+    """Write a compiled workflow as a checksummed, versioned artifact."""
+    payload = json.dumps(workflow.to_payload(), separators=(',', ':')).encode()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_FORMAT, hashlib.sha256(payload).digest()))
+        f.write(payload)
+
+
+def load_artifact(path: str) -> CompiledWorkflow:
+    """Load a compiled workflow with a single memory-mapped read."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, fmt, digest = _HEADER.unpack_from(mm)
+        if magic != ARTIFACT_MAGIC:
+            raise WorkflowValidationError(f"{path} is not an FSM artifact")
+        if fmt != ARTIFACT_FORMAT:
+            raise WorkflowValidationError(f"Unsupported artifact format {fmt} (expected {ARTIFACT_FORMAT})")
+        payload = mm[_HEADER.size:]
+    if hashlib.sha256(payload).digest() != digest:
+        raise WorkflowValidationError(f"Checksum mismatch in {path}")
+    return CompiledWorkflow.from_payload(json.loads(payload))
@@ -0,0 +1,276 @@
+"""
+Durable task queue on the SQL database.
+Implements: a `tasks` table shared by scheduler replicas, batch claims with
+SELECT ... FOR UPDATE SKIP LOCKED, LISTEN/NOTIFY wake-ups instead of
+polling, and ack/nack with visibility timeouts. On SQLite (local runs and
+tests) the same claim statement is atomic under SQLite's single writer
+and wake-ups are in-process, with the wait timeout as the polling fallback.
+"""
+import select as io_select
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import (Column, Float, Index, Integer, JSON, MetaData, String, Table, Text, and_, case,
+                        delete, event, func, insert, select, text, update)
+from sqlalchemy.engine import Engine
+
+from .queue import POISONED, RUNNING, task_eta
+from ..util.backoff import retry_delay
+
+QUEUED = "queued"
+
+metadata = MetaData()
+
+tasks = Table(
+    "tasks", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("project_id", String(128), nullable=False),
+    Column("agent_id", String(128)),
+    Column("payload", JSON),
+    Column("eta", Float, nullable=False),
+    Column("priority", Integer, nullable=False, default=0),
+    Column("est_tokens", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("state", String(16), nullable=False, default=QUEUED),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("lease_until", Float),
+    Column("claimed_by", String(128)),
+    Column("last_error", Text),
+    Index("ix_tasks_ready", "state", "priority", "eta"),
+    Index("ix_tasks_lease", "state", "lease_until"),
+)
+
+TASK_COLUMNS = ("id", "project_id", "agent_id", "payload", "eta", "priority", "est_tokens", "attempts")
+
+
+def _sqlite_connect(dbapi_connection, connection_record):
+    # let SQLAlchemy's begin() emit BEGIN IMMEDIATE instead of pysqlite's deferred BEGIN
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; a power loss may drop the last commits
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.close()
+
+
+def _sqlite_begin(conn):
+    # take the write lock up front so concurrent claims queue up instead of failing
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class DurableTaskQueue:
+    """
+    Task queue persisted in the `tasks` table. Tasks are dicts shaped like
+    TaskQueue tasks (id, project_id, agent_id, payload, eta, priority,
+    est_tokens). claim() leases a batch to one worker for
+    `visibility_timeout` seconds; unacked tasks become claimable again when
+    the lease lapses. Each claim counts an attempt, and nack() retries with
+    backoff or poisons the task after `max_attempts`.
+    Without an engine, uses persistence.db.engine. SQLite engines are
+    switched to WAL and BEGIN IMMEDIATE transactions.
+    """
+    def __init__(self, engine: Optional[Engine] = None, channel: str = "task_queue",
+                 visibility_timeout: float = 300.0, max_attempts: int = 5, backoff: float = 1.0,
+                 max_backoff: float = 3600.0, clock: Callable[[], float] = time.time, create: bool = True):
+        if engine is None:
+            from ..persistence.db import engine
+        if not channel.isidentifier():
+            raise ValueError(f"Invalid NOTIFY channel {channel!r}")
+        self.engine = engine
+        self.postgres = engine.dialect.name == "postgresql"
+        if engine.dialect.name == "sqlite" and not event.contains(engine, "begin", _sqlite_begin):
+            # once per engine, so later queues neither stack hooks nor dispose the shared pool
+            event.listen(engine, "connect", _sqlite_connect)
+            event.listen(engine, "begin", _sqlite_begin)
+            engine.dispose()  # reconnect pooled connections with the settings above
+        self.channel = channel
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._wakeup = threading.Event()  # in-process notifications (SQLite)
+        self._listener = None  # raw DBAPI connection holding LISTEN (Postgres)
+        if create:
+            metadata.create_all(engine)
+
+    def _row(self, task: Any, now: float) -> dict:
+        eta = task_eta(task)
+        return {
+            "id": str(task.get("id") or uuid.uuid4().hex),
+            "project_id": str(task["project_id"]),
+            "agent_id": task.get("agent_id"),
+            "payload": task.get("payload"),
+            "eta": now if eta is None else eta,
+            "priority": task.get("priority", 0) or 0,
+            "est_tokens": task.get("est_tokens", 0) or 0,
+            "created_at": now,
+            "state": QUEUED,
+            "attempts": task.get("attempts", 0) or 0,
+        }
+
+    def enqueue(self, task: Any) -> str:
+        """Persist one task; returns its id."""
+        return self.enqueue_many([task])[0]
+
+    def enqueue_many(self, batch: Iterable[Any]) -> List[str]:
+        """Persist tasks in one transaction and wake waiting replicas once."""
+        now = self.clock()
+        rows = [self._row(task, now) for task in batch]
+        if not rows:
+            return []
+        with self.engine.begin() as conn:
+            conn.execute(insert(tasks), rows)
+            self._notify(conn)
+        self._notified()
+        return [row["id"] for row in rows]
+
+    def _notify(self, conn):
+        if self.postgres:  # delivered when the transaction commits
+            conn.execute(text("SELECT pg_notify(:channel, '')"), {"channel": self.channel})
+
+    def _notified(self):
+        if not self.postgres:
+            self._wakeup.set()
+
+    def claim(self, limit: int, worker_id: str, visibility_timeout: Optional[float] = None) -> List[dict]:
+        """
+        Lease up to `limit` due tasks (or tasks whose lease lapsed) to
+        worker_id, in (priority, eta) order. Concurrent replicas skip rows
+        another claim holds rather than waiting on them. A lapsed task that
+        has used max_attempts claims is poisoned instead of re-leased.
+        """
+        now = self.clock()
+        lease = now + (self.visibility_timeout if visibility_timeout is None else visibility_timeout)
+        t = tasks
+        # lapsed leases go back to QUEUED first, so the claim itself is one ix_tasks_ready range scan
+        exhausted = t.c.attempts >= self.max_attempts
+        expired = (select(t.c.id).where(and_(t.c.state == RUNNING, t.c.lease_until <= now))
+                   .with_for_update(skip_locked=True))
+        lapsed = (update(t).where(t.c.id.in_(expired.scalar_subquery()))
+                  .values(state=case((exhausted, POISONED), else_=QUEUED), lease_until=None, claimed_by=None,
+                          last_error=case((exhausted, "lease expired"), else_=t.c.last_error)))
+        picked = (select(t.c.id).where(and_(t.c.state == QUEUED, t.c.eta <= now))
+                  .order_by(t.c.priority, t.c.eta).limit(limit).with_for_update(skip_locked=True))
+        stmt = (update(t).where(t.c.id.in_(picked.scalar_subquery()))
+                .values(state=RUNNING, lease_until=lease, claimed_by=worker_id, attempts=t.c.attempts + 1)
+                .returning(*(t.c[name] for name in TASK_COLUMNS)))
+        with self.engine.begin() as conn:
+            conn.execute(lapsed)
+            rows = [dict(row._mapping) for row in conn.execute(stmt)]
+        rows.sort(key=lambda row: (row["priority"], row["eta"], row["id"]))
+        return rows
+
+    def _owned(self, ids, worker_id):
+        t = tasks
+        return and_(t.c.id.in_(list(ids)), t.c.claimed_by == worker_id, t.c.state == RUNNING)
+
+    def ack(self, ids: Iterable[str], worker_id: str) -> int:
+        """Delete completed tasks still leased to worker_id; returns how many were acked."""
+        with self.engine.begin() as conn:
+            return conn.execute(delete(tasks).where(self._owned(ids, worker_id))).rowcount
+
+    def extend(self, ids: Iterable[str], worker_id: str, visibility_timeout: Optional[float] = None) -> int:
+        """Renew worker_id's leases (a heartbeat for long tasks); returns how many were renewed."""
+        lease = self.clock() + (self.visibility_timeout if visibility_timeout is None else visibility_timeout)
+        with self.engine.begin() as conn:
+            return conn.execute(update(tasks).where(self._owned(ids, worker_id))
+                                .values(lease_until=lease)).rowcount
+
+    def nack(self, task_id: str, worker_id: str, error: Optional[str] = None,
+             delay: Optional[float] = None) -> str:
+        """
+        Return a failed task: QUEUED again after `delay` (default: backoff
+        with jitter), or POISONED once it has used max_attempts. Returns the
+        new state; raises KeyError if worker_id no longer holds the lease.
+        """
+        t = tasks
+        with self.engine.begin() as conn:
+            row = conn.execute(select(t.c.attempts).where(self._owned([task_id], worker_id))).first()
+            if row is None:
+                raise KeyError(f"Task {task_id} is not leased to {worker_id}")
+            if row.attempts >= self.max_attempts:
+                values = {"state": POISONED}
+            else:
+                if delay is None:
+                    delay = retry_delay(row.attempts, self.backoff, self.max_backoff)
+                values = {"state": QUEUED, "eta": self.clock() + delay}
+            conn.execute(update(t).where(self._owned([task_id], worker_id))
+                         .values(lease_until=None, claimed_by=None, last_error=error, **values))
+        return values["state"]
+
+    def postpone(self, task_id: str, worker_id: str, delay: float) -> None:
+        """Return a leased task untouched (e.g. for back-pressure); the claim does not count as an attempt."""
+        t = tasks
+        with self.engine.begin() as conn:
+            done = conn.execute(update(t).where(self._owned([task_id], worker_id)).values(
+                state=QUEUED, eta=self.clock() + delay, lease_until=None, claimed_by=None,
+                attempts=t.c.attempts - 1)).rowcount
+        if not done:
+            raise KeyError(f"Task {task_id} is not leased to {worker_id}")
+
+    def poisoned(self, limit: int = 100) -> List[dict]:
+        """Inspect poisoned tasks, oldest first."""
+        t = tasks
+        stmt = (select(*(t.c[name] for name in TASK_COLUMNS), t.c.last_error)
+                .where(t.c.state == POISONED).order_by(t.c.created_at, t.c.id).limit(limit))
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(stmt)]
+
+    def replay(self, task_id: Optional[str] = None) -> int:
+        """Re-queue one poisoned task (or all of them) with a fresh attempt count."""
+        t = tasks
+        where = t.c.state == POISONED
+        if task_id is not None:
+            where = and_(where, t.c.id == task_id)
+        with self.engine.begin() as conn:
+            count = conn.execute(update(t).where(where).values(
+                state=QUEUED, eta=self.clock(), attempts=0)).rowcount
+            if count:
+                self._notify(conn)
+        if count:
+            self._notified()
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per state."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(tasks.c.state, func.count()).group_by(tasks.c.state))
+            return {state: n for state, n in rows}
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a task is enqueued or replayed (NOTIFY on Postgres), or
+        until `timeout`. Returns True if woken by a notification. Meant for
+        one consumer loop per queue instance.
+        """
+        if not self.postgres:
+            woken = self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            return woken
+        conn = self._listen()
+        if not conn.notifies:
+            readable, _, _ = io_select.select([conn], [], [], timeout)
+            if readable:
+                conn.poll()
+        woken = bool(conn.notifies)
+        conn.notifies.clear()
+        return woken
+
+    def _listen(self):
+        if self._listener is None:
+            raw = self.engine.raw_connection()
+            dbapi = raw.dbapi_connection
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self._listener = raw
+        return self._listener.dbapi_connection
+
+    def close(self):
+        """Drop the LISTEN connection."""
+        if self._listener is not None:
+            self._listener.invalidate()  # never hand a LISTENing connection back to the pool
+            self._listener = None
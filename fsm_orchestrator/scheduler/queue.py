@@ -1,40 +1,296 @@
 """
 Task queue helpers for enqueue/dequeue operations.
-Implements: DB-backed queue, LISTEN/NOTIFY fallback.
+Implements: the in-memory dispatch queue (durable_queue is a separate
+DB-backed queue, not yet wired into the scheduler), deficit round-robin
+(DRR) dispatch weighted per project in estimated tokens, per-project
+priority heaps, a timer wheel that holds delayed tasks until their ETA,
+and postpone/retry/poison paths with a task_id index.
 """
-from typing import Any, List
-from collections import defaultdict, deque
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+
+from ..util.backoff import retry_delay
+
+# TaskQueue.index states
+DUE, DELAYED, RUNNING, POISONED = "due", "delayed", "running", "poisoned"
+
+
+def task_eta(task: Any) -> Optional[float]:
+    """A task's ETA as epoch seconds (datetimes are converted), or None."""
+    eta = task.get("eta")
+    if eta is not None and hasattr(eta, "timestamp"):
+        eta = eta.timestamp()
+    return eta
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel of `slots` buckets, `tick` seconds wide. Entries due
+    beyond the wheel's horizon wait in an overflow heap and cascade in as
+    the wheel turns; entries in the current slot move to a small heap so
+    they fire exactly at their ETA. A delayed entry is touched O(1) times
+    until it is due, and each move is O(log n) at most.
+    """
+    def __init__(self, tick: float = 0.1, slots: int = 1024, now: float = 0.0):
+        if tick <= 0 or slots < 1:
+            raise ValueError("Timer wheel needs a positive tick and at least one slot")
+        self.tick = tick
+        self.slots = slots
+        self.wheel: List[list] = [[] for _ in range(slots)]
+        self.overflow: List[Tuple[float, int, Any]] = []  # beyond the horizon
+        self.soon: List[Tuple[float, int, Any]] = []  # current slot, by ETA
+        self.cursor = int(now // tick)  # last slot moved into `soon`
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, eta: float, seq: int, item: Any):
+        slot = int(eta // self.tick)
+        entry = (eta, seq, item)
+        if slot <= self.cursor:
+            heapq.heappush(self.soon, entry)
+        elif slot - self.cursor < self.slots:
+            self.wheel[slot % self.slots].append(entry)
+        else:
+            heapq.heappush(self.overflow, entry)
+        self.size += 1
+
+    def next_eta(self) -> Optional[float]:
+        """Earliest pending ETA, or None when the wheel is empty."""
+        if self.soon:
+            return self.soon[0][0]
+        for slot in range(self.cursor + 1, self.cursor + self.slots):
+            bucket = self.wheel[slot % self.slots]
+            if bucket:
+                return min(bucket)[0]
+        return self.overflow[0][0] if self.overflow else None
+
+    def expire(self, now: float) -> List[Any]:
+        """Remove and return every item with ETA <= now, in ETA order."""
+        target = int(now // self.tick)
+        if target > self.cursor:
+            for slot in range(max(self.cursor + 1, target - self.slots + 1), target + 1):
+                bucket = self.wheel[slot % self.slots]
+                if bucket:
+                    for entry in bucket:
+                        heapq.heappush(self.soon, entry)
+                    bucket.clear()
+            self.cursor = target
+            overflow = self.overflow
+            while overflow and int(overflow[0][0] // self.tick) - target < self.slots:
+                entry = heapq.heappop(overflow)
+                slot = int(entry[0] // self.tick)
+                if slot <= target:
+                    heapq.heappush(self.soon, entry)
+                else:
+                    self.wheel[slot % self.slots].append(entry)
+        due = []
+        soon = self.soon
+        while soon and soon[0][0] <= now:
+            due.append(heapq.heappop(soon)[2])
+        self.size -= len(due)
+        return due
+
 
 class TaskQueue:
     """
-    Database-backed task queue for agent tasks.
+    In-memory task queue for agent tasks, local to one scheduler process.
+    Nothing feeds it from durable_queue.DurableTaskQueue yet.
     Implements: enqueue, dequeue_ready, postpone, fail.
+    Dispatch order is deficit round-robin: only projects with due tasks
+    sit in the active ring; each visit credits a project `quantum * weight`
+    tokens and it dispatches head tasks while their `est_tokens` fit its
+    deficit. Picking the next task is O(1) amortized (while quanta cover
+    typical task sizes), independent of the number of projects.
+    Within a project, due tasks come out by (priority, eta, enqueue order);
+    lower priority values run first. Tasks with a future `eta` sit in a
+    timer wheel and cost nothing until they fall due.
+    Dequeued tasks stay RUNNING until ack(), postpone() or fail(). Failures
+    retry with exponential backoff and jitter; after `max_attempts` the task
+    moves to the poison queue, from which replay() re-enqueues it.
+    `index` maps task_id -> (state, task) for O(1) lookups.
     """
-    def __init__(self):
-        # project_id -> deque of tasks
-        self.queues = defaultdict(deque)
-        self.failed = defaultdict(list)
-        self.postponed = defaultdict(list)
-
-    def enqueue(self, task: Any):
-        """Add a new task to the queue."""
+    def __init__(self, quantum: int = 1000, weights: Optional[Dict[Any, float]] = None,
+                 clock: Callable[[], float] = time.time, tick: float = 0.1, slots: int = 1024,
+                 max_attempts: int = 5, backoff: float = 1.0, max_backoff: float = 3600.0):
+        if quantum <= 0:
+            raise ValueError("Quantum must be positive")  # a zero quantum never credits a deficit
+        # project_id -> heap of (priority, eta, seq, task), only projects with due tasks
+        self.queues: Dict[Any, list] = {}
+        self.index: Dict[Any, Tuple[str, Any]] = {}
+        self.poison: Dict[Any, Any] = {}  # task_id -> task, in poisoning order
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"postponed": 0, "retried": 0, "poisoned": 0, "replayed": 0}
+        self.quantum = quantum
+        self.weights: Dict[Any, float] = {}
+        for project_id, weight in (weights or {}).items():
+            self.set_weight(project_id, weight)
+        self.active = deque()  # ring of project ids with due tasks
+        self.deficit: Dict[Any, float] = {}
+        self._credited = False  # has the ring head received its quantum this visit?
+        self.clock = clock
+        self.timers = TimerWheel(tick=tick, slots=slots, now=clock())
+        self._seq = itertools.count()
+        self._due = 0
+
+    def __len__(self):
+        return self._due + len(self.timers)
+
+    @property
+    def delayed(self) -> int:
+        """Number of tasks waiting for their ETA."""
+        return len(self.timers)
+
+    def set_weight(self, project_id, weight: float):
+        """Give a project `weight` quanta per round (default 1)."""
+        if weight <= 0:
+            raise ValueError(f"Weight for project {project_id} must be positive")
+        self.weights[project_id] = weight
+
+    @staticmethod
+    def cost(task: Any) -> int:
+        return max(task.get("est_tokens", 0) or 0, 0)
+
+    def location(self, task_id) -> Optional[str]:
+        """DUE, DELAYED, RUNNING or POISONED, or None for unknown/acked tasks."""
+        entry = self.index.get(task_id)
+        return None if entry is None else entry[0]
+
+    def enqueue(self, task: Any, now: Optional[float] = None):
+        """Add a new task to the queue; a future `eta` delays it."""
+        eta = task_eta(task)
+        now = self.clock() if now is None else now
+        if eta is not None and eta > now:
+            self.timers.schedule(eta, next(self._seq), task)
+            self._track(task, DELAYED)
+        else:
+            self._push(task, now if eta is None else eta)
+
+    def _track(self, task: Any, state: str):
+        task_id = task.get("id")
+        if task_id is not None:
+            self.index[task_id] = (state, task)
+
+    def _push(self, task: Any, eta: float):
         project_id = task.get("project_id")
-        self.queues[project_id].append(task)
+        heap = self.queues.get(project_id)
+        if heap is None:  # project just became active
+            heap = self.queues[project_id] = []
+            self.active.append(project_id)
+            self.deficit[project_id] = 0
+        heapq.heappush(heap, (task.get("priority", 0) or 0, eta, next(self._seq), task))
+        self._due += 1
+        self._track(task, DUE)
 
-    def dequeue_ready(self) -> List[Any]:
-        """Fetch one ready task per project (for WRR)."""
+    def _release(self, now: float):
+        for task in self.timers.expire(now):
+            self._push(task, task_eta(task))
+
+    def next_task(self, now: Optional[float] = None) -> Optional[Any]:
+        """Pop the next due task in DRR order, or None when nothing is due."""
+        self._release(self.clock() if now is None else now)
+        return self._next()
+
+    def _next(self) -> Optional[Any]:
+        active = self.active
+        while active:
+            project_id = active[0]
+            heap = self.queues[project_id]
+            if not self._credited:
+                self.deficit[project_id] += self.quantum * self.weights.get(project_id, 1.0)
+                self._credited = True
+            cost = self.cost(heap[0][3])
+            if cost <= self.deficit[project_id]:
+                self.deficit[project_id] -= cost
+                task = heapq.heappop(heap)[3]
+                self._due -= 1
+                self._track(task, RUNNING)
+                if not heap:  # idle projects leave the ring and forfeit their deficit
+                    active.popleft()
+                    del self.queues[project_id]
+                    del self.deficit[project_id]
+                    self._credited = False
+                return task
+            active.rotate(-1)
+            self._credited = False
+        return None
+
+    def dequeue_ready(self, limit: Optional[int] = None, now: Optional[float] = None) -> List[Any]:
+        """
+        Fetch up to `limit` due tasks in DRR order (for WRR). By default one
+        task per active project, so a call is roughly one round.
+        """
+        self._release(self.clock() if now is None else now)
+        if limit is None:
+            limit = len(self.active)
         ready = []
-        for project_id, queue in self.queues.items():
-            if queue:
-                ready.append(queue.popleft())
+        while len(ready) < limit:
+            task = self._next()
+            if task is None:
+                break
+            ready.append(task)
         return ready
 
-    def postpone(self, task_id):
-        """Postpone a task for later execution (stub)."""
-        # In production, move task to a postponed queue
-        pass
+    def next_eta(self) -> Optional[float]:
+        """When the next task falls due: now if any are due, else the earliest ETA, or None."""
+        if self.active:
+            return self.clock()
+        return self.timers.next_eta()
+
+    def _running(self, task_id) -> Any:
+        entry = self.index.get(task_id)
+        if entry is None or entry[0] != RUNNING:
+            raise KeyError(f"Task {task_id} is not running")
+        return entry[1]
+
+    def ack(self, task_id):
+        """Forget a task that completed."""
+        self._running(task_id)
+        del self.index[task_id]
+
+    def postpone(self, task_id, delay: float = 0.0, now: Optional[float] = None):
+        """Put a running task back, due `delay` seconds from now; does not count as a failure."""
+        task = self._running(task_id)
+        now = self.clock() if now is None else now
+        task["eta"] = now + delay
+        self.stats["postponed"] += 1
+        self.enqueue(task, now=now)
+
+    def fail(self, task_id, error: Optional[str] = None, now: Optional[float] = None) -> bool:
+        """
+        Record a failed attempt. The task is retried after backoff * 2**(n-1)
+        seconds (capped, with jitter), or poisoned after max_attempts.
+        Returns True if it will be retried.
+        """
+        task = self._running(task_id)
+        attempts = task["attempts"] = task.get("attempts", 0) + 1
+        if error is not None:
+            task["last_error"] = error
+        if attempts >= self.max_attempts:
+            self.poison[task_id] = task
+            self.index[task_id] = (POISONED, task)
+            self.stats["poisoned"] += 1
+            return False
+        delay = retry_delay(attempts, self.backoff, self.max_backoff)
+        now = self.clock() if now is None else now
+        task["eta"] = now + delay
+        self.stats["retried"] += 1
+        self.enqueue(task, now=now)
+        return True
 
-    def fail(self, task_id):
-        """Mark a task as failed (stub)."""
-        # In production, move task to a failed queue
-        pass
+    def replay(self, task_id=None) -> int:
+        """Re-enqueue one poisoned task (or all of them) with a fresh attempt count."""
+        ids = list(self.poison) if task_id is None else [task_id]
+        for tid in ids:
+            task = self.poison.pop(tid)
+            task["attempts"] = 0
+            task.pop("eta", None)
+            self.enqueue(task)
+        self.stats["replayed"] += len(ids)
+        return len(ids)
@@ -1,44 +1,143 @@
 """
 Main scheduler service for agent task dispatch.
-Implements: WRR, cost checks, dispatch.
+Implements: weighted deficit round-robin, cost checks, dispatch, and
+back-pressure that postpones tasks until budget windows recover, and
+hand-off to the asyncio worker pool.
 """
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
 from .queue import TaskQueue
-from ..core.cost_monitor import CostMonitor
+from .workers import PoolFull, WorkerPool
+from ..core.cost_monitor import CostMonitor, Reservation
 
 class SchedulerService:
     """
     Schedules and dispatches agent tasks with fairness and cost enforcement.
     Implements: weighted round-robin, back-pressure, retries.
+    Fairness comes from the queue's deficit round-robin; per-project
+    weights are set with set_weight().
     """
-    def __init__(self):
+    def __init__(self, budget_retry_delay: float = 600.0, pool: Optional[WorkerPool] = None,
+                 pool_full_delay: float = 1.0, in_flight_retry_delay: float = 5.0):
         self.queue = TaskQueue()
+        self.pool = pool  # without a pool, dispatch() only logs
+        self.pool_full_delay = pool_full_delay
         self.cost_monitor = CostMonitor()
         self.project_token_caps = {}  # project_id -> weekly token cap
-        self.project_usage = {}       # project_id -> tokens used this week
+        # recheck delay for tasks blocked by a budget that does not roll off
+        self.budget_retry_delay = budget_retry_delay
+        # recheck delay for tasks blocked only by other tasks' in-flight tokens
+        self.in_flight_retry_delay = in_flight_retry_delay
+        self.reservations: Dict[Any, Tuple[Reservation, Any]] = {}  # task_id -> (tokens held, task)
+
+    def set_weight(self, project_id, weight: float):
+        """Give a project a larger (or smaller) share of dispatched tokens."""
+        self.queue.set_weight(project_id, weight)
 
     def run(self):
         """
         Main loop: fetch ready tasks, apply WRR, dispatch.
-        - One task per project per round (fairness)
-        - Skip tasks if will exceed budget (back-pressure)
+        - Deficit round-robin over projects with pending work (fairness by token share)
+        - Postpone tasks that would exceed budget (back-pressure)
+        Weekly usage comes from the cost monitor's rolling week window; a
+        task over the weekly cap is postponed until enough usage rolls off,
+        so blocked projects cost nothing until then. A task that cannot fit
+        even in an empty window counts as a failure (and is eventually
+        poisoned).
+        Each dispatched task reserves its est_tokens with the cost monitor
+        until it settles, and reserved tokens count as used, so one run()
+        cannot dispatch more than the cap allows.
         """
         ready_tasks = self.queue.dequeue_ready()
         for task in ready_tasks:
             project_id = task.get("project_id")
+            task_id = task.get("id")
             est_tokens = task.get("est_tokens", 0)
-            # Back-pressure: skip if project is over 80% of token cap
+            # Back-pressure: postpone if project is over 80% of token cap
             cap = self.project_token_caps.get(project_id, 100000)
-            used = self.project_usage.get(project_id, 0)
-            if used + est_tokens > 0.8 * cap:
-                self.queue.postpone(task.get("id"))
+            used = self.cost_monitor.window_tokens(project_id, "week")
+            excess = used + est_tokens - 0.8 * cap
+            if excess > 0:
+                delay = self.cost_monitor.time_to_recover(project_id, excess, "week")
+                if delay is None:
+                    self.queue.fail(task_id, f"{est_tokens} tokens exceed the weekly cap of {cap}")
+                else:
+                    self.queue.postpone(task_id, delay)
                 continue
-            if self.cost_monitor.will_exceed(project_id, est_tokens):
-                self.queue.postpone(task.get("id"))
+            if used + self.cost_monitor.reserved(project_id) + est_tokens > 0.8 * cap:
+                self.queue.postpone(task_id, self.in_flight_retry_delay)  # fits once in-flight work settles
                 continue
+            reservation = self.cost_monitor.reserve(project_id, est_tokens)
+            if reservation is None:
+                self.queue.postpone(task_id, self.budget_retry_delay)
+                continue
+            self.reservations[task_id] = (reservation, task)
             self.dispatch(task)
-            self.project_usage[project_id] = used + est_tokens
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until run() has work (0 if tasks are due), or None when the queue is empty."""
+        eta = self.queue.next_eta()
+        return None if eta is None else max(eta - self.queue.clock(), 0.0)
+
+    def complete(self, task_id, result: Any = None):
+        """
+        Report a dispatched task as done and settle its reservation with the
+        runner's usage: a result dict with input_tokens/output_tokens is
+        priced for its model, one with "tokens" is charged as is, and
+        anything else is charged at the estimate.
+        """
+        self.queue.ack(task_id)
+        held = self.reservations.pop(task_id, None)
+        if held is None:
+            return
+        reservation, task = held
+        usage = result if isinstance(result, dict) else {}
+        agent_id, model = task.get("agent_id"), usage.get("model", task.get("model"))
+        if model is not None and "input_tokens" in usage and "output_tokens" in usage:
+            self.cost_monitor.commit_usage(reservation, agent_id, model,
+                                           usage["input_tokens"], usage["output_tokens"])
+        else:
+            self.cost_monitor.commit(reservation, agent_id, usage.get("tokens", reservation.tokens), 0.0)
+
+    def failed(self, task_id, error: Optional[str] = None) -> bool:
+        """Report a dispatched task as failed (its reservation is released); returns True if it will be retried."""
+        self._release(task_id)
+        return self.queue.fail(task_id, error)
+
+    def _release(self, task_id):
+        held = self.reservations.pop(task_id, None)
+        if held is not None:
+            self.cost_monitor.release(held[0])
 
     def dispatch(self, task):
-        """Dispatch a task to a worker or agent pod (stub)."""
-        # In production, this would hand off to a worker or remote agent
-        print(f"Dispatching task {task.get('id')} for project {task.get('project_id')}")
+        """
+        Hand a task to the worker pool; its outcome is reported back through
+        complete()/failed(). Must run on the pool's event loop.
+        """
+        if self.pool is None:
+            print(f"Dispatching task {task.get('id')} for project {task.get('project_id')}")
+            return
+        try:
+            handle = self.pool.submit_nowait(task)
+        except PoolFull:  # pool saturated: try again shortly
+            self._release(task.get("id"))
+            self.queue.postpone(task.get("id"), self.pool_full_delay)
+            return
+        handle.add_done_callback(lambda h: self._settle(task.get("id"), h))
+
+    def _settle(self, task_id, handle: asyncio.Task):
+        if handle.cancelled():  # cancelled on purpose: drop it uncharged
+            self._release(task_id)
+            self.queue.ack(task_id)
+        elif handle.exception() is not None:
+            self.failed(task_id, repr(handle.exception()))
+        else:
+            self.complete(task_id, handle.result())
+
+    async def serve(self, idle: float = 1.0):
+        """Dispatch forever, sleeping until the next task is due (at most `idle` seconds)."""
+        while True:
+            self.run()
+            wait = self.wait_time()
+            await asyncio.sleep(idle if wait is None else min(max(wait, 0.001), idle))
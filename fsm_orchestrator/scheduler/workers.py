@@ -1,13 +1,250 @@
 """
 Worker wrappers for agent execution and retry logic.
+Implements: an asyncio worker pool that keeps many I/O-bound LLM calls in
+flight under per-model and per-agent concurrency caps and per-model
+tokens-per-minute buckets, with timeouts, cancellation and queue metrics.
 """
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from ..util.backoff import retry_delay
+
+Runner = Callable[[Any], Awaitable[Any]]
+
+
+class PoolFull(RuntimeError):
+    """Raised by WorkerPool.submit_nowait() when max_pending tasks are outstanding."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate_per_minute` (tokens or requests), holding
+    at most `burst` (default one minute's worth). A request larger than the
+    burst waits for a full bucket and then drives it negative, so later
+    callers repay the overdraft. Waiters are served in arrival order.
+    """
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute if burst is None else burst
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n: float) -> float:
+        """Take n tokens and return 0, or return the seconds to wait before they are available."""
+        self._refill()
+        need = min(n, self.capacity)
+        if self.tokens >= need:
+            self.tokens -= n
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    async def acquire(self, n: float):
+        async with self._lock:
+            while True:
+                wait = self.try_acquire(n)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def refund(self, n: float):
+        """Give back n tokens (negative n charges extra, e.g. when a call used more than estimated)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + n)
+
+
 class Worker:
     """
     Executes agent tasks and handles retries/backoff.
+    `runner(task)` is the coroutine making the LLM/agent call. Each call is
+    bounded by `timeout`; errors in `retry_on` (transient transport errors)
+    are retried up to `retries` times with exponential backoff and jitter.
+    Anything else propagates so the queue's fail() path can take over.
     """
-    def execute(self, task):
+    def __init__(self, runner: Runner, timeout: Optional[float] = 120.0, retries: int = 2,
+                 backoff: float = 0.5, max_backoff: float = 30.0,
+                 retry_on: Tuple[Type[BaseException], ...] = (ConnectionError,)):
+        self.runner = runner
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+
+    async def _call(self, task):
+        return await asyncio.wait_for(self.runner(task), self.timeout)
+
+    async def execute(self, task):
         """Run the agent for the given task and capture results."""
-        pass
-    def retry(self, task):
+        try:
+            return await self._call(task)
+        except self.retry_on:
+            if not self.retries:
+                raise
+            return await self.retry(task)
+
+    async def retry(self, task, attempt: int = 1):
         """Retry a failed task with backoff."""
-        pass
+        while True:
+            await asyncio.sleep(retry_delay(attempt, self.backoff, self.max_backoff))
+            try:
+                return await self._call(task)
+            except self.retry_on:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+
+
+class WorkerPool:
+    """
+    Runs tasks concurrently on the event loop. Each task waits, in order,
+    for a slot for its agent (`agent_id`), a slot for its model (`model`),
+    its `est_tokens` from the model's tokens-per-minute bucket and one
+    request from its requests-per-minute bucket, then one of
+    `max_in_flight` global slots. A task blocked on one model never holds
+    up tasks for another. submit() waits while `max_pending` tasks are
+    outstanding.
+    If the runner's result is a dict with a "tokens" count, the model's
+    bucket is corrected by the difference from est_tokens.
+    """
+    def __init__(self, worker: Worker, max_in_flight: int = 512, max_pending: int = 10_000,
+                 model_concurrency: Optional[Dict[str, int]] = None, default_model_concurrency: int = 64,
+                 agent_concurrency: Optional[Dict[str, int]] = None, default_agent_concurrency: int = 16,
+                 tokens_per_minute: Optional[Dict[str, float]] = None,
+                 requests_per_minute: Optional[Dict[str, float]] = None, wait_samples: int = 10_000):
+        self.worker = worker
+        self.max_in_flight = max_in_flight
+        self.model_concurrency = dict(model_concurrency or {})
+        self.default_model_concurrency = default_model_concurrency
+        self.agent_concurrency = dict(agent_concurrency or {})
+        self.default_agent_concurrency = default_agent_concurrency
+        self.token_buckets = {m: TokenBucket(r) for m, r in (tokens_per_minute or {}).items()}
+        self.request_buckets = {m: TokenBucket(r) for m, r in (requests_per_minute or {}).items()}
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._room = asyncio.Event()  # set when a pending task finishes
+        self._models: Dict[str, asyncio.Semaphore] = {}
+        self._agents: Dict[str, asyncio.Semaphore] = {}
+        self._running = set()
+        self._by_id: Dict[Any, asyncio.Task] = {}
+        self.queued = 0  # submitted, not yet calling the model
+        self.in_flight = 0
+        self.wait_times = deque(maxlen=wait_samples)  # seconds from submit to call start
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0}
+
+    def _semaphore(self, table, limits, default, key):
+        if key is None:
+            return contextlib.nullcontext()
+        sem = table.get(key)
+        if sem is None:
+            sem = table[key] = asyncio.Semaphore(limits.get(key, default))
+        return sem
+
+    async def submit(self, task: Any) -> asyncio.Task:
+        """Start a task, waiting while max_pending tasks are outstanding; returns its asyncio task."""
+        while self.pending >= self.max_pending:
+            self._room.clear()
+            await self._room.wait()
+        return self._start(task)
+
+    def submit_nowait(self, task: Any) -> asyncio.Task:
+        """Start a task from synchronous code running on the loop; raises PoolFull when full."""
+        if self.pending >= self.max_pending:
+            raise PoolFull(f"Worker pool has {self.pending} tasks pending")
+        return self._start(task)
+
+    def _start(self, task: Any) -> asyncio.Task:
+        loop = asyncio.get_running_loop()  # raises before anything is counted
+        started = [False]
+        handle = loop.create_task(self._run(task, time.perf_counter(), started))
+        self.stats["submitted"] += 1
+        self.queued += 1
+        handle.add_done_callback(lambda h: self._finished(h, task, started))
+        self._running.add(handle)
+        task_id = task.get("id")
+        if task_id is not None:
+            self._by_id[task_id] = handle
+        return handle
+
+    def _finished(self, handle: asyncio.Task, task: Any, started):
+        # a done callback, so tasks cancelled before their first step are counted too
+        if not started[0]:
+            self.queued -= 1
+        if handle.cancelled():
+            self.stats["cancelled"] += 1
+        self._running.discard(handle)
+        if self._by_id.get(task.get("id")) is handle:
+            del self._by_id[task.get("id")]
+        self._room.set()
+
+    async def _run(self, task, submitted, started):
+        model = task.get("model", "default")
+        try:
+            async with self._semaphore(self._agents, self.agent_concurrency,
+                                       self.default_agent_concurrency, task.get("agent_id")), \
+                       self._semaphore(self._models, self.model_concurrency,
+                                       self.default_model_concurrency, model):
+                est_tokens = task.get("est_tokens", 0) or 0
+                bucket = self.token_buckets.get(model)
+                if bucket is not None:
+                    await bucket.acquire(est_tokens)
+                if model in self.request_buckets:
+                    await self.request_buckets[model].acquire(1)
+                async with self._slots:
+                    self.queued -= 1
+                    self.in_flight += 1
+                    started[0] = True
+                    self.wait_times.append(time.perf_counter() - submitted)
+                    try:
+                        result = await self.worker.execute(task)
+                    finally:
+                        self.in_flight -= 1
+                if bucket is not None and isinstance(result, dict) and "tokens" in result:
+                    bucket.refund(est_tokens - result["tokens"])
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.stats["failed"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["completed"] += 1
+        return result
+
+    def cancel(self, task_id) -> bool:
+        """Cancel a submitted task; returns False if it is unknown or already finished."""
+        handle = self._by_id.get(task_id)
+        return handle is not None and handle.cancel()
+
+    @property
+    def pending(self) -> int:
+        return self.queued + self.in_flight
+
+    def wait_percentile(self, q: float) -> float:
+        """Seconds from submit to call start at percentile q in [0, 100] over recent tasks."""
+        if not self.wait_times:
+            return 0.0
+        ordered = sorted(self.wait_times)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def metrics(self) -> dict:
+        """Queue depth, in-flight calls, wait times and counters."""
+        return dict(self.stats, queued=self.queued, in_flight=self.in_flight,
+                    wait_p50=self.wait_percentile(50), wait_p99=self.wait_percentile(99))
+
+    async def join(self):
+        """Wait for every submitted task to finish (errors are left on the tasks)."""
+        while self._running:
+            await asyncio.gather(*list(self._running), return_exceptions=True)
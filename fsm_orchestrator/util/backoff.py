@@ -0,0 +1,11 @@
+"""
+Retry backoff helpers.
+Implements: capped exponential backoff with jitter, shared by the task
+queues, the worker pool and the embedding service.
+"""
+import random
+
+
+def retry_delay(attempts: int, backoff: float, max_backoff: float) -> float:
+    """Backoff before retry number `attempts`: backoff * 2**(attempts-1), capped, with 50-100% jitter."""
+    return min(max_backoff, backoff * 2 ** (attempts - 1)) * (0.5 + random.random() / 2)
@@ -1,7 +1,158 @@
 """
 Token and cost constants for orchestrator.
+Implements: per-model price tables, a hot-reloadable pricing engine, and an
+array-backed spend ledger aggregated per project, agent and model.
 """
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+from ..core.telemetry import record_log
+
+# Flat $ per 1K tokens (legacy single-rate table).
 TOKEN_COST_PER_MODEL = {
     "gpt-4": 0.03,
     "gpt-3.5": 0.002,
 }
+
+# $ per 1K tokens, split by direction.
+MODEL_PRICES = {
+    "gpt-4": {"input": 0.03, "output": 0.06},
+    "gpt-3.5": {"input": 0.0015, "output": 0.002},
+    "gemini-2.5-flash": {"input": 0.0003, "output": 0.0025},
+}
+
+
+class PricingEngine:
+    """
+    Computes dollars from model name and input/output token counts.
+    Prices can be hot-reloaded from a JSON file shaped like MODEL_PRICES;
+    the file is re-read at most every `reload_interval` seconds and only
+    when its mtime changes.
+    """
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None,
+                 path: Optional[str] = None, reload_interval: float = 5.0):
+        self.prices = dict(prices or MODEL_PRICES)
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._checked = 0.0
+        if path:
+            self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the price file if it changed. Returns True when prices were replaced."""
+        self._checked = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime  # a bad file is reported once, not on every check
+        try:
+            with open(self.path) as f:
+                prices = json.load(f)
+            table = {model: {"input": float(p["input"]), "output": float(p["output"])}
+                     for model, p in prices.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+            record_log(f"Keeping previous prices; could not load {self.path}: {exc!r}", level="error")
+            return False
+        # swap the whole table so readers never see a half-updated one
+        self.prices = table
+        return True
+
+    def _maybe_reload(self):
+        if self.path and time.monotonic() - self._checked >= self.reload_interval:
+            self.reload()
+
+    def _prices_for(self, model: str) -> Dict[str, float]:
+        self._maybe_reload()
+        try:
+            return self.prices[model]
+        except KeyError:
+            raise KeyError(f"No price configured for model {model!r}") from None
+
+    def price(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        """Return the dollar cost of one call."""
+        p = self._prices_for(model)
+        return (input_tokens * p["input"] + output_tokens * p["output"]) / 1000.0
+
+    def estimate(self, model: str, tokens: int) -> float:
+        """Upper-bound cost of `tokens` tokens when the input/output split is unknown."""
+        p = self._prices_for(model)
+        return tokens * max(p["input"], p["output"]) / 1000.0
+
+
+class SpendLedger:
+    """
+    Compact spend ledger: one row per (project, agent, model) in growable
+    NumPy arrays, with interned ids so aggregation is a bincount.
+    """
+    def __init__(self, capacity: int = 1024):
+        self._rows: Dict[Tuple[str, str, str], int] = {}
+        self._ids: Dict[str, Dict[str, int]] = {"project": {}, "agent": {}, "model": {}}
+        self._keys = np.zeros((capacity, 3), dtype=np.int32)
+        self.input_tokens = np.zeros(capacity, dtype=np.int64)
+        self.output_tokens = np.zeros(capacity, dtype=np.int64)
+        self.dollars = np.zeros(capacity, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _intern(self, kind, name):
+        ids = self._ids[kind]
+        if name not in ids:
+            ids[name] = len(ids)
+        return ids[name]
+
+    def _row(self, project_id, agent_id, model):
+        key = (project_id, agent_id, model)
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self.dollars):
+                self._grow()
+            self._keys[row] = (self._intern("project", project_id),
+                               self._intern("agent", agent_id),
+                               self._intern("model", model))
+            self._rows[key] = row
+        return row
+
+    def _grow(self):
+        size = 2 * len(self.dollars)
+        self._keys = np.resize(self._keys, (size, 3))
+        for name in ("input_tokens", "output_tokens", "dollars"):
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, project_id, agent_id, model, input_tokens, output_tokens, dollars):
+        with self._lock:
+            row = self._row(project_id, agent_id, model)
+            self.input_tokens[row] += input_tokens
+            self.output_tokens[row] += output_tokens
+            self.dollars[row] += dollars
+
+    def totals(self, by: str = "project") -> Dict[str, float]:
+        """Return dollars aggregated by 'project', 'agent' or 'model'."""
+        column = ("project", "agent", "model").index(by)
+        with self._lock:
+            n = len(self._rows)
+            names = list(self._ids[by])
+            sums = np.bincount(self._keys[:n, column], weights=self.dollars[:n], minlength=len(names))
+        return dict(zip(names, sums.tolist()))
+
+    def rows(self):
+        """Yield (project_id, agent_id, model, input_tokens, output_tokens, dollars) per row."""
+        with self._lock:
+            items = list(self._rows.items())
+            snapshot = [(key, int(self.input_tokens[r]), int(self.output_tokens[r]), float(self.dollars[r]))
+                        for key, r in items]
+        for key, tin, tout, dollars in snapshot:
+            yield key + (tin, tout, dollars)
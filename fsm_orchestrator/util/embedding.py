@@ -1,6 +1,284 @@
 """
 Embedding model wrapper and retry logic.
+Implements: pluggable embedding backends (including a deterministic local
+hashing embedder), micro-batching of concurrent requests, a content-hash
+LRU cache with optional on-disk persistence, retries with exponential
+backoff, and hit-rate / throughput metrics.
 """
+import asyncio
+import dbm
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type
+import numpy as np
+from ..core.telemetry import record_metric
+from .backoff import retry_delay
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: signed feature hashing of words and word
+    bigrams, L2-normalized. No model or network; stable across processes,
+    so it suits offline tests and development.
+    """
+    def __init__(self, dim: int = 256, name: str = "hashing"):
+        self.dim = dim
+        self.name = f"{name}-{dim}"
+
+    def _features(self, text):
+        words = _TOKEN_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return np.divide(out, norms, out=out, where=norms > 0)
+
+
+class EmbeddingCache:
+    """
+    LRU of embeddings keyed by a content hash of (backend name, text), with
+    an optional dbm file behind it so entries survive restarts.
+    """
+    def __init__(self, capacity: int = 10_000, path: Optional[str] = None):
+        self.capacity = capacity
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._db = dbm.open(path, "c") if path else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(namespace: str, text: str) -> bytes:
+        return hashlib.sha256(f"{namespace}\0{text}".encode()).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector
+            if self._db is None:
+                return None
+            raw = self._db.get(key)
+            if raw is None:
+                return None
+            vector = np.frombuffer(raw, dtype=np.float32)
+            self._remember(key, vector)
+            return vector
+
+    def put(self, key: bytes, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db[key] = vector.tobytes()
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class EmbeddingService:
+    """
+    Front end for an embedding backend (anything with
+    `embed_batch(texts) -> rows`, plus a `name` used to namespace the cache).
+    Cache misses from concurrent callers are collected by one batching
+    thread for up to `max_wait` seconds or `batch_size` texts and sent as
+    one backend call, with up to `concurrency` calls in flight; identical
+    in-flight texts share one request. Backend calls failing with a
+    `retry_on` error (transport errors and timeouts by default) are retried
+    with exponential backoff and jitter; anything else fails at once.
+    """
+    def __init__(self, backend=None, batch_size: int = 64, max_wait: float = 0.005, concurrency: int = 4,
+                 cache: Optional[EmbeddingCache] = None, retries: int = 3, backoff: float = 0.1,
+                 max_backoff: float = 10.0,
+                 retry_on: Tuple[Type[BaseException], ...] = (ConnectionError, TimeoutError),
+                 sleep: Callable[[float], None] = time.sleep):
+        self.backend = backend or HashingEmbedder()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.sleep = sleep
+        self.metrics = {"requests": 0, "hits": 0, "misses": 0, "batches": 0, "embedded": 0,
+                        "backend_seconds": 0.0, "retries": 0, "failures": 0}
+        self._pending: Dict[bytes, Tuple[str, Future]] = {}  # unresolved texts by cache key
+        self._waiting: List[bytes] = []  # pending keys not yet handed to a backend call
+        self._slots = threading.Semaphore(concurrency)
+        self._calls = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding-call")
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def namespace(self) -> str:
+        return getattr(self.backend, "name", type(self.backend).__name__)
+
+    def submit(self, text: str) -> Future:
+        """Return a future for the embedding of text (resolved immediately on a cache hit)."""
+        key = self.cache.key(self.namespace, text)
+        vector = self.cache.get(key)
+        with self._cond:
+            self.metrics["requests"] += 1
+            if vector is not None:
+                self.metrics["hits"] += 1
+                future = Future()
+                future.set_result(vector)
+                return future
+            self.metrics["misses"] += 1
+            if key in self._pending:
+                return self._pending[key][1]
+            if self._closed:
+                raise RuntimeError("EmbeddingService is closed")
+            future = Future()
+            self._pending[key] = (text, future)
+            self._waiting.append(key)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+            return future
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text, blocking until its batch completes."""
+        return self.submit(text).result().tolist()
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed several texts; they join the same micro-batches as concurrent callers."""
+        futures = [self.submit(t) for t in texts]
+        return np.stack([f.result() for f in futures]) if futures else np.zeros((0, 0), dtype=np.float32)
+
+    async def aembed(self, text: str) -> List[float]:
+        """Awaitable embed() for asyncio callers."""
+        return (await asyncio.wrap_future(self.submit(text))).tolist()
+
+    def _run(self):
+        while True:
+            self._slots.acquire()  # wait for a free call slot before collecting a batch
+            with self._cond:
+                while not self._waiting and not self._closed:
+                    self._cond.wait()
+                if not self._waiting:
+                    self._slots.release()
+                    return
+                # first request opens a window; more arrivals share the batch
+                deadline = time.monotonic() + self.max_wait
+                while len(self._waiting) < self.batch_size and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                keys = self._waiting[:self.batch_size]
+                del self._waiting[:self.batch_size]
+                batch = [(key, self._pending[key]) for key in keys]
+            self._calls.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            self._embed_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _embed_batch(self, batch):
+        texts = [text for _, (text, _) in batch]
+        try:
+            rows = self._call_backend(texts)
+        except Exception as exc:
+            with self._cond:
+                self.metrics["failures"] += 1
+                for key, (_, future) in batch:
+                    self._pending.pop(key, None)
+            for _, (_, future) in batch:
+                future.set_exception(exc)
+            return
+        for (key, _), row in zip(batch, rows):
+            self.cache.put(key, row)
+        with self._cond:
+            for key, _ in batch:
+                self._pending.pop(key, None)
+        for (_, (_, future)), row in zip(batch, rows):
+            future.set_result(np.asarray(row, dtype=np.float32))
+
+    def _call_backend(self, texts):
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                rows = self.backend.embed_batch(texts)
+            except self.retry_on:
+                if attempt == self.retries:
+                    raise
+                with self._cond:
+                    self.metrics["retries"] += 1
+                self.sleep(retry_delay(attempt + 1, self.backoff, self.max_backoff))
+                continue
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self.metrics["batches"] += 1
+                self.metrics["embedded"] += len(texts)
+                self.metrics["backend_seconds"] += elapsed
+            record_metric("embedding_batch_size", len(texts), {"backend": self.namespace})
+            return rows
+
+    def stats(self) -> dict:
+        """Counters plus cache hit rate, mean batch size and backend throughput (texts/s)."""
+        with self._cond:
+            m = dict(self.metrics)
+        m["hit_rate"] = m["hits"] / m["requests"] if m["requests"] else 0.0
+        m["mean_batch"] = m["embedded"] / m["batches"] if m["batches"] else 0.0
+        m["throughput"] = m["embedded"] / m["backend_seconds"] if m["backend_seconds"] else 0.0
+        return m
+
+    def close(self):
+        """Finish queued requests, stop the batching thread and close the disk cache."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+        self._calls.shutdown(wait=True)
+        self.cache.close()
+
+
+_default_service: Optional[EmbeddingService] = None
+_default_lock = threading.Lock()
+
+
+def default_service() -> EmbeddingService:
+    """The process-wide service behind embed(); swap it with set_default_service()."""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = EmbeddingService()
+        return _default_service
+
+
+def set_default_service(service: EmbeddingService):
+    global _default_service
+    with _default_lock:
+        _default_service = service
+
+
 def embed(text):
-    """Return embedding vector for input text (stub)."""
-    pass
+    """Return embedding vector for input text."""
+    return default_service().embed(text)
@@ -0,0 +1,14 @@
+import pytest
+from fsm_orchestrator.core.workflow import compile_workflow
+
+@pytest.fixture
+def workflow():
+    """Compiled three-state studio workflow: Concept -> Design -> Code."""
+    return compile_workflow({
+        "name": "studio", "version": "1", "initial": "Concept",
+        "states": [{"name": "Concept"}, {"name": "Design"}, {"name": "Code"}],
+        "transitions": [
+            {"from_state": "Concept", "to_state": "Design", "confidence": 0.9},
+            {"from_state": "Design", "to_state": "Code", "confidence": 0.9},
+        ],
+    })
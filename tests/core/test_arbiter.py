@@ -20,6 +20,38 @@ def test_score_weights():
     expected = 0.3*0.5 + 0.4*0.7 + 0.3*0.2
     assert abs(score - expected) < 1e-6
 
+def test_partial_weights_fall_back_to_defaults():
+    arbiter = TransitionArbiter()
+    p = make_proposal(0.5, 0.7, 0.2)
+    assert abs(arbiter.score(p, {"urgency": 1.0}) - (0.5 + 0.4*0.7 + 0.3*0.2)) < 1e-6
+    assert TransitionArbiter(weights={"confidence": 1.0}).score(p) == pytest.approx(0.49 + 0.9)
+
+def test_packed_segment_argmax_matches_select_batch():
+    arbiter = TransitionArbiter()
+    batch = {"p1": [make_proposal(0.1, 0.2, 0.3), make_proposal(0.9, 0.1, 0.1)], "p2": [],
+             "p3": [make_proposal(0.5, 0.5, 0.5), make_proposal(0.5, 0.5, 0.5)]}
+    project_ids, flat, features, starts = arbiter.pack(batch)
+    rows = arbiter.segment_argmax(features @ arbiter.weight_vector(), starts)
+    packed = {pid: flat[r] if r >= 0 else None for pid, r in zip(project_ids, rows.tolist())}
+    assert packed == arbiter.select_batch(batch) and packed["p3"] is batch["p3"][0]
+
+def test_select_packed_scores_each_project_with_its_profile():
+    arbiter = TransitionArbiter()
+    arbiter.assign_profile("p_crunch", "crunch")
+    arbiter.assign_profile("p_explore", "exploration")
+    urgent, intent = make_proposal(0.9, 0.0, 0.0), make_proposal(0.0, 0.0, 0.8)
+    batch = {"p_crunch": [intent, urgent], "p_empty": [], "p_explore": [urgent, intent],
+             "p_default": [intent, urgent]}
+    project_ids, flat, features, starts = arbiter.pack(batch)
+    rows = arbiter.select_packed(project_ids, features, starts)
+    winners = {pid: flat[r] if r >= 0 else None for pid, r in zip(project_ids, rows.tolist())}
+    assert winners == arbiter.select_batch(batch)
+    assert winners["p_crunch"] is urgent and winners["p_explore"] is intent and winners["p_empty"] is None
+    override = {"urgency": 0.0, "user_intent": 1.0}
+    rows = arbiter.select_packed(project_ids, features, starts, weights=override)
+    assert [flat[r] if r >= 0 else None for r in rows.tolist()] == list(
+        arbiter.select_batch(batch, weights=override).values())
+
 def test_select_highest_score():
     arbiter = TransitionArbiter()
     proposals = [
@@ -35,3 +67,57 @@ def test_select_highest_score():
 def test_select_empty():
     arbiter = TransitionArbiter()
     assert arbiter.select("proj1", []) is None
+
+def test_select_first_wins_ties():
+    arbiter = TransitionArbiter()
+    a, b = make_proposal(0.5, 0.5, 0.5), make_proposal(0.5, 0.5, 0.5)
+    assert arbiter.select("proj1", [a, b]) is a
+
+def test_select_batch_matches_select():
+    arbiter = TransitionArbiter()
+    batch = {
+        "p1": [make_proposal(0.1, 0.1, 0.1), make_proposal(0.9, 0.1, 0.1)],
+        "p2": [],
+        "p3": [make_proposal(0.1, 0.9, 0.1), make_proposal(0.1, 0.1, 0.9), make_proposal(0.1, 0.9, 0.1)],
+    }
+    winners = arbiter.select_batch(batch)
+    assert winners["p2"] is None
+    for pid in ("p1", "p3"):
+        assert winners[pid] is arbiter.select(pid, batch[pid])
+    assert winners["p3"] is batch["p3"][0]
+
+def test_select_batch_weight_override():
+    arbiter = TransitionArbiter()
+    urgent, intent = make_proposal(0.9, 0.0, 0.0), make_proposal(0.0, 0.0, 0.8)
+    assert arbiter.select_batch({"p1": [urgent, intent]})["p1"] is urgent
+    winners = arbiter.select_batch({"p1": [urgent, intent]}, weights={"urgency": 0.0, "user_intent": 1.0})
+    assert winners["p1"] is intent
+
+def test_select_batch_all_empty():
+    assert TransitionArbiter().select_batch({"p1": [], "p2": []}) == {"p1": None, "p2": None}
+
+def test_top_k_from_generator():
+    arbiter = TransitionArbiter()
+    proposals = [make_proposal(u / 10, 0.0, 0.0) for u in range(10)]
+    ranked = arbiter.top_k("proj1", (p for p in proposals), k=3)
+    assert [p for _, p in ranked] == proposals[9:6:-1]
+    assert ranked[0][0] >= ranked[1][0] >= ranked[2][0]
+    assert arbiter.select("proj1", iter(proposals)) is proposals[9]
+    assert arbiter.select("proj1", iter([])) is None
+
+def test_top_k_ties_keep_arrival_order():
+    arbiter = TransitionArbiter()
+    proposals = [make_proposal(0.5, 0.5, 0.5) for _ in range(5)]
+    assert [p for _, p in arbiter.top_k("proj1", proposals, k=2)] == proposals[:2]
+
+def test_weight_profiles():
+    arbiter = TransitionArbiter()
+    urgent, intent = make_proposal(0.9, 0.0, 0.0), make_proposal(0.0, 0.0, 0.8)
+    arbiter.assign_profile("ideation", "exploration")
+    arbiter.assign_profile("p_crunch", "crunch")
+    assert arbiter.select("p1", [urgent, intent], phase="ideation") is intent
+    assert arbiter.select("p_crunch", [urgent, intent], phase="ideation") is urgent
+    batch = arbiter.select_batch({"p_crunch": [intent, urgent], "p2": [urgent, intent]})
+    assert batch["p_crunch"] is urgent
+    with pytest.raises(KeyError):
+        arbiter.assign_profile("p1", "missing")
@@ -0,0 +1,47 @@
+import pytest
+from fsm_orchestrator.core.context import ContextAssembler, estimate_tokens
+from fsm_orchestrator.core.memory import MemoryManager, HOT_MEMORY, COMPRESSED_MEMORY, DECISIONS
+
+@pytest.fixture(autouse=True)
+def clear_memory():
+    HOT_MEMORY.clear()
+    COMPRESSED_MEMORY.clear()
+    DECISIONS.clear()
+
+def msg(content, tokens):
+    return {"content": content, "token_count": tokens}
+
+def test_packs_by_priority_and_keeps_hot_contiguous():
+    decision = msg("@DECISION(reason=x) use postgres", 5)
+    hot = [msg("old", 4), msg("big", 8), msg("recent", 3), decision, msg("latest", 2)]
+    retrieved = [{"summary": "s1", "token_count": 3}, {"summary": "s2", "token_count": 1}]
+    ctx = ContextAssembler(token_budget=12).assemble(hot=hot, decisions=[decision], retrieved=retrieved)
+    # decision (5) first; hot newest-first: latest (2), decision is a duplicate, recent (3), big does not fit
+    assert [m.get("content") or m["summary"] for m in ctx.messages] == [
+        "recent", "latest", "@DECISION(reason=x) use postgres", "s2"]
+    assert ctx.tokens == 11 and ctx.budget == 12
+    assert ctx.breakdown["hot"] == {"included": 2, "dropped": 2, "duplicates": 1, "tokens": 5}
+    assert ctx.breakdown["retrieved"] == {"included": 1, "dropped": 1, "duplicates": 0, "tokens": 1}
+
+def test_counts_uncounted_messages_with_cached_estimate():
+    ctx = ContextAssembler(token_budget=100, overhead=1).assemble(hot=[{"content": "x" * 40}, {"content": "x" * 40}])
+    assert estimate_tokens("x" * 40) == 10
+    assert ctx.tokens == 11 and ctx.breakdown["hot"]["duplicates"] == 1
+    with pytest.raises(ValueError):
+        ContextAssembler(token_budget=0)
+
+def test_memory_manager_assemble_context():
+    mm = MemoryManager()
+    mm.append_hot("p1", {"content": "@DECISION(id=db) pick sqlite"})
+    for i in range(10):
+        mm.append_hot("p1", {"content": f"message {i:02d}"})  # 3 tokens each
+    COMPRESSED_MEMORY["p1"] = [{"summary": "warm summary", "embedding": [1, 0]}]
+    ctx = mm.assemble_context("p1", [1, 0], token_budget=16)
+    # decision (7 tokens), then hot newest-first fills the rest; hot outranks the warm summary
+    assert ctx.tokens == 16
+    assert [m["content"] for m in ctx.messages] == [
+        "message 07", "message 08", "message 09", "@DECISION(id=db) pick sqlite"]
+    assert ctx.breakdown["retrieved"]["dropped"] == 1
+    ctx = mm.assemble_context("p1", [1, 0], token_budget=16, top=1,
+                              assembler=ContextAssembler(16, counter=lambda text: 1))
+    assert ctx.messages[-1]["summary"] == "warm summary"
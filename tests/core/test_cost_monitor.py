@@ -16,3 +16,117 @@ def test_will_exceed():
     cm.record("p1", "a1", 40, 1.0)
     assert not cm.will_exceed("p1", 5)
     assert cm.will_exceed("p1", 15)
+
+def test_reserve_commit_release():
+    cm = CostMonitor(token_budget=100)
+    r1 = cm.reserve("p1", 60)
+    assert r1 is not None
+    assert cm.reserve("p1", 50) is None
+    assert cm.will_exceed("p1", 50)
+    cm.commit(r1, "a1", 30, 0.5)
+    report = cm.report("p1")
+    assert report["tokens_used"] == 30
+    assert report["tokens_reserved"] == 0
+    r2 = cm.reserve("p1", 70)
+    assert r2 is not None
+    cm.release(r2)
+    cm.release(r2)  # idempotent
+    assert cm.report("p1")["tokens_reserved"] == 0
+    with pytest.raises(ValueError):
+        cm.commit(r1, "a1", 1, 0.0)
+
+def test_concurrent_reservations_never_overshoot():
+    import threading
+    cm = CostMonitor(token_budget=10_000)
+    granted = []
+    def worker():
+        while True:
+            r = cm.reserve("p1", 7)
+            if r is None:
+                return
+            cm.commit(r, "a1", 7, 0.0)
+            granted.append(r.id)
+    threads = [threading.Thread(target=worker) for _ in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report = cm.report("p1")
+    assert report["tokens_used"] == 7 * len(granted)
+    assert 10_000 - 7 < report["tokens_used"] <= 10_000
+    assert report["tokens_reserved"] == 0
+
+def test_rolling_windows():
+    now = [1_000_000.0]
+    cm = CostMonitor(clock=lambda: now[0])
+    cm.record("p1", "a1", 10, 0.1)
+    now[0] += 30
+    cm.record("p1", "a2", 5, 0.1)
+    assert cm.window_tokens("p1", "minute") == 15
+    assert cm.window_tokens("p1", "minute", agent_id="a1") == 10
+    now[0] += 45  # first record is now older than a minute
+    assert cm.window_tokens("p1", "minute") == 5
+    assert cm.window_tokens("p1", "hour") == 15
+    now[0] += 7 * 24 * 3600
+    assert cm.window_tokens("p1", "week") == 0
+    assert cm.report("p1")["tokens_used"] == 15
+    assert cm.window_tokens("unknown", "week") == 0
+
+def test_pricing_engine_and_ledger():
+    from fsm_orchestrator.util.cost import PricingEngine
+    pricing = PricingEngine({"m1": {"input": 1.0, "output": 2.0}, "m2": {"input": 0.5, "output": 0.5}})
+    cm = CostMonitor(dollar_budget=10.0, pricing=pricing)
+    assert cm.record_usage("p1", "a1", "m1", 1000, 500) == pytest.approx(2.0)
+    cm.record_usage("p1", "a2", "m2", 2000, 0)
+    cm.record_usage("p2", "a1", "m1", 0, 1000)
+    assert cm.report("p1")["dollars_used"] == pytest.approx(3.0)
+    assert cm.report("p1")["tokens_used"] == 3500
+    assert cm.ledger.totals("project") == pytest.approx({"p1": 3.0, "p2": 2.0})
+    assert cm.ledger.totals("model") == pytest.approx({"m1": 4.0, "m2": 1.0})
+    assert cm.ledger.totals("agent") == pytest.approx({"a1": 4.0, "a2": 1.0})
+    with pytest.raises(KeyError):
+        cm.record_usage("p1", "a1", "unknown", 1, 1)
+
+def test_will_exceed_dollars():
+    from fsm_orchestrator.util.cost import PricingEngine
+    cm = CostMonitor(dollar_budget=5.0, pricing=PricingEngine({"m1": {"input": 1.0, "output": 2.0}}))
+    cm.record("p1", "a1", 0, 4.0)
+    assert not cm.will_exceed("p1", 10)
+    assert cm.will_exceed("p1", 0, est_dollars=1.5)
+    assert cm.will_exceed("p1", 1000, model="m1")  # priced at the $2/1K output rate
+    assert not cm.will_exceed("p1", 400, model="m1")
+
+def test_pricing_hot_reload(tmp_path):
+    import json, os
+    from fsm_orchestrator.util.cost import PricingEngine
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"m1": {"input": 1.0, "output": 1.0}}))
+    pricing = PricingEngine(path=str(path), reload_interval=0)
+    assert pricing.price("m1", 1000, 0) == pytest.approx(1.0)
+    path.write_text(json.dumps({"m1": {"input": 3.0, "output": 1.0}}))
+    os.utime(path, (1, 1))
+    assert pricing.price("m1", 1000, 0) == pytest.approx(3.0)
+
+def test_pricing_reload_keeps_previous_table_on_bad_file(tmp_path, monkeypatch):
+    import json, os
+    from fsm_orchestrator.util import cost
+    logged = []
+    monkeypatch.setattr(cost, "record_log", lambda message, level="info": logged.append(level))
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"m1": {"input": 1.0, "output": 1.0}}))
+    pricing = cost.PricingEngine(path=str(path), reload_interval=0)
+    for stamp, bad in enumerate(['{"m1": {"input": 2.0', '{"m1": {"input": 2.0}}', '["m1"]'], start=1):
+        path.write_text(bad)
+        os.utime(path, (stamp, stamp))
+        assert pricing.price("m1", 1000, 0) == pytest.approx(1.0)
+    assert logged == ["error"] * 3
+    with pytest.raises(KeyError, match="No price configured for model 'm9'"):
+        pricing.estimate("m9", 1000)
+
+def test_ledger_grows():
+    from fsm_orchestrator.util.cost import SpendLedger
+    ledger = SpendLedger(capacity=2)
+    for i in range(10):
+        ledger.add(f"p{i % 5}", f"a{i}", "m", 1, 1, 1.0)
+    assert len(ledger) == 10
+    assert ledger.totals("project") == pytest.approx({f"p{i}": 2.0 for i in range(5)})
@@ -23,3 +23,119 @@ def test_multiple_transitions():
     assert not dd.detect("p1")
     dd.observe("p1", t1)
     assert dd.detect("p1")
+
+def test_longer_cycle_detected():
+    dd = DeadlockDetector(threshold=2)
+    loop = (("A", "B"), ("B", "C"), ("C", "A"))
+    for src, dst in loop:
+        dd.observe("p1", Transition(src, dst, 0.9))
+    assert not dd.detect("p1")
+    for src, dst in loop:
+        dd.observe("p1", Transition(src, dst, 0.9))
+    # every edge seen twice and the A->B->C->A cycle closed twice
+    assert dd.detect("p1")
+    assert ("cycle", "A", "B", "C") in dict(dd.hot_patterns("p1"))
+
+def test_cycle_without_repeated_edges():
+    dd = DeadlockDetector(threshold=2)
+    for src, dst in (("A", "B"), ("B", "A"), ("A", "C"), ("C", "A")):
+        dd.observe("p1", Transition(src, dst, 0.9))
+    assert not dd.detect("p1")
+    # A -> B -> A closes the 2-cycle a second time
+    dd.observe("p1", Transition("A", "B", 0.9))
+    dd.observe("p1", Transition("B", "A", 0.9))
+    assert dd.detect("p1")
+
+def test_count_window_evicts_old_transitions():
+    dd = DeadlockDetector(threshold=2, window=3)
+    t = Transition("A", "B", 0.9)
+    dd.observe("p1", t)
+    for i in range(3):
+        dd.observe("p1", Transition(f"X{i}", f"Y{i}", 0.9))
+    dd.observe("p1", t)
+    assert not dd.detect("p1")
+    assert len(dd.windows["p1"].entries) == 3
+
+def test_time_window_expires():
+    now = [0.0]
+    dd = DeadlockDetector(threshold=2, window=None, window_seconds=10, clock=lambda: now[0])
+    t = Transition("A", "B", 0.9)
+    dd.observe("p1", t)
+    dd.observe("p1", t)
+    assert dd.detect("p1")
+    now[0] = 11.0
+    assert not dd.detect("p1")
+    assert not dd.windows["p1"].counts
+
+def test_scc_loop_detected_across_states():
+    dd = DeadlockDetector(threshold=100, loop_threshold=2)
+    assert not dd.loops("p1")
+    # designer <-> engineer ping-pong that wanders through review states
+    laps = [("Design", "Build"), ("Build", "Review"), ("Review", "Design"),
+            ("Design", "Build"), ("Build", "QA"), ("QA", "Design")]
+    for src, dst in laps:
+        dd.observe("p1", Transition(src, dst, 0.9))
+    # 6 internal traversals over 4 states is one lap
+    assert not dd.detect("p1")
+    for src, dst in laps:
+        dd.observe("p1", Transition(src, dst, 0.9))
+    assert dd.detect("p1")
+    (states, count), = dd.loops("p1")
+    assert states == {"Design", "Build", "Review", "QA"}
+    assert count == 3
+
+def test_scc_splits_when_edges_evicted():
+    dd = DeadlockDetector(threshold=100, window=4, loop_threshold=1)
+    for src, dst in (("A", "B"), ("B", "A")):
+        dd.observe("p1", Transition(src, dst, 0.9))
+    assert dd.detect("p1")
+    for src, dst in (("A", "C"), ("C", "D"), ("D", "E")):
+        dd.observe("p1", Transition(src, dst, 0.9))
+    # A->B has been evicted, so the A/B component split apart
+    assert dd.loops("p1") == []
+    assert not dd.detect("p1")
+    graph = dd.windows["p1"].graph
+    assert all(len(members) == 1 for members in graph.members.values())
+    dd.observe("p1", Transition("E", "F", 0.9))
+    # B->A is gone too and B has no edges left in the window
+    assert "B" not in graph.comp
+    assert len(graph.comp) == 5
+
+def test_tarjan_scc():
+    from collections import Counter
+    from fsm_orchestrator.core.deadlock import tarjan_scc
+    succ = {"A": Counter({"B": 1}), "B": Counter({"C": 1, "A": 1}), "C": Counter({"D": 1}), "D": Counter({"C": 1})}
+    components = sorted(sorted(c) for c in tarjan_scc("ABCD", succ))
+    assert components == [["A", "B"], ["C", "D"]]
+
+def test_live_graph_matches_tarjan_under_random_churn():
+    import random
+    from collections import deque
+    from fsm_orchestrator.core.deadlock import _LiveGraph, tarjan_scc
+    rng = random.Random(7)
+    graph, window = _LiveGraph(loop_threshold=1), deque()
+    for step in range(3000):
+        edge = (rng.randrange(12), rng.randrange(12))
+        graph.add(*edge)
+        window.append(edge)
+        if len(window) > 25:
+            graph.remove(*window.popleft())
+        if step % 50 == 0:
+            expected = {frozenset(c) for c in tarjan_scc(graph.comp, graph.succ)}
+            assert {frozenset(m) for m in graph.members.values()} == expected
+            for u, targets in graph.succ.items():
+                for v in targets:
+                    cu, cv = graph.comp[u], graph.comp[v]
+                    assert cu == cv or graph.order[cu] < graph.order[cv]
+
+def test_dag_walks_skip_the_scc_search_and_no_threshold_skips_the_graph():
+    states = [Transition(f"S{i}", f"S{i + 1}", 0.9) for i in range(200)]
+    dd = DeadlockDetector(threshold=100, window=300, loop_threshold=3)
+    for _ in range(3):
+        for t in states:
+            dd.observe("p1", t)
+    graph = dd.windows["p1"].graph
+    assert all(len(m) == 1 for m in graph.members.values()) and not dd.detect("p1")
+    plain = DeadlockDetector(threshold=100)
+    plain.observe("p1", states[0])
+    assert plain.windows["p1"].graph is None and plain.loops("p1") == []
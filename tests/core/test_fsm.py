@@ -70,3 +70,133 @@ def test_next_no_transitions(fsm):
     assert proposals
     proposals = fsm.next("C", context)  # No such state
     assert proposals == []
+
+def test_next_uses_index_added_after_first_call(fsm):
+    context = {"urgency": 1, "dependency": 0.0, "user_intent": 0.0}
+    assert [p.to_state for p in fsm.next("A", context)] == ["B"]
+    fsm.add_transition(Transition("A", "C", 0.5, {"why": "late"}))
+    proposals = fsm.next("A", context)
+    assert [p.to_state for p in proposals] == ["B", "C"]
+    assert proposals[1].metadata == {"why": "late"}
+    assert proposals[0].urgency == 1.0
+    proposals[1].metadata["why"] = "mutated"
+    assert fsm.next("A", context)[1].metadata == {"why": "late"}
+
+class RecordingState(State):
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+    def enter(self, context):
+        self.log.append(("enter", self.name))
+    def exit(self, context):
+        self.log.append(("exit", self.name))
+
+@pytest.fixture
+def nested():
+    log = []
+    fsm = HierarchicalFSM()
+    fsm.add_state("Creative", RecordingState("Creative", log))
+    fsm.add_state("Concept", RecordingState("Concept", log), parent="Creative")
+    fsm.add_state("Design", RecordingState("Design", log), parent="Creative")
+    fsm.add_state("Technical", RecordingState("Technical", log))
+    fsm.add_state("Code", RecordingState("Code", log), parent="Technical")
+    return fsm, log
+
+def test_nested_registration(nested):
+    fsm, _ = nested
+    assert fsm.children["Creative"] == ["Concept", "Design"]
+    assert fsm.ancestors("Design") == ("Design", "Creative")
+    with pytest.raises(ValueError):
+        fsm.add_state("Orphan", State(), parent="Missing")
+    with pytest.raises(ValueError):
+        fsm.add_state("Creative", State(), parent="Design")
+
+def test_ancestor_transitions_inherited(nested):
+    fsm, _ = nested
+    fsm.add_transition(Transition("Concept", "Design", 0.9))
+    context = {"urgency": 0.1, "dependency": 0.1, "user_intent": 0.1}
+    assert [p.to_state for p in fsm.next("Concept", context)] == ["Design"]
+    # Declared on the parent after the first lookup: memo must be invalidated
+    fsm.add_transition(Transition("Creative", "Code", 0.5))
+    fsm.add_transition(Transition("Creative", "Design", 0.1))
+    proposals = fsm.next("Concept", context)
+    assert [(p.from_state, p.to_state) for p in proposals] == [("Concept", "Design"), ("Creative", "Code")]
+    assert proposals[0].confidence == 0.9
+    assert [p.to_state for p in fsm.next("Design", context)] == ["Code", "Design"]
+    assert fsm.next("Code", context) == []
+
+def test_advance_hooks_follow_lca(nested):
+    fsm, log = nested
+    fsm.set_initial_state("Concept")
+    assert log == [("enter", "Creative"), ("enter", "Concept")]
+    log.clear()
+    fsm.add_transition(Transition("Concept", "Design", 0.9))
+    fsm.advance(fsm.next("Concept", {})[0])
+    assert log == [("exit", "Concept"), ("enter", "Design")]
+    log.clear()
+    fsm.add_transition(Transition("Creative", "Code", 0.5))
+    fsm.advance(fsm.next("Design", {})[0])
+    assert log == [("exit", "Design"), ("exit", "Creative"), ("enter", "Technical"), ("enter", "Code")]
+    assert fsm.current_state == "Code"
+
+def test_delta_serialization_replay(fsm):
+    import json
+    fsm.compact_every = 2
+    fsm.set_initial_state("A", {"transcript": ["hi"], "plan": "draft", "scratch": 1})
+    records = [json.loads(json.dumps(fsm.serialize(delta=True)))]
+    assert records[0]["type"] == "snapshot"
+    fsm.context.append("transcript", "second")
+    fsm.context["plan"] = "final"
+    del fsm.context["scratch"]
+    fsm.advance(fsm.next("A", {})[0])
+    delta = fsm.serialize(delta=True)
+    assert delta["type"] == "delta"
+    assert delta["set"] == {"plan": "final"}
+    assert delta["append"] == {"transcript": ["second"]}
+    assert delta["deleted"] == ["scratch"]
+    records.append(json.loads(json.dumps(delta)))
+    fsm.context.append("transcript", "third")
+    records.append(json.loads(json.dumps(fsm.serialize(delta=True))))
+    # compaction after compact_every deltas
+    assert fsm.serialize(delta=True)["type"] == "snapshot"
+
+    restored = HierarchicalFSM()
+    restored.add_state("A", DummyState())
+    restored.add_state("B", DummyState())
+    restored.deserialize(records)
+    assert restored.current_state == "B"
+    assert restored.context == {"transcript": ["hi", "second", "third"], "plan": "final"}
+    assert restored.states["B"].entered
+
+def test_deserialize_requires_snapshot(fsm):
+    with pytest.raises(ValueError):
+        fsm.deserialize([{"type": "delta", "set": {}, "append": {}, "deleted": [], "current_state": "A"}])
+
+def test_tracked_context_pickles_and_records_are_copies(fsm):
+    import pickle
+    fsm.set_initial_state("A", {"plan": {"steps": [1]}, "log": []})
+    fsm.context.append("log", {"n": 1})
+    restored = pickle.loads(pickle.dumps(fsm.context))
+    assert type(restored) is type(fsm.context) and restored == fsm.context
+    assert restored.dirty == set() and restored.appended == {}
+    snapshot = fsm.serialize(delta=True)
+    fsm.context["plan"]["steps"].append(2)
+    assert snapshot["context"]["plan"] == {"steps": [1]}
+    fsm.context["plan"] = plan = {"steps": [3]}
+    fsm.context.append("log", entry := {"n": 2})
+    delta = fsm.serialize(delta=True)
+    plan["steps"].append(4)
+    entry["n"] = 99
+    assert delta["set"] == {"plan": {"steps": [3]}} and delta["append"] == {"log": [{"n": 2}]}
+
+def test_clone_has_own_position_and_graph(fsm):
+    fsm.set_initial_state("A", {"foo": "bar"})
+    clone = fsm.clone()
+    assert clone.current_state == "A" and clone.context == {"foo": "bar"}
+    clone.advance(clone.next("A", {})[0])
+    clone.context["foo"] = "baz"
+    clone.add_state("C", DummyState())
+    clone.add_transition(Transition("A", "C", 0.5))
+    assert fsm.current_state == "A" and fsm.context == {"foo": "bar"}
+    assert "C" not in fsm.states and len(fsm.transitions) == 2
+    assert [t["to_state"] for t in clone.outgoing("A")] == ["B", "C"]
@@ -1,10 +1,12 @@
 import pytest
-from fsm_orchestrator.core.memory import MemoryManager, HOT_MEMORY, COMPRESSED_MEMORY
+from fsm_orchestrator.core.memory import MemoryManager, HOT_MEMORY, COMPRESSED_MEMORY, COLD_MEMORY, DECISIONS, parse_decision
 
 @pytest.fixture(autouse=True)
 def clear_memory():
     HOT_MEMORY.clear()
     COMPRESSED_MEMORY.clear()
+    COLD_MEMORY.clear()
+    DECISIONS.clear()
 
 def test_fetch_hot():
     mm = MemoryManager()
@@ -39,3 +41,223 @@ def test_retrieve_mrag():
     # Should include all hot, tagged, and top-N compressed
     assert any("@DECISION" in m.get("content", "") for m in result)
     assert len(result) >= 3
+
+def test_retrieve_ranks_by_cosine_and_tracks_appends():
+    mm = MemoryManager()
+    mm.store_warm("p1", {"summary": "x", "embedding": [1, 0, 0]})
+    mm.store_warm("p1", {"summary": "y", "embedding": [0, 1, 0]})
+    mm.store_warm("p1", {"summary": "none", "embedding": None})
+    result = mm.retrieve("p1", [0.1, 1, 0], top=1)
+    assert [m["summary"] for m in result] == ["y"]
+    mm.store_warm("p1", {"summary": "z", "embedding": [0, 0.1, 5]})
+    result = mm.retrieve("p1", [0, 0, 1], top=2)
+    assert [m["summary"] for m in result] == ["z", "x"]  # zero-score tie goes to the oldest row
+    assert len(mm.warm_index("p1")) == 4
+    # replacing the list re-indexes from scratch
+    COMPRESSED_MEMORY["p1"] = [{"summary": "only", "embedding": [1, 1, 1]}]
+    assert [m["summary"] for m in mm.retrieve("p1", [1, 0, 0], top=3)] == ["only"]
+
+def test_vector_index_exact_and_ivf():
+    import numpy as np
+    from fsm_orchestrator.core.vector_index import VectorIndex
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((2000, 16)).astype(np.float32)
+    exact = VectorIndex()
+    exact.add_many(data, list(range(2000)))
+    query = data[123] + 0.01 * rng.standard_normal(16)
+    assert exact.search(query, k=1)[0][1] == 123
+    scores = [s for s, _ in exact.search(query, k=5)]
+    assert scores == sorted(scores, reverse=True)
+    ivf = VectorIndex(ivf_lists=16, n_probe=4, train_size=1000)
+    ivf.add_many(data[:1000], list(range(1000)))
+    assert ivf.centroids is not None
+    ivf.add_many(data[1000:], list(range(1000, 2000)))
+    assert ivf.search(query, k=1)[0][1] == 123
+    assert ivf.search(query, k=1, exact=True)[0][1] == 123
+
+def test_ivf_lists_grow_incrementally_and_retrain_on_drift():
+    import numpy as np
+    from fsm_orchestrator.core.vector_index import VectorIndex
+    rng = np.random.default_rng(1)
+    data = _clustered(rng, 3000, dim=16)
+    ivf = VectorIndex(ivf_lists=16, n_probe=4, train_size=1000)
+    ivf.add_many(data[:1000], list(range(1000)))
+    centroids, lists = ivf.centroids, ivf._inverted_lists()
+    for i in range(1000, 1100):
+        ivf.add(data[i], i)
+    assert ivf.centroids is centroids and ivf._lists is lists  # no retrain, no rebuild
+    incremental = [l.copy() for l in lists]
+    ivf._lists = None
+    assert all(np.array_equal(a, b) for a, b in zip(incremental, ivf._inverted_lists()))
+    assert ivf.search(data[1050], k=1)[0][1] == 1050
+    # a burst of rows from one new topic piles into one list until it is retrained
+    ivf.add_many(np.tile(rng.standard_normal(16).astype(np.float32) * 5, (2000, 1))
+                 + 0.01 * rng.standard_normal((2000, 16)).astype(np.float32))
+    assert ivf.centroids is not centroids
+    assert ivf._counts.sum() == len(ivf) == 3100
+
+def test_embedding_store_persists_and_shares_across_instances(tmp_path):
+    from fsm_orchestrator.core.embedding_store import EmbeddingStore
+    writer = EmbeddingStore(str(tmp_path))
+    mm = MemoryManager(store=writer)
+    mm.store_warm("p/1", {"summary": "x", "embedding": [1, 0, 0]})
+    mm.store_warm("p/1", {"summary": "y", "embedding": [0, 2, 0]})
+    assert COMPRESSED_MEMORY == {}
+    reader = EmbeddingStore(str(tmp_path))  # e.g. another orchestrator process
+    assert [m["summary"] for m in MemoryManager(store=reader).retrieve("p/1", [0, 1, 0], top=1)] == ["y"]
+    writer.append("p/1", [0, 0, 3], {"summary": "z"})
+    assert reader.search("p/1", [0, 0, 1], k=1)[0][1] == {"summary": "z"}
+    assert reader.count("p/1") == 3
+    assert abs(float(reader.vectors("p/1")[1, 1]) - 1.0) < 1e-6  # stored normalized
+    with pytest.raises(ValueError):
+        writer.append("p/1", [1, 0], {})
+
+def test_embedding_store_float16_and_torn_append(tmp_path):
+    from fsm_orchestrator.core.embedding_store import EmbeddingStore
+    store = EmbeddingStore(str(tmp_path), dtype="float16")
+    store.append_many("p1", [[1, 0], None], [{"summary": "a"}, {"summary": "none"}])
+    assert store.vectors("p1").dtype.itemsize == 2
+    # a writer that crashed after writing its vector but before its record
+    with open(tmp_path / "p1" / "vectors.bin", "ab") as f:
+        f.write(b"\x00" * 4)
+    fresh = EmbeddingStore(str(tmp_path))
+    assert fresh.count("p1") == 2
+    assert fresh.append("p1", [0, 1], {"summary": "b"}) == 2
+    assert [r["summary"] for _, r in fresh.search("p1", [0, 1], k=3)] == ["b", "a", "none"]
+
+def test_embedding_store_concurrent_readers_and_writer(tmp_path):
+    import threading
+    from fsm_orchestrator.core.embedding_store import EmbeddingStore
+    store = EmbeddingStore(str(tmp_path))
+    rows, errors = 3000, []
+
+    def write():
+        for i in range(0, rows, 10):
+            store.append_many("p", [[1, i % 7, 0]] * 10, [{"i": j, "summary": "é" * 20} for j in range(i, i + 10)])
+
+    def read():
+        try:
+            while True:
+                n = store.count("p")
+                records = store.records("p")
+                assert len(records) >= n and [r["i"] for r in records[:n]] == list(range(n))
+                if n == rows:
+                    return
+        except Exception as exc:  # surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=60)
+    assert not errors
+    assert len(store.records("p")) == rows == store.count("p")
+    assert len(EmbeddingStore(str(tmp_path)).records("p")) == rows
+
+def _clustered(rng, n, dim=32, topics=20):
+    import numpy as np
+    centers = rng.standard_normal((topics, dim))
+    return (centers[rng.integers(topics, size=n)] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_quantized_index_reranks_to_exact_top(kind):
+    import numpy as np
+    from fsm_orchestrator.core.quantization import QuantizedIndex
+    from fsm_orchestrator.core.vector_index import VectorIndex
+    rng = np.random.default_rng(1)
+    data = _clustered(rng, 3000)
+    exact = VectorIndex()
+    exact.add_many(data, list(range(3000)))
+    quantized = QuantizedIndex(kind, full=lambda rows: data[rows], rerank=8, train_size=1000)
+    quantized.add_many(data[:500], list(range(500)))
+    assert quantized.search(data[7], k=1)[0][1] == 7  # untrained: exact over the buffer
+    quantized.add_many(data[500:], list(range(500, 3000)))
+    assert quantized.nbytes() * 4 <= data.nbytes
+    hits = 0
+    for q in _clustered(rng, 20):
+        truth = [p for _, p in exact.search(q, 3)]
+        found = quantized.search(q, 3)
+        hits += len({p for _, p in found} & set(truth))
+        assert [s for s, _ in found] == sorted((s for s, _ in found), reverse=True)
+    assert hits / 60 >= 0.9
+
+def test_memory_manager_quantized_warm_layer(tmp_path):
+    import numpy as np
+    from fsm_orchestrator.core.embedding_store import EmbeddingStore
+    rng = np.random.default_rng(2)
+    data = _clustered(rng, 1500)
+    for mm in (MemoryManager(quantization="int8"),
+               MemoryManager(quantization="pq", store=EmbeddingStore(str(tmp_path)))):
+        for i, row in enumerate(data):
+            mm.store_warm("p1", {"summary": str(i), "embedding": row.tolist()})
+        assert [m["summary"] for m in mm.retrieve("p1", data[42], top=1)] == ["42"]
+        assert len(mm.warm_index("p1")) == 1500
+    assert all(isinstance(m["embedding"], np.ndarray) for m in COMPRESSED_MEMORY["p1"])
+
+def test_store_without_quantization_uses_a_vector_index(tmp_path):
+    from fsm_orchestrator.core.embedding_store import EmbeddingStore
+    from fsm_orchestrator.core.vector_index import VectorIndex
+    mm = MemoryManager(quantization=None, store=EmbeddingStore(str(tmp_path)))
+    mm.store_warm("p1", {"summary": "x", "embedding": [1, 0, 0]})
+    mm.store_warm("p1", {"summary": "y", "embedding": [0, 1, 0]})
+    index = mm.warm_index("p1")
+    assert isinstance(index, VectorIndex) and len(index) == 2
+    assert [m["summary"] for _, m in index.search([0, 1, 0.1], 1)] == ["y"]
+    assert [m["summary"] for m in mm.retrieve("p1", [0, 1, 0.1], top=1)] == ["y"]
+
+def test_hot_window_tiers_to_warm_and_cold(tmp_path):
+    import json
+    mm = MemoryManager(hot_capacity=30, compress_batch=10, cold_dir=str(tmp_path))
+    for i in range(100):
+        mm.append_hot("p/1", {"content": f"m{i}"})
+        assert len(HOT_MEMORY["p/1"]) <= 30
+    mm.flush()
+    hot = HOT_MEMORY["p/1"]
+    assert [m["content"] for m in hot] == [f"m{i}" for i in range(100 - len(hot), 100)]
+    warm = COMPRESSED_MEMORY["p/1"]
+    assert len(warm) == (100 - len(hot)) // 10
+    assert warm[0]["summary"] == " ".join(f"m{i}" for i in range(10))
+    files = sorted((tmp_path / "p%2F1").iterdir())
+    archived = [m["content"] for f in files for m in json.loads(f.read_text())]
+    assert archived == [f"m{i}" for i in range(100 - len(hot))]
+    mm.close()
+
+def test_tiering_failure_keeps_worker_alive(monkeypatch):
+    mm = MemoryManager(hot_capacity=2, compress_batch=1)
+    calls = []
+    def flaky(messages):
+        calls.append(messages)
+        if len(calls) == 1:
+            raise RuntimeError("summarizer down")
+        return {"summary": messages[0]["content"], "embedding": None}
+    monkeypatch.setattr(mm, "compress", flaky)
+    for i in range(4):
+        mm.append_hot("p1", {"content": f"m{i}"})
+    mm.flush()
+    assert [m["summary"] for m in COMPRESSED_MEMORY["p1"]] == ["m1"]
+    assert len(COLD_MEMORY["p1"]) == 2  # raw batches are archived even when compression fails
+    mm.close()
+
+def test_parse_decision():
+    d = parse_decision('Use Postgres @DECISION(reason="needs SKIP LOCKED, joins", impact=high) for the queue')
+    assert d["reason"] == "needs SKIP LOCKED, joins"
+    assert d["impact"] == "high"
+    assert d["key"] == d["text"] == "Use Postgres  for the queue"
+    assert parse_decision("@DECISION(id=db, reason=x)")["key"] == "db"
+    assert parse_decision("@DECISION ship it")["reason"] is None
+    assert parse_decision("no marker") is None
+
+def test_decisions_survive_tiering_and_retag():
+    mm = MemoryManager(hot_capacity=5, compress_batch=5)
+    mm.append_hot("p1", {"content": "@DECISION(id=db, reason=cost, impact=high) use sqlite"})
+    for i in range(50):
+        mm.append_hot("p1", {"content": f"m{i}"})
+    mm.flush()
+    assert all("@DECISION" not in m["content"] for m in HOT_MEMORY["p1"])
+    result = mm.retrieve("p1", None)
+    assert result[-1]["content"].endswith("use sqlite")
+    mm.append_hot("p1", {"content": "@DECISION(id=db, reason=scale, impact=high) use postgres"})
+    [decision] = mm.decisions("p1")
+    assert (decision["reason"], decision["text"]) == ("scale", "use postgres")
+    mm.close()
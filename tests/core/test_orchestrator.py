@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from fsm_orchestrator.core.fsm import State, Transition
+from fsm_orchestrator.core.models import Event
+from fsm_orchestrator.core.orchestrator import Orchestrator, coalesce
+
+def test_coalesce_keeps_latest_intent_and_merges_context():
+    events = [
+        Event(type="user_intent", payload=0.1, project_id="p"),
+        Event(type="context", payload={"a": 1}, project_id="p"),
+        Event(type="advance", payload=None, project_id="p"),
+        Event(type="user_intent", payload=0.9, project_id="p"),
+        Event(type="context", payload={"a": 2, "b": 3}, project_id="p"),
+    ]
+    events += [
+        Event(type="user_intent", payload=0.7, project_id="p"),
+        Event(type="context", payload={"c": 4}, project_id="p"),
+    ]
+    merged = coalesce(events)
+    assert [e.type for e in merged] == ["user_intent", "context", "advance", "user_intent", "context"]
+    assert merged[3].payload == 0.7 and merged[4].payload == {"a": 2, "b": 3, "c": 4}
+    assert events[4].payload == {"a": 2, "b": 3}  # inputs are not mutated
+
+def test_coalesce_never_crosses_a_barrier():
+    events = [
+        Event(type="context", payload={"phase": "draft"}, project_id="p"),
+        Event(type="advance", payload=None, project_id="p"),
+        Event(type="context", payload={"phase": "review"}, project_id="p"),
+        Event(type="proposals", payload=[], project_id="p"),
+        Event(type="context", payload={"phase": "done"}, project_id="p"),
+    ]
+    merged = coalesce(events)
+    assert [e.type for e in merged] == ["context", "advance", "context", "proposals", "context"]
+    assert [e.payload for e in merged if e.type == "context"] == [
+        {"phase": "draft"}, {"phase": "review"}, {"phase": "done"}]
+
+def test_coalesce_passes_malformed_merge_payloads_through():
+    events = [
+        Event(type="context", payload={"a": 1}, project_id="p"),
+        Event(type="context", payload=5, project_id="p"),
+        Event(type="context", payload={"b": 2}, project_id="p"),
+    ]
+    merged = coalesce(events)
+    assert [e.payload for e in merged] == [{"a": 1}, 5, {"b": 2}]
+
+def test_bad_payloads_and_failing_ticks_do_not_kill_the_worker(workflow, monkeypatch):
+    async def scenario():
+        orch = Orchestrator(workflow)
+        await orch.submit(Event(type="context", payload={"a": 1}, project_id="p"))
+        await orch.submit(Event(type="context", payload=5, project_id="p"))
+        await asyncio.wait_for(orch.drain(), 1)
+        def broken(events):
+            raise RuntimeError("coalesce failed")
+        monkeypatch.setattr("fsm_orchestrator.core.orchestrator.coalesce", broken)
+        await orch.submit(Event(type="context", payload={"b": 2}, project_id="p"))
+        await asyncio.wait_for(orch.drain(), 1)
+        monkeypatch.undo()
+        await orch.submit(Event(type="context", payload={"c": 3}, project_id="p"))
+        await asyncio.wait_for(orch.drain(), 1)
+        alive = not orch.workers["p"].done()
+        await orch.shutdown()
+        return orch, alive
+    orch, alive = asyncio.run(scenario())
+    assert alive
+    assert orch.stats["errors"] == 2
+    assert orch.fsm_for("p").context == {"a": 1, "c": 3}
+
+def test_per_project_loops_advance_fsms(workflow):
+    async def scenario():
+        orch = Orchestrator(workflow)
+        for project in ("p1", "p2"):
+            await orch.submit(Event(type="user_intent", payload=0.5, project_id=project))
+            await orch.submit(Event(type="advance", payload=None, project_id=project))
+        await orch.submit(Event(type="advance", payload=None, project_id="p1"))
+        await orch.drain()
+        await orch.shutdown()
+        return orch
+    orch = asyncio.run(scenario())
+    assert orch.fsm_for("p1").current_state == "Code"
+    assert orch.fsm_for("p2").current_state == "Design"
+    assert orch.fsm_for("p2").context["user_intent"] == 0.5
+    assert orch.stats["events"] == 5 and orch.stats["errors"] == 0
+    assert orch.latency_percentile(99) >= orch.latency_percentile(50) > 0
+
+def test_backpressure_and_handler_errors():
+    async def scenario():
+        orch = Orchestrator(queue_size=2)
+        seen = []
+        async def slow(project_id, event):
+            await asyncio.sleep(0)
+            if event.payload == "boom":
+                raise RuntimeError("boom")
+            seen.append(event.payload)
+        orch.register_handler("work", slow)
+        orch.enqueue_event(Event(type="work", payload=1, project_id="p"))
+        orch.enqueue_event(Event(type="work", payload="boom", project_id="p"))
+        with pytest.raises(asyncio.QueueFull):
+            orch.enqueue_event(Event(type="work", payload=3, project_id="p"))
+        await asyncio.wait_for(orch.submit(Event(type="work", payload=3, project_id="p")), 1)
+        await orch.drain()
+        with pytest.raises(ValueError):
+            orch.enqueue_event(Event(type="work", payload=4))
+        runner = asyncio.create_task(orch.run())
+        await asyncio.sleep(0)
+        orch.stop()
+        await runner
+        return orch, seen
+    orch, seen = asyncio.run(scenario())
+    assert seen == [1, 3]
+    assert orch.stats["errors"] == 1
+    assert orch.workers == {}
+    assert orch.fsm_for("p") is not orch.fsm
+
+def test_projects_get_their_own_fsm_without_a_workflow():
+    async def scenario():
+        orch = Orchestrator()
+        for name in ("Concept", "Design", "Code"):
+            orch.fsm.add_state(name, State())
+        orch.fsm.add_transition(Transition("Concept", "Design", 0.9))
+        orch.fsm.add_transition(Transition("Design", "Code", 0.9))
+        orch.fsm.set_initial_state("Concept")
+        await orch.submit(Event(type="user_intent", payload=0.9, project_id="p1"))
+        await orch.submit(Event(type="user_intent", payload=0.1, project_id="p2"))
+        await orch.submit(Event(type="context", payload={"owner": "p2"}, project_id="p2"))
+        for _ in range(2):
+            await orch.submit(Event(type="advance", payload=None, project_id="p1"))
+        await orch.drain()
+        await orch.shutdown()
+        return orch
+    orch = asyncio.run(scenario())
+    p1, p2 = orch.fsm_for("p1"), orch.fsm_for("p2")
+    assert p1 is not p2
+    assert p1.current_state == "Code" and p2.current_state == "Concept"
+    assert orch.fsm.current_state == "Concept"
+    assert p1.context["user_intent"] == 0.9 and p2.context["user_intent"] == 0.1
+    assert "owner" not in p1.context and "user_intent" not in orch.fsm.context
+    assert orch.stats["errors"] == 0
+
+def test_export_import_carries_usage_and_windows(workflow):
+    async def scenario():
+        source, target = Orchestrator(workflow), Orchestrator(workflow)
+        for orch in (source, target):
+            orch.cost_monitor.clock = lambda: 10_000.0
+        await source.submit(Event(type="advance", payload=None, project_id="p"))
+        await source.drain()
+        source.cost_monitor.record("p", "a1", 300, 1.5)
+        held = source.cost_monitor.reserve("p", 50)
+        with pytest.raises(ValueError):
+            source.export_project("p")
+        source.cost_monitor.release(held)
+        state = source.export_project("p")
+        await source.shutdown()
+        target.import_project("p", state)
+        return source, target, state
+    source, target, state = asyncio.run(scenario())
+    assert "reserved" not in state["cost"]
+    assert "p" not in source.fsms and "p" not in source.cost_monitor.usage
+    assert source.cost_monitor.window_tokens("p") == 0
+    assert target.fsm_for("p").current_state == "Design"
+    assert target.cost_monitor.report("p")["tokens_used"] == 300
+    assert target.cost_monitor.reserved("p") == 0
+    assert target.cost_monitor.window_tokens("p", "minute") == 300
+    assert target.cost_monitor.window_tokens("p", "week", agent_id="a1") == 300
@@ -0,0 +1,60 @@
+import time
+from collections import Counter
+import pytest
+from fsm_orchestrator.core.models import Event
+from fsm_orchestrator.core.sharding import HashRing, ShardedOrchestrator
+
+def count_events(orchestrator):
+    def on_ping(project_id, event):
+        ctx = orchestrator.fsm_for(project_id).context
+        ctx["pings"] = ctx.get("pings", 0) + 1
+    orchestrator.register_handler("ping", on_ping)
+
+def block_on_stall(orchestrator):
+    def on_stall(project_id, event):
+        time.sleep(event.payload)  # blocks the shard's event loop
+    orchestrator.register_handler("stall", on_stall)
+
+def test_hash_ring_balances_and_moves_little():
+    ring = HashRing(range(4), replicas=128)
+    projects = [f"p{i}" for i in range(4000)]
+    before = {p: ring.owner(p) for p in projects}
+    assert min(Counter(before.values()).values()) > 600
+    ring.add(4)
+    moved = sum(before[p] != ring.owner(p) for p in projects)
+    assert 400 < moved < 1300  # ~1/5 of projects move, all of them to the new shard
+    assert all(ring.owner(p) == 4 for p in projects if before[p] != ring.owner(p))
+    with pytest.raises(ValueError):
+        HashRing().owner("p")
+
+def test_sharded_routing_and_rebalance_hands_off_state(workflow):
+    with ShardedOrchestrator(workflow, shards=2, setup=count_events) as sharded:
+        projects = [f"p{i}" for i in range(12)]
+        sharded.submit_many(Event(type="ping", payload=None, project_id=p) for p in projects)
+        sharded.submit_many(Event(type="advance", payload=None, project_id=p) for p in projects[:6])
+        stats = sharded.drain()
+        assert sorted(p for s in stats.values() for p in s["projects"]) == sorted(projects)
+        assert all(set(s["projects"]) == {p for p in projects if sharded.owner(p) == sid}
+                   for sid, s in stats.items())
+        moved = sharded.resize(3)
+        assert moved and all(sharded.owner(p) == 2 for p in moved)
+        sharded.submit_many(Event(type="ping", payload=None, project_id=p) for p in projects)
+        for p in projects:
+            view = sharded.inspect(p)
+            assert view["context"]["pings"] == 2
+            assert view["current_state"] == ("Design" if p in projects[:6] else "Concept")
+        sharded.resize(1)
+        assert set(sharded.drain()[0]["projects"]) == set(projects)
+        assert sharded.inspect("p0")["context"]["pings"] == 2
+
+def test_dead_or_silent_shards_raise_instead_of_hanging(workflow):
+    with ShardedOrchestrator(workflow, shards=1, setup=block_on_stall,
+                             reply_timeout=1.0, poll_interval=0.05) as sharded:
+        sharded.submit(Event(type="stall", payload=30, project_id="p"))
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="Shard 0 did not reply"):
+            sharded.inspect("p")
+        assert time.monotonic() - start < 5
+        sharded.shards[0].process.kill()
+        with pytest.raises(RuntimeError, match=r"Shard 0 exited \(code -9\)"):
+            sharded.drain()
@@ -0,0 +1,67 @@
+import pytest
+from fsm_orchestrator.core.workflow import (
+    compile_workflow, save_artifact, load_artifact, WorkflowValidationError,
+)
+
+def make_definition():
+    return {
+        "name": "studio",
+        "version": "3",
+        "initial": "Concept",
+        "states": [
+            {"name": "Creative"},
+            {"name": "Concept", "parent": "Creative"},
+            {"name": "Design", "parent": "Creative"},
+            {"name": "Code"},
+        ],
+        "transitions": [
+            {"from_state": "Concept", "to_state": "Design", "confidence": 0.9},
+            {"from_state": "Creative", "to_state": "Code", "confidence": 0.5, "metadata": {"gate": "pr"}},
+        ],
+    }
+
+def test_compile_and_build_fsm():
+    fsm = compile_workflow(make_definition()).build_fsm()
+    assert fsm.ancestors("Design") == ("Design", "Creative")
+    assert [p.to_state for p in fsm.next("Concept", {})] == ["Design", "Code"]
+    assert fsm.next("Design", {})[0].metadata == {"gate": "pr"}
+    assert [t["to_state"] for t in fsm.declared("Creative")] == ["Code"] and fsm.declared("Design") == []
+    assert [(t.from_state, t.to_state) for t in fsm.transitions] == [("Creative", "Code"), ("Concept", "Design")]
+
+def test_artifact_roundtrip(tmp_path):
+    path = tmp_path / "studio.fsmc"
+    save_artifact(compile_workflow(make_definition()), str(path))
+    loaded = load_artifact(str(path))
+    assert (loaded.name, loaded.version, loaded.initial) == ("studio", "3", "Concept")
+    fsm = loaded.build_fsm()
+    fsm.set_initial_state(loaded.initial)
+    assert [p.to_state for p in fsm.next("Design", {})] == ["Code"]
+    assert len(fsm.transitions) == 2
+
+def test_corrupt_artifact_rejected(tmp_path):
+    path = tmp_path / "studio.fsmc"
+    save_artifact(compile_workflow(make_definition()), str(path))
+    data = bytearray(path.read_bytes())
+    data[-2] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(WorkflowValidationError):
+        load_artifact(str(path))
+
+def test_unreachable_state_rejected():
+    definition = make_definition()
+    definition["states"].append({"name": "Orphan"})
+    with pytest.raises(WorkflowValidationError, match="Orphan"):
+        compile_workflow(definition)
+
+def test_cycle_rejected_unless_allowed():
+    definition = make_definition()
+    definition["transitions"].append({"from_state": "Code", "to_state": "Concept"})
+    with pytest.raises(WorkflowValidationError, match="Cycle"):
+        compile_workflow(definition)
+    assert compile_workflow(definition, allow_cycles=True).initial == "Concept"
+
+def test_unknown_transition_target_rejected():
+    definition = make_definition()
+    definition["transitions"].append({"from_state": "Code", "to_state": "Missing"})
+    with pytest.raises(WorkflowValidationError, match="Missing"):
+        compile_workflow(definition)
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+
+from fsm_orchestrator.scheduler.durable_queue import DurableTaskQueue
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+@pytest.fixture
+def dq(tmp_path, clock):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tasks.db'}")
+    return DurableTaskQueue(engine, clock=lambda: clock[0], visibility_timeout=30.0,
+                            max_attempts=2, backoff=10.0)
+
+def make_task(pid, tid, **extra):
+    return {"project_id": pid, "id": tid, "est_tokens": 10, **extra}
+
+def test_claim_orders_by_priority_and_skips_delayed(dq, clock):
+    dq.enqueue_many([make_task("p1", "low", priority=5), make_task("p1", "high", priority=0),
+                     make_task("p2", "later", eta=clock[0] + 20), make_task("p2", "mid", priority=1)])
+    claimed = dq.claim(10, "w1")
+    assert [t["id"] for t in claimed] == ["high", "mid", "low"]
+    assert claimed[0]["attempts"] == 1 and claimed[0]["project_id"] == "p1"
+    assert dq.claim(10, "w2") == []
+    clock[0] += 20  # leases (30 s) still held
+    assert [t["id"] for t in dq.claim(10, "w2")] == ["later"]
+
+def test_ack_requires_lease_and_lapsed_leases_are_reclaimed(dq, clock):
+    dq.enqueue(make_task("p", "t"))
+    dq.claim(1, "w1")
+    assert dq.ack(["t"], "w2") == 0
+    clock[0] += 20
+    assert dq.extend(["t"], "w1") == 1
+    clock[0] += 29
+    assert dq.claim(1, "w2") == []
+    clock[0] += 1  # lease lapsed: another replica takes over
+    assert [t["attempts"] for t in dq.claim(1, "w2")] == [2]
+    assert dq.ack(["t"], "w1") == 0
+    assert dq.ack(["t"], "w2") == 1
+    assert dq.counts() == {}
+
+def test_lapsed_lease_on_the_last_attempt_poisons(dq, clock):
+    dq.enqueue(make_task("p", "t"))
+    for attempt in (1, 2):
+        assert [t["attempts"] for t in dq.claim(1, "w")] == [attempt]
+        clock[0] += 30  # the worker died holding the lease
+    assert dq.claim(1, "w") == []
+    [poisoned] = dq.poisoned()
+    assert poisoned["attempts"] == 2 and poisoned["last_error"] == "lease expired"
+    assert dq.counts() == {"poisoned": 1}
+
+def test_queues_sharing_an_engine_register_sqlite_hooks_once(dq, clock):
+    pool = dq.engine.pool
+    other = DurableTaskQueue(dq.engine, clock=lambda: clock[0])
+    assert dq.engine.pool is pool  # the shared pool was not disposed again
+    other.enqueue(make_task("p", "t"))
+    assert [t["id"] for t in dq.claim(1, "w")] == ["t"]
+
+def test_nack_backs_off_then_poisons_and_replays(dq, clock):
+    dq.enqueue(make_task("p", "t", payload={"step": 1}))
+    dq.claim(1, "w")
+    assert dq.nack("t", "w", "boom") == "queued"
+    assert dq.claim(1, "w") == []
+    clock[0] += 10
+    dq.claim(1, "w")
+    assert dq.nack("t", "w", "boom again") == "poisoned"
+    with pytest.raises(KeyError):
+        dq.nack("t", "w")
+    [poisoned] = dq.poisoned()
+    assert poisoned["last_error"] == "boom again" and poisoned["payload"] == {"step": 1}
+    assert dq.replay() == 1
+    [task] = dq.claim(1, "w")
+    assert task["attempts"] == 1
+    dq.postpone("t", "w", 5.0)
+    clock[0] += 5
+    assert dq.claim(1, "w")[0]["attempts"] == 1
+
+def test_concurrent_claims_never_share_a_task(dq):
+    dq.enqueue_many([make_task(f"p{i % 7}", f"t{i}") for i in range(300)])
+    claimed = []
+    def worker(name):
+        while True:
+            batch = dq.claim(7, name)
+            if not batch:
+                return
+            claimed.extend(t["id"] for t in batch)
+            dq.ack([t["id"] for t in batch], name)
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(f"t{i}" for i in range(300))
+
+def test_wait_wakes_on_enqueue(dq):
+    assert not dq.wait(0.01)
+    timer = threading.Timer(0.05, dq.enqueue, args=(make_task("p", "t"),))
+    timer.start()
+    assert dq.wait(5.0)
+    timer.join()
@@ -5,8 +5,17 @@ from fsm_orchestrator.scheduler.queue import TaskQueue
 class DummyCostMonitor:
     def __init__(self, exceed_projects=None):
         self.exceed_projects = set(exceed_projects or [])
+        self.weekly = {}
     def will_exceed(self, project_id, est_tokens):
         return project_id in self.exceed_projects
+    def window_tokens(self, project_id, window="week", agent_id=None):
+        return self.weekly.get(project_id, 0)
+    def time_to_recover(self, project_id, tokens, window="week", agent_id=None):
+        return 3600.0
+    def reserved(self, project_id):
+        return 0
+    def reserve(self, project_id, est_tokens):
+        return None if self.will_exceed(project_id, est_tokens) else object()
 
 @pytest.fixture
 def scheduler():
@@ -14,7 +23,6 @@ def scheduler():
     sched.queue = TaskQueue()
     sched.cost_monitor = DummyCostMonitor()
     sched.project_token_caps = {"p1": 100, "p2": 100}
-    sched.project_usage = {"p1": 0, "p2": 0}
     return sched
 
 def make_task(pid, tid, est_tokens):
@@ -31,7 +39,7 @@ def test_wrr_and_dispatch(monkeypatch, scheduler):
 def test_backpressure_token_cap(monkeypatch, scheduler):
     dispatched = []
     monkeypatch.setattr(scheduler, "dispatch", lambda task: dispatched.append(task))
-    scheduler.project_usage["p1"] = 81  # >80% of 100
+    scheduler.cost_monitor.weekly["p1"] = 81  # >80% of 100
     scheduler.queue.enqueue(make_task("p1", "t1", 10))
     scheduler.queue.enqueue(make_task("p2", "t2", 10))
     scheduler.run()
@@ -45,3 +53,133 @@ def test_backpressure_cost_monitor(monkeypatch, scheduler):
     scheduler.queue.enqueue(make_task("p2", "t2", 10))
     scheduler.run()
     assert {t["id"] for t in dispatched} == {"t2"}
+
+def test_backpressure_reads_rolling_week(monkeypatch, scheduler):
+    from fsm_orchestrator.core.cost_monitor import CostMonitor
+    now = [0.0]
+    scheduler.cost_monitor = CostMonitor(clock=lambda: now[0])
+    dispatched = []
+    monkeypatch.setattr(scheduler, "dispatch", lambda task: dispatched.append(task))
+    scheduler.cost_monitor.record("p1", "a1", 75, 0.0)
+    scheduler.queue.enqueue(make_task("p1", "t1", 10))
+    scheduler.run()
+    assert dispatched == []
+    now[0] = 8 * 24 * 3600.0  # a week later the usage has rolled off
+    scheduler.queue.enqueue(make_task("p1", "t2", 10))
+    scheduler.run()
+    assert [t["id"] for t in dispatched] == ["t2"]
+
+def test_dispatched_tokens_count_against_the_cap(monkeypatch):
+    from fsm_orchestrator.core.cost_monitor import CostMonitor
+    sched = SchedulerService()
+    sched.cost_monitor = CostMonitor()
+    sched.project_token_caps = {"p1": 100}
+    dispatched = []
+    monkeypatch.setattr(sched, "dispatch", lambda task: dispatched.append(task))
+    for i in range(5):
+        sched.queue.enqueue(make_task("p1", f"t{i}", 30))
+    sched.queue.quantum = 1000
+    while sched.queue.active:
+        sched.run()
+    assert [t["id"] for t in dispatched] == ["t0", "t1"]  # a third would pass 80 of 100
+    assert sched.cost_monitor.reserved("p1") == 60 and sched.queue.delayed == 3
+    sched.failed("t1")
+    sched.complete("t0")
+    assert sched.cost_monitor.reserved("p1") == 0
+    assert sched.cost_monitor.window_tokens("p1") == 30
+
+def test_drr_shares_tokens_by_weight():
+    q = TaskQueue(quantum=100, weights={"heavy": 3})
+    for i in range(60):
+        q.enqueue(make_task("heavy", f"h{i}", 50))
+        q.enqueue(make_task("light", f"l{i}", 50))
+    served = [t["project_id"] for t in q.dequeue_ready(limit=40)]
+    assert served.count("heavy") == 3 * served.count("light")
+    assert served[:8] == ["heavy"] * 6 + ["light"] * 2
+
+def test_drr_ring_holds_only_active_projects_and_big_tasks_wait_for_credit():
+    q = TaskQueue(quantum=10)
+    q.enqueue(make_task("big", "b1", 35))
+    q.enqueue(make_task("small", "s1", 5))
+    q.enqueue(make_task("small", "s2", 5))
+    q.enqueue(make_task("small", "s3", 5))
+    assert list(q.active) == ["big", "small"]
+    order = [t["id"] for t in q.dequeue_ready(limit=10)]
+    assert order == ["s1", "s2", "s3", "b1"]  # b1 accrues deficit over 4 rounds
+    assert not q.active and not q.queues and not q.deficit
+    assert q.next_task() is None
+    with pytest.raises(ValueError):
+        q.set_weight("p", 0)
+    for quantum in (0, -10):
+        with pytest.raises(ValueError):
+            TaskQueue(quantum=quantum)
+
+def test_priority_orders_due_tasks_within_project():
+    q = TaskQueue(clock=lambda: 100.0)
+    q.enqueue({**make_task("p", "low", 1), "priority": 5})
+    q.enqueue({**make_task("p", "urgent", 1), "priority": 0})
+    q.enqueue({**make_task("p", "urgent2", 1), "priority": 0})
+    assert [t["id"] for t in q.dequeue_ready(limit=3)] == ["urgent", "urgent2", "low"]
+
+def test_delayed_tasks_wait_for_eta():
+    now = [0.0]
+    q = TaskQueue(clock=lambda: now[0], tick=1.0, slots=8)
+    q.enqueue({**make_task("p", "later", 1), "eta": 2.5})
+    q.enqueue({**make_task("p", "far", 1), "eta": 100.0})  # beyond the wheel horizon
+    q.enqueue(make_task("p", "now", 1))
+    assert [t["id"] for t in q.dequeue_ready()] == ["now"]
+    assert len(q) == 2 and q.delayed == 2
+    now[0] = 2.4
+    assert q.dequeue_ready() == []
+    now[0] = 2.5
+    assert [t["id"] for t in q.dequeue_ready()] == ["later"]
+    now[0] = 99.9
+    assert q.next_task() is None
+    now[0] = 500.0
+    assert q.next_task()["id"] == "far"
+    assert len(q) == 0
+
+def test_backpressured_tasks_are_postponed_until_the_week_rolls_off(monkeypatch):
+    from fsm_orchestrator.core.cost_monitor import CostMonitor
+    now = [0.0]
+    sched = SchedulerService()
+    sched.queue = TaskQueue(clock=lambda: now[0])
+    sched.cost_monitor = CostMonitor(clock=lambda: now[0])
+    sched.project_token_caps = {"p1": 100}
+    dispatched = []
+    monkeypatch.setattr(sched, "dispatch", lambda task: dispatched.append(task))
+    sched.cost_monitor.record("p1", "a1", 75, 0.0)  # hour bucket 0
+    sched.queue.enqueue(make_task("p1", "t1", 10))
+    sched.run()
+    assert dispatched == [] and sched.queue.location("t1") == "delayed"
+    assert sched.wait_time() == 7 * 24 * 3600.0  # bucket 0 leaves the week window
+    now[0] = 7 * 24 * 3600.0 - 1
+    sched.run()
+    assert dispatched == []
+    now[0] = 7 * 24 * 3600.0
+    sched.run()
+    assert [t["id"] for t in dispatched] == ["t1"]
+    assert sched.queue.location("t1") == "running"
+    sched.complete("t1")
+    assert sched.queue.location("t1") is None and sched.wait_time() is None
+
+def test_failed_tasks_back_off_then_poison_and_replay():
+    now = [0.0]
+    q = TaskQueue(clock=lambda: now[0], max_attempts=3, backoff=10.0)
+    q.enqueue(make_task("p", "t", 1))
+    delays = []
+    for attempt in range(2):
+        assert q.next_task()["id"] == "t"
+        assert q.fail("t", "boom")
+        assert q.location("t") == "delayed"
+        delays.append(q.next_eta() - now[0])
+        now[0] = q.next_eta()
+    assert 5.0 <= delays[0] <= 10.0 and 10.0 <= delays[1] <= 20.0
+    assert q.next_task()["id"] == "t"
+    assert not q.fail("t", "boom")
+    assert q.location("t") == "poisoned" and q.poison["t"]["attempts"] == 3
+    assert q.poison["t"]["last_error"] == "boom" and q.next_task() is None
+    with pytest.raises(KeyError):
+        q.postpone("t")
+    assert q.replay() == 1
+    assert q.next_task()["attempts"] == 0 and not q.poison
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from fsm_orchestrator.scheduler.queue import TaskQueue
+from fsm_orchestrator.scheduler.scheduler import SchedulerService
+from fsm_orchestrator.scheduler.workers import PoolFull, TokenBucket, Worker, WorkerPool
+
+def make_task(tid, model="m", agent="a", est_tokens=10, **extra):
+    return {"id": tid, "project_id": "p", "model": model, "agent_id": agent, "est_tokens": est_tokens, **extra}
+
+class Tracker:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.active = {}
+        self.peak = {}
+    async def __call__(self, task):
+        for key in (task["model"], task["agent_id"]):
+            self.active[key] = self.active.get(key, 0) + 1
+            self.peak[key] = max(self.peak.get(key, 0), self.active[key])
+        try:
+            await asyncio.sleep(task.get("sleep", self.delay))
+        finally:
+            for key in (task["model"], task["agent_id"]):
+                self.active[key] -= 1
+        return {"tokens": task["est_tokens"]}
+
+def test_pool_caps_concurrency_per_model_and_agent():
+    tracker = Tracker()
+    async def scenario():
+        pool = WorkerPool(Worker(tracker), model_concurrency={"gpt": 3}, agent_concurrency={"ceo": 2})
+        for i in range(20):
+            await pool.submit(make_task(f"g{i}", model="gpt", agent=f"a{i}"))
+            await pool.submit(make_task(f"c{i}", model=f"m{i}", agent="ceo"))
+            await pool.submit(make_task(f"o{i}", model="other", agent=f"b{i}"))
+        await pool.join()
+        return pool
+    pool = asyncio.run(scenario())
+    assert tracker.peak["gpt"] == 3 and tracker.peak["ceo"] == 2 and tracker.peak["other"] > 3
+    m = pool.metrics()
+    assert m["completed"] == 60 and m["queued"] == 0 and m["in_flight"] == 0 and m["wait_p99"] > 0
+
+def test_pool_timeouts_cancellation_and_retries():
+    calls = []
+    async def runner(task):
+        calls.append(task["id"])
+        if task["id"] == "flaky" and calls.count("flaky") < 3:
+            raise ConnectionError("reset")
+        await asyncio.sleep(task.get("sleep", 0))
+        return "ok"
+    async def scenario():
+        pool = WorkerPool(Worker(runner, timeout=0.05, backoff=0.001))
+        slow = await pool.submit(make_task("slow", sleep=1.0))
+        stuck = await pool.submit(make_task("stuck", sleep=10.0))
+        flaky = await pool.submit(make_task("flaky"))
+        await asyncio.sleep(0)
+        assert pool.cancel("stuck") and not pool.cancel("missing")
+        await pool.join()
+        with pytest.raises(asyncio.TimeoutError):
+            slow.result()
+        assert stuck.cancelled() and flaky.result() == "ok"
+        return pool
+    pool = asyncio.run(scenario())
+    assert calls.count("flaky") == 3
+    assert pool.stats == {"submitted": 3, "completed": 1, "failed": 1, "timeouts": 1, "cancelled": 1}
+    assert pool.pending == 0
+
+def test_token_bucket_meters_tokens_per_minute():
+    now = [0.0]
+    bucket = TokenBucket(6000, clock=lambda: now[0])  # 100 tokens/s
+    assert bucket.try_acquire(6000) == 0.0
+    assert bucket.try_acquire(50) == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.try_acquire(50) == 0.0
+    now[0] = 100.0
+    assert bucket.try_acquire(10_000) == 0.0  # larger than the burst: overdraws
+    assert bucket.try_acquire(1) == pytest.approx(40.01)
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+def test_scheduler_dispatches_to_pool_and_settles_outcomes():
+    async def runner(task):
+        if task["id"] == "bad":
+            raise ValueError("model refused")
+        return "ok"
+    async def scenario():
+        sched = SchedulerService(pool=WorkerPool(Worker(runner)))
+        sched.queue = TaskQueue()
+        sched.queue.enqueue({"id": "good", "project_id": "p1", "est_tokens": 10})
+        sched.queue.enqueue({"id": "bad", "project_id": "p2", "est_tokens": 10})
+        sched.run()
+        await sched.pool.join()
+        await asyncio.sleep(0)
+        return sched
+    sched = asyncio.run(scenario())
+    assert sched.queue.location("good") is None
+    assert sched.queue.location("bad") == "delayed"
+    assert "model refused" in sched.queue.index["bad"][1]["last_error"]
+
+def test_in_flight_tokens_block_dispatch_until_settled():
+    gate = None
+    async def runner(task):
+        await gate.wait()
+        if task["id"] == "t1":
+            raise ValueError("model refused")
+        return {"tokens": 12}
+    async def scenario():
+        nonlocal gate
+        gate = asyncio.Event()
+        sched = SchedulerService(pool=WorkerPool(Worker(runner)))
+        sched.project_token_caps = {"p": 100}
+        for i in range(4):
+            sched.queue.enqueue(make_task(f"t{i}", est_tokens=30))
+        while sched.queue.active:
+            sched.run()
+        in_flight = (sched.pool.pending, sched.cost_monitor.reserved("p"), sched.queue.delayed)
+        gate.set()
+        await sched.pool.join()
+        await asyncio.sleep(0)
+        settled = (sched.cost_monitor.reserved("p"), sched.cost_monitor.window_tokens("p"))
+        gate.clear()
+        sched.queue.enqueue(make_task("t9", est_tokens=30))
+        sched.run()
+        assert sched.cost_monitor.reserved("p") == 30
+        sched.pool.cancel("t9")
+        await sched.pool.join()
+        await asyncio.sleep(0)
+        return sched, in_flight, settled
+    sched, in_flight, settled = asyncio.run(scenario())
+    assert in_flight == (2, 60, 2)  # the other two wait for the reserved tokens
+    assert settled == (0, 12)  # charged the runner's 12 tokens; the failed call is released
+    assert sched.cost_monitor.reserved("p") == 0 and not sched.reservations
+    assert sched.cost_monitor.window_tokens("p") == 12  # the cancelled call is not charged
+    assert sched.queue.location("t9") is None and sched.queue.location("t1") == "delayed"
+
+def test_full_pool_postpones_but_loop_errors_propagate():
+    gate = None
+    async def runner(task):
+        await gate.wait()
+        return {"tokens": 1}
+    async def scenario():
+        nonlocal gate
+        gate = asyncio.Event()
+        sched = SchedulerService(pool=WorkerPool(Worker(runner), max_pending=1))
+        sched.queue.enqueue(make_task("t1"))
+        sched.queue.enqueue(make_task("t2"))
+        while sched.queue.active:
+            sched.run()
+        with pytest.raises(PoolFull):
+            sched.pool.submit_nowait(make_task("t3"))
+        postponed = (sched.queue.location("t2"), sched.cost_monitor.reserved("p"))
+        gate.set()
+        await sched.pool.join()
+        await asyncio.sleep(0)
+        return sched, postponed
+    sched, postponed = asyncio.run(scenario())
+    assert postponed == ("delayed", 10)  # only t1's reservation is held
+    assert sched.pool.stats["submitted"] == 1
+    sched.queue.enqueue(make_task("t4"))
+    with pytest.raises(RuntimeError, match="no running event loop"):
+        sched.run()  # not PoolFull: surfaced, not swallowed
+    assert sched.pool.stats["submitted"] == 1 and sched.pool.queued == 0
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from fsm_orchestrator.util.embedding import EmbeddingCache, EmbeddingService, HashingEmbedder
+
+class CountingBackend:
+    name = "counting"
+
+    def __init__(self, fail_times=0, error=ConnectionError):
+        self.calls = []
+        self.fail_times = fail_times
+        self.error = error
+        self.inner = HashingEmbedder(dim=16)
+
+    def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.fail_times:
+            self.fail_times -= 1
+            raise self.error("rate limited")
+        return self.inner.embed_batch(texts)
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    a, b = HashingEmbedder(dim=64).embed_batch(["the cookie game", "the cookie game"])
+    assert np.array_equal(a, b)
+    assert abs(np.linalg.norm(a) - 1) < 1e-6
+    near, far = HashingEmbedder(dim=64).embed_batch(["the cookie clicker game", "quarterly tax filing"])
+    assert a @ near > a @ far
+    assert not HashingEmbedder(dim=8).embed_batch([""]).any()
+
+def test_concurrent_requests_share_batches_and_cache():
+    backend = CountingBackend()
+    service = EmbeddingService(backend, batch_size=100, max_wait=0.05)
+    barrier = threading.Barrier(20)
+    results = {}
+    def worker(i):
+        barrier.wait()
+        results[i] = service.embed(f"text {i % 10}")
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(len(c) for c in backend.calls) == 10  # duplicates coalesced
+    assert len(backend.calls) <= 3
+    assert results[3] == results[13]
+    service.embed("text 3")
+    stats = service.stats()
+    assert stats["requests"] == 21 and stats["embedded"] == 10
+    assert stats["hits"] >= 1 and stats["hit_rate"] > 0
+    assert stats["throughput"] > 0
+    assert asyncio.run(service.aembed("text 3")) == results[3]
+    service.close()
+
+def test_retries_with_backoff_then_fails():
+    sleeps = []
+    service = EmbeddingService(CountingBackend(fail_times=2), retries=3, backoff=0.1, sleep=sleeps.append)
+    assert len(service.embed("hello")) == 16
+    assert len(sleeps) == 2 and 0.05 <= sleeps[0] <= 0.1 and 0.1 <= sleeps[1] <= 0.2
+    assert service.stats()["retries"] == 2
+    failing = EmbeddingService(CountingBackend(fail_times=10), retries=1, sleep=lambda s: None)
+    with pytest.raises(ConnectionError):
+        failing.embed("hello")
+    assert failing.stats()["failures"] == 1
+    capped, waits = EmbeddingService(CountingBackend(fail_times=3), retries=3, backoff=1.0, max_backoff=1.5,
+                                     sleep=sleeps.append), len(sleeps)
+    capped.embed("hello")
+    assert len(sleeps) - waits == 3 and all(0.5 <= s <= 1.5 for s in sleeps[waits:])  # 1, 2, 4 capped at 1.5
+    capped.close()
+    service.close()
+    failing.close()
+
+def test_only_transient_errors_are_retried():
+    sleeps = []
+    timeouts = EmbeddingService(CountingBackend(fail_times=1, error=TimeoutError), sleep=sleeps.append)
+    assert len(timeouts.embed("hello")) == 16 and len(sleeps) == 1
+    backend = CountingBackend(fail_times=1, error=ValueError)
+    broken = EmbeddingService(backend, sleep=sleeps.append)
+    with pytest.raises(ValueError):
+        broken.embed("hello")
+    assert len(backend.calls) == 1 and len(sleeps) == 1
+    timeouts.close()
+    broken.close()
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings")
+    first = EmbeddingService(CountingBackend(), cache=EmbeddingCache(path=path))
+    vector = first.embed("a summary")
+    first.close()
+    backend = CountingBackend()
+    second = EmbeddingService(backend, cache=EmbeddingCache(capacity=1, path=path))
+    assert second.embed("a summary") == vector
+    assert backend.calls == []
+    second.close()
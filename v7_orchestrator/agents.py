@@ -1,5 +1,33 @@
+import os
+from functools import lru_cache
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+# Conversation history sent with each prompt, in estimated tokens (~4 characters per token).
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "24000"))
+
+@lru_cache(maxsize=65536)
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+def pack_history(conversation_history, token_budget=HISTORY_TOKEN_BUDGET):
+    """Keep the opening entry (the project brief) and as many of the newest entries as fit, without repeats."""
+    if not conversation_history:
+        return []
+    first, rest = conversation_history[0], conversation_history[1:]
+    remaining = token_budget - estimate_tokens(first)
+    seen = {first}
+    recent = []
+    for entry in reversed(rest):
+        if entry in seen:
+            continue
+        cost = estimate_tokens(entry)
+        if cost > remaining:
+            break
+        seen.add(entry)
+        recent.append(entry)
+        remaining -= cost
+    return [first] + recent[::-1]
+
 class Agent:
     def __init__(self, persona_name, llm):
         with open(f"personas/master_system_prompt.md", "r") as f:
@@ -9,6 +37,7 @@ class Agent:
         self.llm = llm
 
     def invoke(self, conversation_history, task):
-        final_prompt = f"{self.master_prompt}\n\n{self.persona_prompt}\n\nConversation History:\n{'\n'.join(conversation_history)}\n\nTask: {task}"
+        history = pack_history(conversation_history)
+        final_prompt = f"{self.master_prompt}\n\n{self.persona_prompt}\n\nConversation History:\n{'\n'.join(history)}\n\nTask: {task}"
         response = self.llm.invoke(final_prompt)
         return response.content
@@ -3,22 +3,28 @@ import readline # For better input handling
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from project_manager import ProjectManager
-from graph import (
-    create_ideation_graph,
-    create_planning_graph,
-    create_implementation_graph,
-    create_business_plan_graph,
-    create_quarterly_goals_graph,
-)
 
 # --- Setup ---
 load_dotenv()
 llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=os.getenv("GOOGLE_API_KEY"))
-ideation_app = create_ideation_graph(llm)
-planning_app = create_planning_graph(llm)
-implementation_app = create_implementation_graph(llm)
-business_plan_app = create_business_plan_graph(llm)
-quarterly_goals_app = create_quarterly_goals_graph(llm)
+
+# Graphs are compiled on first use so the REPL is interactive immediately.
+GRAPH_FACTORIES = {
+    "Ideation": "create_ideation_graph",
+    "Planning": "create_planning_graph",
+    "Implementation": "create_implementation_graph",
+    "Business_Planning": "create_business_plan_graph",
+    "Quarterly_Goals": "create_quarterly_goals_graph",
+}
+_compiled_apps = {}
+
+def get_app(phase):
+    """Return the compiled graph for a phase, compiling it on first use."""
+    app = _compiled_apps.get(phase)
+    if app is None:
+        import graph
+        app = _compiled_apps[phase] = getattr(graph, GRAPH_FACTORIES[phase])(llm)
+    return app
 
 # --- State ---
 current_state = None
@@ -81,7 +87,7 @@ while True:
             }
             print(f"--- New project started: '{project_name}' ---")
             print("--- Running Initial Ideation ---")
-            current_state = run_phase(ideation_app, current_state)
+            current_state = run_phase(get_app("Ideation"), current_state)
 
         elif user_input.startswith("!business"):
             game_concept = user_input.split(" ", 1)[1] if len(user_input.split(" ", 1)) > 1 else "general game concept"
@@ -93,7 +99,7 @@ while True:
                 "llm": llm
             }
             print(f"--- Business Plan Generation Started for: '{game_concept}' ---")
-            current_state = run_phase(business_plan_app, current_state)
+            current_state = run_phase(get_app("Business_Planning"), current_state)
 
         elif user_input.startswith("!goals"):
             current_state = {
@@ -104,7 +110,7 @@ while True:
                 "llm": llm
             }
             print("--- Quarterly Goals Setting Started ---")
-            current_state = run_phase(quarterly_goals_app, current_state)
+            current_state = run_phase(get_app("Quarterly_Goals"), current_state)
 
         elif not current_state:
             print("Please start a project first with `!start [description]`")
@@ -114,13 +120,13 @@ while True:
                 print("\n--- Ideation Approved! Moving to Planning. ---")
                 current_state["current_phase"] = "Planning"
                 current_state["transcript"].append("**[System]:** Ideation approved by user. The Project Manager will now create a file plan.")
-                current_state = run_phase(planning_app, current_state)
+                current_state = run_phase(get_app("Planning"), current_state)
 
             elif current_state["current_phase"] == "Planning":
                 print("\n--- Plan Approved! Moving to Implementation. ---")
                 current_state["current_phase"] = "Implementation"
                 current_state["transcript"].append("**[System]:** Plan approved by user. The developers will now generate the code.")
-                current_state = run_phase(implementation_app, current_state)
+                current_state = run_phase(get_app("Implementation"), current_state)
                 print("\n--- Project Implementation Complete! --- ")
                 current_state = None # Reset for a new project
                 print("You can start a new project with `!start`.")
@@ -140,13 +146,13 @@ while True:
             current_state["transcript"].append(f"**[User Feedback]:**\n{user_input}")
             
             if current_state["current_phase"] == "Ideation":
-                current_state = run_phase(ideation_app, current_state)
+                current_state = run_phase(get_app("Ideation"), current_state)
             elif current_state["current_phase"] == "Planning":
-                current_state = run_phase(planning_app, current_state)
+                current_state = run_phase(get_app("Planning"), current_state)
             elif current_state["current_phase"] == "Business_Planning":
-                current_state = run_phase(business_plan_app, current_state)
+                current_state = run_phase(get_app("Business_Planning"), current_state)
             elif current_state["current_phase"] == "Quarterly_Goals":
-                current_state = run_phase(quarterly_goals_app, current_state)
+                current_state = run_phase(get_app("Quarterly_Goals"), current_state)
 
     except (KeyboardInterrupt, EOFError):
         print("\nExiting. Goodbye!")